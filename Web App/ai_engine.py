@@ -9,6 +9,8 @@ import json
 import hashlib
 from PIL import Image
 from functools import lru_cache
+from ai_metrics import track_ai_call, record_cache_hit
+from circuit_breaker import get_breaker
 
 # Global model references (lazy-loaded on first use)
 _detector = None
@@ -208,6 +210,48 @@ def _get_image_hash(image_path):
         return hashlib.md5(f.read()).hexdigest()
 
 
+def _extract_json(text):
+    """
+    Return the first top-level JSON object in model output, or None.
+    Single pass over the text tracking brace depth and string state, so nested
+    objects and braces inside strings are handled and cost stays linear.
+    """
+    text = text.strip()
+    if text.startswith('{'):
+        try:
+            return json.loads(text)
+        except ValueError:
+            pass
+
+    start, depth, in_string, escape = None, 0, False, False
+    for i, ch in enumerate(text):
+        if depth == 0:
+            if ch == '{':
+                start, depth = i, 1
+            continue
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                try:
+                    data = json.loads(text[start:i + 1])
+                    if isinstance(data, dict):
+                        return data
+                except ValueError:
+                    pass
+    return None
+
+
 def _get_cached_result(image_path, room_type, style):
     """Try to load cached AI analysis result."""
     try:
@@ -257,6 +301,7 @@ def analyze_room(image_paths, room_type='auto', style='modern'):
     primary_path = image_paths[0]
     cached = _get_cached_result(primary_path, room_type, style)
     if cached:
+        record_cache_hit('design_analysis', 'file')
         return cached
     
     # default room type
@@ -342,21 +387,17 @@ Provide a comprehensive analysis in JSON format with the following keys:
 """
         
         print(f"[AI Engine] Calling Gemini Flash with {len(images)} images and grounded prompt...")
-        response = model.generate_content([prompt] + images)
+        with get_breaker('design_analysis').call(), track_ai_call('design_analysis') as call:
+            response = model.generate_content(
+                [prompt] + images,
+                generation_config={"response_mime_type": "application/json"}
+            )
+            call.record_usage(response)
         
         # Parse JSON from response
-        text = response.text.strip()
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0].strip()
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0].strip()
-        else:
-            import re
-            match = re.search(r'(\{.*\})', text, re.DOTALL)
-            if match:
-                text = match.group(1)
-            
-        ai_data = json.loads(text)
+        ai_data = _extract_json(response.text)
+        if ai_data is None:
+            raise ValueError("Gemini response did not contain a JSON object")
         
         result = {
             'room_type': ai_data.get('room_type', final_room_type),
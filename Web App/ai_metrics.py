@@ -0,0 +1,131 @@
+"""
+AI call instrumentation for Gruha Alankara.
+Records latency histograms, token usage, cache hits, errors and timeouts for
+every Gemini call, per call site, and renders them in the Prometheus text format
+for the /metrics route.
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+# Latency buckets in seconds (multi-image analysis calls can take tens of seconds)
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+
+# Rough spend estimate in USD per million tokens
+PRICE_PROMPT_PER_MTOK = float(os.environ.get('AI_PRICE_PROMPT_PER_MTOK', '0.30'))
+PRICE_RESPONSE_PER_MTOK = float(os.environ.get('AI_PRICE_RESPONSE_PER_MTOK', '2.50'))
+
+# Exception class names that mean the call ran out of time rather than failed
+TIMEOUT_ERRORS = ('TimeoutError', 'DeadlineExceeded', 'ReadTimeout', 'ConnectTimeout')
+
+_lock = threading.Lock()
+_latency = {}   # (call_site, outcome) -> [bucket counts..., sum, count]
+_counters = {}  # (metric, labels) -> value
+
+_HELP = {
+    'ai_calls_total': ('counter', 'Outbound model calls by outcome (ok, error, timeout).'),
+    'ai_prompt_tokens_total': ('counter', 'Prompt tokens reported by the model.'),
+    'ai_response_tokens_total': ('counter', 'Response tokens reported by the model.'),
+    'ai_estimated_cost_usd_total': ('counter', 'Estimated spend from token usage and AI_PRICE_* rates.'),
+    'ai_cache_hits_total': ('counter', 'Model calls avoided by a cache.'),
+}
+
+
+def _inc(metric, labels, amount=1):
+    key = (metric, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def _observe(call_site, outcome, seconds):
+    key = (call_site, outcome)
+    with _lock:
+        series = _latency.get(key)
+        if series is None:
+            series = _latency[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0, 0]
+        for i, bound in enumerate(LATENCY_BUCKETS + (float('inf'),)):
+            if seconds <= bound:
+                series[i] += 1
+        series[-2] += seconds
+        series[-1] += 1
+
+
+class _CallRecord:
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+
+    def record_usage(self, response):
+        """Take token counts from a Gemini response's usage_metadata, if present."""
+        usage = getattr(response, 'usage_metadata', None)
+        if usage:
+            self.prompt_tokens = getattr(usage, 'prompt_token_count', 0) or self.prompt_tokens
+            self.response_tokens = getattr(usage, 'candidates_token_count', 0) or self.response_tokens
+
+
+@contextmanager
+def track_ai_call(call_site):
+    """
+    Time one model call and record its outcome and token usage:
+
+        with track_ai_call('voice_assistant') as call:
+            response = model.generate_content(prompt)
+            call.record_usage(response)
+    """
+    call = _CallRecord()
+    outcome = 'ok'
+    start = time.perf_counter()
+    try:
+        yield call
+    except BaseException as e:
+        outcome = 'timeout' if type(e).__name__ in TIMEOUT_ERRORS else 'error'
+        raise
+    finally:
+        _observe(call_site, outcome, time.perf_counter() - start)
+        _inc('ai_calls_total', {'call_site': call_site, 'outcome': outcome})
+        if call.prompt_tokens or call.response_tokens:
+            _inc('ai_prompt_tokens_total', {'call_site': call_site}, call.prompt_tokens)
+            _inc('ai_response_tokens_total', {'call_site': call_site}, call.response_tokens)
+            cost = (call.prompt_tokens * PRICE_PROMPT_PER_MTOK
+                    + call.response_tokens * PRICE_RESPONSE_PER_MTOK) / 1e6
+            _inc('ai_estimated_cost_usd_total', {'call_site': call_site}, cost)
+
+
+def record_cache_hit(call_site, cache):
+    _inc('ai_cache_hits_total', {'call_site': call_site, 'cache': cache})
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def render():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = [
+        '# HELP ai_call_duration_seconds Latency of outbound model calls.',
+        '# TYPE ai_call_duration_seconds histogram',
+    ]
+    with _lock:
+        for (call_site, outcome), series in sorted(_latency.items()):
+            base = [('call_site', call_site), ('outcome', outcome)]
+            for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), series):
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f'ai_call_duration_seconds_bucket{_labels(base + [("le", le)])} {count}')
+            lines.append(f'ai_call_duration_seconds_sum{_labels(base)} {series[-2]!r}')
+            lines.append(f'ai_call_duration_seconds_count{_labels(base)} {series[-1]}')
+
+        for metric, (kind, help_text) in _HELP.items():
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} {kind}')
+            for (name, labels), value in sorted(_counters.items()):
+                if name == metric:
+                    lines.append(f'{metric}{_labels(list(labels))} {value!r}')
+    return '\n'.join(lines) + '\n'
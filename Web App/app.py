@@ -7,7 +7,7 @@ configures the database, and defines core routes.
 """
 
 import os
-from flask import Flask, render_template, session, send_from_directory
+from flask import Flask, Response, render_template, session, send_from_directory
 from flask_wtf.csrf import CSRFProtect
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -86,6 +86,13 @@ def create_app(test_config=None):
         """Serve uploaded images."""
         return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
+    @app.route('/metrics')
+    @limiter.exempt
+    def metrics():
+        """Prometheus scrape endpoint for AI call latency, tokens and errors."""
+        from ai_metrics import render
+        return Response(render(), mimetype='text/plain; version=0.0.4')
+
     # ---- Context Processors ----
 
     @app.context_processor
@@ -232,7 +232,7 @@ def voice_assist():
 @api_login_required
 def product_search():
     """
-    Search for real products on Amazon using Tavily search API.
+    Search for real products on Amazon (amazon.in and amazon.com) using Tavily search API.
     Accepts a furniture type + style and returns matching product links.
     """
     data = request.get_json()
@@ -244,41 +244,14 @@ def product_search():
 
     try:
         from flask import current_app
-        from tavily import TavilyClient
+        from product_search import search_products
 
         api_key = current_app.config.get('TAVILY_API_KEY', '')
         if not api_key:
             return jsonify({'error': 'Tavily API key not configured'}), 500
 
-        client = TavilyClient(api_key=api_key)
-
-        # Build a targeted search query for Amazon furniture
-        search_query = f"{query} {style} furniture buy site:amazon.in OR site:amazon.com"
-
-        response = client.search(
-            query=search_query,
-            search_depth="basic",
-            max_results=5,
-            include_images=True,
-            include_answer=False,
-        )
-
-        products = []
-        for result in response.get('results', []):
-            products.append({
-                'title': result.get('title', ''),
-                'url': result.get('url', ''),
-                'snippet': result.get('content', '')[:200],
-                'source': result.get('url', '').split('/')[2] if '/' in result.get('url', '') else '',
-            })
-
-        # Attach any images from the response
-        images = response.get('images', [])
-        for i, product in enumerate(products):
-            if i < len(images):
-                product['image'] = images[i]
-            else:
-                product['image'] = ''
+        # One query per Amazon site, run in parallel and merged
+        products = search_products(api_key, f"{query} {style}")
 
         return jsonify({
             'query': query,
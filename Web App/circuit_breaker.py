@@ -0,0 +1,110 @@
+"""
+Circuit breakers for Gruha Alankara's Gemini calls.
+When a model endpoint keeps failing (or answering too slowly), its circuit opens
+and callers go straight to their rule-based fallback instead of waiting for
+another failure. After a cool-down one probe call is let through; if it works
+the circuit closes again.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Failure share over the window that opens a circuit, once at least MIN_CALLS were seen
+FAILURE_RATE = float(os.environ.get('CIRCUIT_FAILURE_RATE', '0.5'))
+MIN_CALLS = int(os.environ.get('CIRCUIT_MIN_CALLS', '5'))
+WINDOW_SECONDS = float(os.environ.get('CIRCUIT_WINDOW_SECONDS', '60'))
+# Calls slower than this count as failures even if they succeed
+SLOW_CALL_SECONDS = float(os.environ.get('CIRCUIT_SLOW_CALL_SECONDS', '30'))
+# Cool-down before a probe call is allowed
+OPEN_SECONDS = float(os.environ.get('CIRCUIT_OPEN_SECONDS', '30'))
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the model while its circuit is open."""
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, name):
+        self.name = name
+        self.state = 'closed'
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._outcomes = deque()  # (timestamp, failed)
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        if state != self.state:
+            print(f"[Circuit] {self.name}: {self.state} -> {state}")
+            self.state = state
+
+    def _admit(self):
+        """None if the call must be skipped, else whether it is the half-open probe."""
+        with self._lock:
+            if self.state == 'closed':
+                return False
+            if self.state == 'open' and time.monotonic() - self._opened_at >= OPEN_SECONDS:
+                self._set_state('half_open')
+            if self.state == 'half_open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return None
+
+    def _record(self, failed, probe):
+        now = time.monotonic()
+        with self._lock:
+            if probe:
+                self._probe_in_flight = False
+                if failed:
+                    self._opened_at = now
+                    self._set_state('open')
+                else:
+                    self._outcomes.clear()
+                    self._set_state('closed')
+                return
+            if self.state != 'closed':
+                return
+
+            self._outcomes.append((now, failed))
+            while self._outcomes and now - self._outcomes[0][0] > WINDOW_SECONDS:
+                self._outcomes.popleft()
+            if len(self._outcomes) >= MIN_CALLS:
+                failures = sum(1 for _, f in self._outcomes if f)
+                if failures / len(self._outcomes) >= FAILURE_RATE:
+                    self._opened_at = now
+                    self._outcomes.clear()
+                    self._set_state('open')
+
+    @contextmanager
+    def call(self):
+        """
+        Guard one model call:
+
+            with get_breaker('voice_assistant').call():
+                response = model.generate_content(prompt)
+        """
+        probe = self._admit()
+        if probe is None:
+            raise CircuitOpen(f"{self.name} circuit is open")
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException:
+            self._record(True, probe)
+            raise
+        self._record(time.monotonic() - start > SLOW_CALL_SECONDS, probe)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """One breaker per model call site, shared by every request thread."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
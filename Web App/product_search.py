@@ -0,0 +1,141 @@
+"""
+Product search for Gruha Alankara.
+Fans one query out to every vendor site in parallel through a shared Tavily
+client, then merges the answers: duplicate listings collapse into one product and
+listings ranked high by several sites come first. A site that misses the
+deadline is skipped, so a search takes as long as the slowest site at most.
+
+Every site is its own Tavily search, so one product search costs one Tavily
+call per site (PRODUCT_SEARCH_SITES, at most PRODUCT_SEARCH_MAX_SITES of them).
+"""
+
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+# Sites searched for every query
+SEARCH_SITES = [s.strip() for s in os.environ.get(
+    'PRODUCT_SEARCH_SITES', 'amazon.in,amazon.com').split(',') if s.strip()]
+# Cap on Tavily calls per product search, whatever PRODUCT_SEARCH_SITES lists
+MAX_SITES = int(os.environ.get('PRODUCT_SEARCH_MAX_SITES', '2'))
+RESULTS_PER_SITE = int(os.environ.get('PRODUCT_SEARCH_RESULTS_PER_SITE', '5'))
+MAX_RESULTS = int(os.environ.get('PRODUCT_SEARCH_MAX_RESULTS', '8'))
+DEADLINE_SECONDS = float(os.environ.get('PRODUCT_SEARCH_DEADLINE_SECONDS', '8'))
+
+_TITLE_NOISE = re.compile(r'[^a-z0-9]+')
+_AMAZON_ASIN = re.compile(r'/(?:dp|gp/product)/([A-Z0-9]{10})', re.IGNORECASE)
+
+_clients = {}
+_clients_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_client(api_key):
+    """One TavilyClient per API key for the whole process."""
+    with _clients_lock:
+        if api_key not in _clients:
+            from tavily import TavilyClient
+            _clients[api_key] = TavilyClient(api_key=api_key)
+        return _clients[api_key]
+
+
+def _get_executor():
+    """Thread pool for the per-site searches, created on first use (after any fork)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='product-search')
+    return _executor
+
+
+def _after_fork():
+    # The pool's threads do not exist in a forked child; it builds its own
+    global _executor
+    _executor = None
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def _search_site(client, site, query):
+    response = client.search(
+        query=f"{query} furniture buy site:{site}",
+        search_depth="basic",
+        max_results=RESULTS_PER_SITE,
+        include_images=True,
+        include_answer=False,
+    )
+    images = response.get('images', [])
+    products = []
+    for i, result in enumerate(response.get('results', [])):
+        url = result.get('url', '')
+        products.append({
+            'title': result.get('title', ''),
+            'url': url,
+            'snippet': result.get('content', '')[:200],
+            'source': url.split('/')[2] if url.count('/') >= 2 else '',
+            'image': images[i] if i < len(images) else '',
+        })
+    return products
+
+
+def _url_key(url):
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix('www.')
+    asin = _AMAZON_ASIN.search(parts.path) if 'amazon.' in host else None
+    if asin:
+        return f"{host}/dp/{asin.group(1).upper()}"
+    return f"{host}{parts.path.rstrip('/').lower()}"
+
+
+def _title_key(title):
+    return _TITLE_NOISE.sub(' ', title.lower()).strip()[:60]
+
+
+def merge_results(per_site, limit=MAX_RESULTS):
+    """Reciprocal-rank merge; listings with the same URL or title count as one product."""
+    merged = []  # [score, first_seen, product]
+    by_key = {}
+    for products in per_site:
+        for rank, product in enumerate(products):
+            keys = [k for k in (_url_key(product['url']), _title_key(product['title'])) if k]
+            entry = next((by_key[k] for k in keys if k in by_key), None)
+            if entry is None:
+                entry = [0.0, len(merged), product]
+                merged.append(entry)
+            entry[0] += 1.0 / (rank + 1)
+            for k in keys:
+                by_key.setdefault(k, entry)
+    merged.sort(key=lambda e: (-e[0], e[1]))
+    return [product for _, _, product in merged[:limit]]
+
+
+def search_products(api_key, query, sites=None, deadline=DEADLINE_SECONDS):
+    """
+    Search every site at once and merge what arrives before the deadline.
+    Raises the first site error only if no site answered.
+    """
+    sites = (sites or SEARCH_SITES)[:max(1, MAX_SITES)]
+    client = _get_client(api_key)
+    executor = _get_executor()
+    futures = [executor.submit(_search_site, client, site, query) for site in sites]
+    done, pending = wait(futures, timeout=deadline)
+
+    per_site, first_error = [], None
+    for future, site in zip(futures, sites):
+        if future in pending:
+            future.cancel()
+            print(f"[ProductSearch] {site} skipped: no answer within {deadline:g}s")
+        elif future.exception() is not None:
+            print(f"[ProductSearch] {site} failed: {future.exception()}")
+            first_error = first_error or future.exception()
+        else:
+            per_site.append(future.result())
+
+    if not per_site and first_error is not None:
+        raise first_error
+    return merge_results(per_site)
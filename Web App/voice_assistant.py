@@ -7,6 +7,8 @@ and gTTS for text-to-speech audio output.
 import os
 import uuid
 import traceback
+from ai_metrics import track_ai_call
+from circuit_breaker import get_breaker, CircuitOpen
 
 # Directory to store generated audio files
 AUDIO_DIR = os.path.join(os.path.dirname(__file__), 'static', 'audio')
@@ -88,13 +90,17 @@ def _generate_text_response(query):
 
         full_prompt = f"{SYSTEM_PROMPT}\n\nUser question: {query}"
         print("[Voice Assistant] Calling Gemini API...")
-        response = model.generate_content(full_prompt)
+        with get_breaker('voice_assistant').call(), track_ai_call('voice_assistant') as call:
+            response = model.generate_content(full_prompt)
+            call.record_usage(response)
         print(f"[Voice Assistant] Gemini raw response received")
 
         text = response.text.strip()
         if text:
             return text
 
+    except CircuitOpen:
+        print("[Voice Assistant] Gemini circuit open, skipping API call")
     except Exception as e:
         print(f"[Voice Assistant] Gemini API call failed:")
         traceback.print_exc()
@@ -1,5 +1,5 @@
 import os
-from flask import Flask, jsonify
+from flask import Flask, jsonify, Response
 from config import config_by_name
 from extensions import db, bcrypt, jwt, cors
 
@@ -41,6 +41,16 @@ def create_app(config_name: str = None) -> Flask:
     # Create database tables
     with app.app_context():
         db.create_all()
+        from services.product_index import ensure_product_index
+        ensure_product_index(db.engine)
+
+    # Build the AI service and pin AI_PRELOAD_MODELS before serving (before fork under gunicorn preload)
+    # With AI_WARMUP_BACKGROUND=1 under gunicorn preload, gunicorn.conf.py waits for it before forking
+    from services.ai_service import warm_up, warm_up_in_background, is_ready, readiness
+    if os.environ.get("AI_WARMUP_BACKGROUND") == "1":
+        warm_up_in_background()
+    else:
+        warm_up()
 
     # JWT error handlers
     @jwt.expired_token_loader
@@ -55,6 +65,16 @@ def create_app(config_name: str = None) -> Flask:
     def missing_token_callback(error):
         return jsonify({"message": "Authorization token is required"}), 401
 
+    # Model calls refused by the AI governor (services/governor.py)
+    from services.governor import GovernorRejected
+
+    @app.errorhandler(GovernorRejected)
+    def ai_busy(error):
+        return jsonify({
+            "message": "AI service is busy. Please retry shortly.",
+            "retry_after": error.retry_after
+        }), 429, {"Retry-After": str(error.retry_after)}
+
     # Health check endpoint
     @app.route("/api/health", methods=["GET"])
     def health_check():
@@ -64,6 +84,17 @@ def create_app(config_name: str = None) -> Flask:
             "version": "1.0.0"
         }), 200
 
+    # Readiness probe: 503 until model warm-up has finished in this process
+    @app.route("/api/health/ready", methods=["GET"])
+    def readiness_check():
+        return jsonify(readiness()), 200 if is_ready() else 503
+
+    # Prometheus scrape endpoint (AI call latency, tokens, cache hits, errors per call site)
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        from services.metrics import registry
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
     # Root endpoint
     @app.route("/", methods=["GET"])
     def root():
@@ -72,6 +103,8 @@ def create_app(config_name: str = None) -> Flask:
             "version": "1.0.0",
             "endpoints": {
                 "health": "/api/health",
+                "ready": "/api/health/ready",
+                "metrics": "/metrics",
                 "register": "/api/auth/register",
                 "login": "/api/auth/login",
                 "profile": "/api/auth/me"
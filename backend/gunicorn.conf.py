@@ -0,0 +1,59 @@
+# gunicorn -c gunicorn.conf.py
+#
+# With preload_app the app (and AI_PRELOAD_MODELS) is built once in the master; forked workers
+# share the model weights copy-on-write instead of each loading their own copy.
+#
+# Each worker keeps its own metrics; they are summed across workers through the shared SQLite
+# store (METRICS_MULTIPROCESS=1, the default), so /metrics is one scrape target whichever worker
+# answers. Figures from other workers lag by up to METRICS_FLUSH_SECONDS.
+import gc
+import os
+import sys
+
+wsgi_app = "run:app"
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# Torch intra-op threads per worker; the default (one per core) oversubscribes with several workers
+TORCH_THREADS_PER_WORKER = int(os.getenv("TORCH_THREADS_PER_WORKER", "1"))
+# Start each worker's Playwright browser pool at boot instead of on the first booking
+BROWSER_POOL_WARM = os.getenv("BROWSER_POOL_WARM", "0") == "1"
+
+
+def when_ready(server):
+    if preload_app:
+        # A background warm-up (AI_WARMUP_BACKGROUND=1) would not be carried into workers forked
+        # while it runs; finish it here so they all share the one set of preloaded weights
+        from services.ai_service import is_ready, wait_for_warm_up
+        if not is_ready():
+            server.log.info("Waiting for model warm-up before forking workers")
+            wait_for_warm_up()
+
+        # Move everything allocated during preload out of the collector's reach, so GC passes in
+        # workers do not write to (and un-share) those pages
+        gc.collect()
+        gc.freeze()
+        server.log.info("Preloaded app frozen (%d objects)", gc.get_freeze_count())
+
+
+def post_fork(server, worker):
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(TORCH_THREADS_PER_WORKER)
+
+    if preload_app:
+        # Forked from a master that was not warm: this worker warms itself up
+        from services.ai_service import is_ready, warm_up_in_background
+        if not is_ready():
+            server.log.warning("Worker %s forked before model warm-up finished; warming up", worker.pid)
+            warm_up_in_background()
+
+    if BROWSER_POOL_WARM:
+        # After the fork: the pool's loop thread and Chromium must belong to this worker
+        import threading
+        from services.browser_pool import get_browser_pool
+        threading.Thread(target=get_browser_pool().warm_up, name="browser-warmup", daemon=True).start()
@@ -106,7 +106,7 @@ class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     title = db.Column(db.String(500), nullable=False)
     vendor = db.Column(db.String(100), nullable=False)  # e.g., 'amazon'
-    url = db.Column(db.Text, nullable=False)
+    url = db.Column(db.Text, nullable=False, index=True)
     price = db.Column(db.String(50), nullable=True)
     rating = db.Column(db.String(50), nullable=True)
     image_url = db.Column(db.Text, nullable=True)
@@ -128,6 +128,39 @@ class Product(db.Model):
         return f"<Product {self.title[:20]}... from {self.vendor}>"
 
 
+class ProductSearch(db.Model):
+    """Cached vendor search: one row per normalized query, products kept in rank order."""
+    __tablename__ = "product_searches"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    query_key = db.Column(db.String(300), unique=True, nullable=False, index=True)
+    query_text = db.Column(db.String(300), nullable=False)  # As typed in the first search
+    result_count = db.Column(db.Integer, default=0)
+    hits = db.Column(db.Integer, default=0)
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    results = db.relationship("ProductSearchResult", backref="search", lazy=True,
+                              cascade="all, delete-orphan", order_by="ProductSearchResult.rank")
+
+    def products(self) -> list:
+        return [r.product for r in self.results]
+
+    def __repr__(self):
+        return f"<ProductSearch '{self.query_key}' ({self.result_count} results)>"
+
+
+class ProductSearchResult(db.Model):
+    """Links a cached search to the products it returned."""
+    __tablename__ = "product_search_results"
+
+    search_id = db.Column(db.Integer, db.ForeignKey("product_searches.id"), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), primary_key=True)
+    rank = db.Column(db.Integer, nullable=False, default=0)
+
+    product = db.relationship("Product", lazy="joined")
+
+
 class Booking(db.Model):
     """Tracks automated agent booking attempts."""
     __tablename__ = "bookings"
@@ -1,19 +1,43 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from PIL import Image
 import io
-import numpy as np
-import cv2
 import uuid
 import os
-from sklearn.cluster import KMeans
+import json
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from services.ai_service import get_ai_service
+from services.context_store import get_context_store
+from services.analysis_cache import get_analysis_cache, content_hash, dhash
+from services.image_pipeline import prepare_image
+from services.singleflight import model_calls
+from services.metrics import track_ai_call, record_cache_hit
+from services.governor import get_governor, GovernorRejected, PRIORITY_DEFAULT, PRIORITY_BULK
+from services.circuit_breaker import get_breaker, CircuitOpen, breaker_stats
+from services.structured_output import JSON_GENERATION_CONFIG, SCHEMAS
+from services.job_queue import get_job_queue, JobQueueFull, JOB_FINISHED_STATES
+from services.furniture_mapper import get_furniture_index
+from services.layout_engine import analyze_objects, layout_suggestions
+from services.palette_engine import extract_palette, recommend_style, PALETTE_MODES
 import google.generativeai as genai
 
 ai_bp = Blueprint("ai", __name__, url_prefix="/api/ai")
 
-# In-memory context store (For Phase 8 Context Sharing across Chat and Agents)
-ai_context_store = {}
+# SSE job progress: how often to re-read the job and how long to hold the stream open
+JOB_EVENTS_POLL_SECONDS = 0.5
+JOB_EVENTS_TIMEOUT_SECONDS = 120
+
+# Multi-image scans: upper bound per request and parallel vision calls per batch
+ANALYZE_BATCH_MAX_IMAGES = int(os.getenv("ANALYZE_BATCH_MAX_IMAGES", "10"))
+ANALYZE_BATCH_CONCURRENCY = int(os.getenv("ANALYZE_BATCH_CONCURRENCY", "4"))
+
+# Shared context store (For Phase 8 Context Sharing across Chat and Agents)
+ai_context_store = get_context_store()
+
+# Label -> asset index, compiled once per process
+furniture_index = get_furniture_index()
 
 # Initialize models (singleton-like for the process)
 # This block is removed as ai_service handles model initialization
@@ -35,60 +59,8 @@ ai_context_store = {}
 #     blip_pipe = None
 
 def map_objects_to_furniture(detected_objects):
-    """Refined rule-based mapping from detected objects to the expanded 15+ asset library."""
-    recommendations_map = {}
-    
-    # Map lowercase labels
-    labels = [obj['label'].lower() for obj in detected_objects]
-    
-    def add_rec(model_id, name):
-        if model_id not in recommendations_map:
-            recommendations_map[model_id] = {"model_id": model_id, "name": name}
-
-    for label in labels:
-        # Seating
-        if label in ['sofa', 'couch', 'living room']:
-            add_rec("sheen_sofa_01", "Sheen Velvet Sofa")
-        if label in ['chair', 'armchair', 'seat']:
-            add_rec("accent_chair_01", "Sheen Accent Chair")
-        
-        # Tables & Workspace
-        if label in ['dining table', 'table', 'desk']:
-            add_rec("gaming_desk_01", "Gaming Desk & Set")
-        if label in ['laptop', 'monitor', 'keyboard', 'mouse']:
-            add_rec("pc_setup_01", "Modern PC Setup")
-        
-        # Lighting
-        if label in ['lamp', 'light', 'lantern']:
-            add_rec("lantern_01", "Antique Lantern")
-        if label in ['candle', 'fire', 'lighting']:
-            add_rec("candle_01", "Hurricane Candle")
-            
-        # Decor & Objects
-        if label in ['camera', 'optics']:
-            add_rec("camera_01", "Antique Camera")
-        if label in ['bottle', 'cup', 'glass', 'drink']:
-            add_rec("bottle_01", "Glass Water Bottle")
-        if label in ['car', 'toy', 'vehicle']:
-            add_rec("toy_car_01", "Vintage Toy Car")
-        if label in ['plant', 'fruit', 'food']:
-            add_rec("avocado_01", "Plush Avocado")
-        if label in ['plate', 'bowl', 'dish']:
-            add_rec("olives_01", "Olive Dish")
-        if label in ['box', 'package', 'container']:
-            add_rec("wooden_crate_01", "Rustic Crate")
-        if label in ['backpack', 'bag', 'helmet']:
-            add_rec("helmet_01", "Explorer Helmet")
-
-    recommendations = list(recommendations_map.values())
-        
-    # Default fallbacks if nothing detected
-    if not recommendations:
-        recommendations.append({"model_id": "sheen_sofa_01", "name": "Sheen Velvet Sofa"})
-        recommendations.append({"model_id": "accent_chair_01", "name": "Sheen Accent Chair"})
-        recommendations.append({"model_id": "lantern_01", "name": "Antique Lantern"})
-        
-    return recommendations
+    """Map detected objects to the asset library through the label index (data/furniture_labels.json)."""
+    return furniture_index.map_labels(detected_objects)
 
 def refine_recommendations(room_type, detected_objects, rule_recommendations, style):
     """LLM-based refinement for style consistency."""
@@ -117,10 +89,9 @@ def refine_recommendations(room_type, detected_objects, rule_recommendations, st
     """
     
     try:
-        raw_text = ai_service.get_assistant_response(prompt)
-        response_data = ai_service.parse_json_response(raw_text)
+        response_data = ai_service.get_structured_response(prompt, SCHEMAS["refine_recommendations"])
         
-        if response_data and "refined_recommendations" in response_data:
+        if response_data:
             refined_names = response_data["refined_recommendations"]
             # Map back to IDs
             final_recs = []
@@ -135,32 +106,53 @@ def refine_recommendations(room_type, detected_objects, rule_recommendations, st
         
     return rule_recommendations
 
-@ai_bp.route("/analyze-room", methods=["POST"])
-@jwt_required()
-def analyze_room():
-    current_user_id = get_jwt_identity()
-    ai_service = get_ai_service()
-
-    if 'image' not in request.files:
-        return jsonify({"message": "No image provided"}), 400
+def _no_progress(stage):
+    pass
 
-    file = request.files['image']
+def run_room_analysis(image_bytes, bypass_cache=False, progress=_no_progress, priority=PRIORITY_DEFAULT):
+    """
+    Full analyze-room pipeline for one image. Returns (response_body, http_status).
+    Needs no request context, so it can run on the job pool.
+    """
+    ai_service = get_ai_service()
     try:
-        image_bytes = file.read()
-        print(f"Received image: {len(image_bytes)} bytes")
+        # Retries and rescans often re-upload the same room; skip Gemini when we've seen it
+        analysis_cache = get_analysis_cache()
+        image_sha = content_hash(image_bytes)
+        cache_info = {"match": "miss"}
+        degraded = False
 
-        # --- Use Gemini Vision directly (no heavy local models needed) ---
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            return jsonify({"message": "GEMINI_API_KEY not configured on server."}), 503
+        analysis = None if bypass_cache else analysis_cache.get_exact(image_sha)
+        if analysis:
+            cache_info = {"match": "exact", "distance": 0}
+
+        prepared = None
+        image_dhash = None
+        if not analysis:
+            # Single decode: orient, downsize and re-encode before anything else touches the image
+            progress("preprocessing")
+            prepared = prepare_image(image_bytes)
+            print(f"Preprocessed image: {prepared.original_size} -> {len(prepared.data)} bytes "
+                  f"({prepared.bytes_saved} saved, {prepared.image.size[0]}x{prepared.image.size[1]})")
+            image_dhash = dhash(prepared.image)
+            if not bypass_cache:
+                analysis, distance = analysis_cache.get_similar(image_dhash, prepared.image)
+                if analysis:
+                    cache_info = {"match": "near", "distance": distance}
 
-        genai.configure(api_key=api_key)
-        vision_model = genai.GenerativeModel('gemini-2.0-flash')
+        if analysis:
+            print(f"Analysis cache hit ({cache_info['match']}, distance {cache_info['distance']})")
+            record_cache_hit("room_vision", f"analysis_{cache_info['match']}")
+        else:
+            # --- Use Gemini Vision directly (no heavy local models needed) ---
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                return {"message": "GEMINI_API_KEY not configured on server."}, 503
 
-        import PIL.Image
-        pil_image = PIL.Image.open(io.BytesIO(image_bytes)).convert("RGB")
+            genai.configure(api_key=api_key)
+            vision_model = genai.GenerativeModel('gemini-2.0-flash')
 
-        vision_prompt = """
+            vision_prompt = """
 Analyze this room image as an expert interior designer. Respond ONLY with valid JSON:
 {
   "room_type": "living_room | bedroom | kitchen | office | bathroom",
@@ -170,20 +162,37 @@ Analyze this room image as an expert interior designer. Respond ONLY with valid
 }
 Detected objects should be furniture/decor items visible in the image (e.g. sofa, lamp, table, chair, plant).
 """
-        print("Sending image to Gemini Vision for analysis...")
-        response = vision_model.generate_content([vision_prompt, pil_image])
-        raw_text = response.text
-        print(f"Gemini Vision raw response: {raw_text[:200]}")
+            progress("analyzing")
+            print("Sending image to Gemini Vision for analysis...")
+            def call_vision():
+                with get_breaker("room_vision").call(), get_governor().slot(priority), \
+                        track_ai_call("room_vision") as call:
+                    response = vision_model.generate_content(
+                        [vision_prompt, prepared.as_part()], generation_config=JSON_GENERATION_CONFIG
+                    )
+                    call.record_usage(response)
+                    return response.text
 
-        analysis = ai_service.parse_json_response(raw_text)
-        if not analysis:
-            # Gemini didn't return valid JSON - use minimal fallback
-            analysis = {
-                "room_type": "living_room",
-                "style": "Modern",
-                "description": "A comfortable room with modern furnishings.",
-                "detected_objects": ["sofa", "table", "lamp"]
-            }
+            # Concurrent uploads of the same image wait for one Gemini call
+            try:
+                raw_text = model_calls.do(f"vision:{image_sha}", call_vision)
+                print(f"Gemini Vision raw response: {raw_text[:200]}")
+                analysis = ai_service.parse_json_response(raw_text, SCHEMAS["room_analysis"])
+            except CircuitOpen:
+                # Gemini is failing right now; answer from the rule-based path straight away
+                print("Vision circuit open, using fallback analysis")
+                degraded = True
+
+            if analysis:
+                analysis_cache.put(image_sha, image_dhash, analysis)
+            else:
+                # Gemini didn't return valid JSON - use minimal fallback (never cached)
+                analysis = {
+                    "room_type": "living_room",
+                    "style": "Modern",
+                    "description": "A comfortable room with modern furnishings.",
+                    "detected_objects": ["sofa", "table", "lamp"]
+                }
 
         room_type = analysis.get("room_type", "living_room")
         style = analysis.get("style", "Modern")
@@ -197,27 +206,223 @@ Detected objects should be furniture/decor items visible in the image (e.g. sofa
 
         # Store context for AI Chat
         context_id = str(uuid.uuid4())
-        ai_context_store[context_id] = {
+        ai_context_store.set(context_id, {
             "room_type": room_type,
             "style": style,
             "description": description,
             "detected_objects": detected_labels
-        }
+        })
 
-        return jsonify({
+        return {
             "message": "Room analysis complete",
             "context_id": context_id,
             "room_type": room_type,
+            "style": style,
             "description": description,
             "detected_objects": detected_labels,
-            "recommended_items": rule_recs
-        }), 200
+            "recommended_items": rule_recs,
+            "cache": cache_info,
+            "degraded": degraded
+        }, 200
+
+    except GovernorRejected as e:
+        print(f"Room analysis refused: {e}")
+        return {"message": "AI service is busy. Please retry shortly.", "retry_after": e.retry_after}, 429
 
     except Exception as e:
         import traceback
         traceback.print_exc()
         print(f"Error analyzing room: {e}")
-        return jsonify({"message": f"Error processing image: {str(e)}"}), 500
+        return {"message": f"Error processing image: {str(e)}"}, 500
+
+def _wants_async():
+    flag = request.args.get('async') or request.form.get('async')
+    return flag in ('1', 'true') or 'respond-async' in request.headers.get('Prefer', '')
+
+@ai_bp.route("/analyze-room", methods=["POST"])
+@jwt_required()
+def analyze_room():
+    current_user_id = get_jwt_identity()
+
+    if 'image' not in request.files:
+        return jsonify({"message": "No image provided"}), 400
+
+    image_bytes = request.files['image'].read()
+    print(f"Received image: {len(image_bytes)} bytes")
+    bypass_cache = request.form.get('refresh') == '1' or 'no-cache' in request.headers.get('Cache-Control', '')
+
+    if _wants_async():
+        # Return straight away; the Gemini round trip runs on the bounded job pool
+        try:
+            job = get_job_queue().submit(
+                "analyze_room", run_room_analysis, image_bytes, bypass_cache,
+                owner=current_user_id, priority=PRIORITY_BULK
+            )
+        except JobQueueFull:
+            return jsonify({"message": "Analysis queue is full. Please retry shortly."}), 503, {"Retry-After": "5"}
+
+        return jsonify({
+            "message": "Room analysis queued",
+            "job_id": job["id"],
+            "status": job["status"],
+            "status_url": f"/api/ai/jobs/{job['id']}",
+            "events_url": f"/api/ai/jobs/{job['id']}/events"
+        }), 202, {"Location": f"/api/ai/jobs/{job['id']}"}
+
+    body, status = run_room_analysis(image_bytes, bypass_cache)
+    if status == 429:
+        return jsonify(body), status, {"Retry-After": str(body["retry_after"])}
+    return jsonify(body), status
+
+def _merge_room_results(results):
+    """Combine successful per-image analyses into one summary for the whole scan."""
+    ok = [r for r in results if r["status"] < 400]
+    if not ok:
+        return None
+
+    room_types = Counter(r["room_type"] for r in ok)
+    styles = Counter(r.get("style", "Modern") for r in ok)
+    detected = []
+    for r in ok:
+        for label in r.get("detected_objects", []):
+            if label not in detected:
+                detected.append(label)
+
+    summary = {
+        "room_type": room_types.most_common(1)[0][0],
+        "room_types": dict(room_types),
+        "style": styles.most_common(1)[0][0],
+        "detected_objects": detected,
+        "recommended_items": map_objects_to_furniture(detected),
+        "images_analyzed": len(ok),
+    }
+
+    # One context for the whole scan so chat can reason about every room photo
+    context_id = str(uuid.uuid4())
+    ai_context_store.set(context_id, {
+        "room_type": summary["room_type"],
+        "style": summary["style"],
+        "description": " ".join(r.get("description", "") for r in ok).strip(),
+        "detected_objects": detected
+    })
+    summary["context_id"] = context_id
+    return summary
+
+@ai_bp.route("/analyze-rooms", methods=["POST"])
+@jwt_required()
+def analyze_rooms():
+    """
+    Batch analysis of several room photos, fanned out to the vision model in parallel.
+    Form field 'images' (repeated). One failed image does not fail the batch.
+    """
+    files = request.files.getlist('images') + request.files.getlist('image')
+    if not files:
+        return jsonify({"message": "No images provided"}), 400
+    if len(files) > ANALYZE_BATCH_MAX_IMAGES:
+        return jsonify({"message": f"At most {ANALYZE_BATCH_MAX_IMAGES} images per batch"}), 400
+
+    uploads = [(f.filename, f.read()) for f in files]
+    bypass_cache = request.form.get('refresh') == '1' or 'no-cache' in request.headers.get('Cache-Control', '')
+    print(f"Batch analysis of {len(uploads)} images (concurrency {ANALYZE_BATCH_CONCURRENCY})")
+
+    def analyze_one(image_bytes):
+        try:
+            return run_room_analysis(image_bytes, bypass_cache, priority=PRIORITY_BULK)
+        except Exception as e:
+            return {"message": f"Error processing image: {str(e)}"}, 500
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=min(ANALYZE_BATCH_CONCURRENCY, len(uploads))) as pool:
+        outcomes = list(pool.map(analyze_one, [data for _, data in uploads]))
+
+    results = []
+    for index, ((filename, _), (body, status)) in enumerate(zip(uploads, outcomes)):
+        results.append(dict(body, index=index, filename=filename, status=status))
+
+    summary = _merge_room_results(results)
+    body = {
+        "message": "Batch analysis complete" if summary else "All images failed to analyze",
+        "results": results,
+        "summary": summary,
+        "elapsed_ms": round((time.time() - started) * 1000)
+    }
+    if not summary and all(r["status"] == 429 for r in results):
+        retry_after = max(r["retry_after"] for r in results)
+        return jsonify(body), 429, {"Retry-After": str(retry_after)}
+    return jsonify(body), 200 if summary else 502
+
+def _job_view(job):
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "http_status": job["http_status"],
+        "result": job["result"],
+        "error": job["error"],
+    }
+
+def _get_owned_job(job_id):
+    job = get_job_queue().get(job_id)
+    if not job or job.get("owner") != get_jwt_identity():
+        return None
+    return job
+
+@ai_bp.route("/jobs/<job_id>", methods=["GET"])
+@jwt_required()
+def get_job(job_id):
+    job = _get_owned_job(job_id)
+    if not job:
+        return jsonify({"message": "Job not found or expired"}), 404
+    return jsonify(_job_view(job)), 200
+
+@ai_bp.route("/jobs/<job_id>/events", methods=["GET"])
+@jwt_required()
+def job_events(job_id):
+    """Server-Sent Events stream of job progress; closes once the job finishes."""
+    job = _get_owned_job(job_id)
+    if not job:
+        return jsonify({"message": "Job not found or expired"}), 404
+
+    queue = get_job_queue()
+
+    def generate():
+        last_seen = None
+        deadline = time.time() + JOB_EVENTS_TIMEOUT_SECONDS
+        current = job
+        while time.time() < deadline:
+            if current is None:
+                yield 'event: error\ndata: {"message": "Job expired"}\n\n'
+                return
+            if current["updated_at"] != last_seen:
+                last_seen = current["updated_at"]
+                event = "result" if current["status"] in JOB_FINISHED_STATES else "progress"
+                yield f"event: {event}\ndata: {json.dumps(_job_view(current))}\n\n"
+                if event == "result":
+                    return
+            else:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+            time.sleep(JOB_EVENTS_POLL_SECONDS)
+            current = queue.get(job_id)
+        yield "event: timeout\ndata: {}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+@ai_bp.route("/models", methods=["GET"])
+@jwt_required()
+def model_status():
+    """Local model registry: what is loaded, load times and resident size."""
+    return jsonify(get_ai_service().models.stats()), 200
+
+@ai_bp.route("/circuits", methods=["GET"])
+@jwt_required()
+def circuit_status():
+    """Circuit breakers per model call site: state and recent failures."""
+    return jsonify(breaker_stats()), 200
 
 @ai_bp.route("/extract-colors", methods=["POST"])
 @jwt_required()
@@ -225,43 +430,21 @@ def extract_colors():
     if 'image' not in request.files:
         return jsonify({"message": "No image provided"}), 400
 
+    mode = request.form.get('mode') or request.args.get('mode', 'fast')
+    if mode not in PALETTE_MODES:
+        return jsonify({"message": f"Invalid mode. Use one of: {', '.join(PALETTE_MODES)}"}), 400
+
     file = request.files['image']
     try:
-        # Load image via OpenCV
-        in_memory_file = io.BytesIO(file.read())
-        file_bytes = np.frombuffer(in_memory_file.getvalue(), np.uint8)
-        img = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        
-        # Resize to speed up clustering
-        img = cv2.resize(img, (200, 200), interpolation=cv2.INTER_AREA)
-        
-        # Reshape for clustering
-        pixels = img.reshape(-1, 3)
-        
-        # K-Means clustering
-        kmeans = KMeans(n_clusters=5, n_init=10)
-        kmeans.fit(pixels)
-        
-        # Get centers (colors)
-        colors = kmeans.cluster_centers_.astype(int)
-        
-        # Convert to hex
-        hex_colors = [
-            '#{:02x}{:02x}{:02x}'.format(c[0], c[1], c[2])
-            for c in colors
-        ]
-        
-        # Basic style recommendation logic
-        style = "Modern"
-        avg_v = np.mean(colors)
-        if avg_v > 180: style = "Minimalist"
-        elif avg_v < 80: style = "Industrial"
-        
+        palette = extract_palette(file.read(), mode=mode)
+        hex_colors = [c["hex"] for c in palette]
+
         return jsonify({
             "dominant_color": hex_colors[0],
             "palette": hex_colors,
-            "recommended_style": style
+            "weights": [c["weight"] for c in palette],
+            "mode": mode,
+            "recommended_style": recommend_style(palette)
         }), 200
 
     except Exception as e:
@@ -283,52 +466,34 @@ def analyze_layout():
         }), 200
 
     try:
-        suggestions = []
-        clutter_score = 0.0
-        
-        # Simple density/distance check
-        overlaps = 0
-        min_distance = 100.0
-        
-        for i in range(len(objects)):
-            obj_a = objects[i]
-            pos_a = obj_a.get('position', {'x': 0, 'y': 0, 'z': 0})
-            
-            for j in range(i + 1, len(objects)):
-                obj_b = objects[j]
-                pos_b = obj_b.get('position', {'x': 0, 'y': 0, 'z': 0})
-                
-                # Euclidean distance
-                dist = np.sqrt(
-                    (pos_a['x'] - pos_b['x'])**2 + 
-                    (pos_a['y'] - pos_b['y'])**2 + 
-                    (pos_a['z'] - pos_b['z'])**2
-                )
-                
-                if dist < 0.3: # Threshold for "too close" (30cm)
-                    overlaps += 1
-                
-                if dist < min_distance:
-                    min_distance = dist
-        
-        # Normalize clutter score
-        clutter_score = min(1.0, (overlaps / len(objects)) + (0.5 if len(objects) > 10 else 0))
-        
-        if clutter_score > 0.5:
-            suggestions.append("The room looks slightly crowded. Consider increasing space between items.")
-        if overlaps > 0:
-            suggestions.append(f"Detected {overlaps} potential collisions or very close placements.")
-        if min_distance > 2.0 and len(objects) > 2:
-            suggestions.append("Items are spread quite far apart. Try grouping them for a cozy feel.")
-            
-        if not suggestions:
-            suggestions.append("Layout looks balanced!")
+        result = analyze_objects(objects)
 
         return jsonify({
-            "clutter_score": round(clutter_score, 2),
-            "suggestions": suggestions
+            "clutter_score": round(result["clutter_score"], 2),
+            "suggestions": layout_suggestions(result),
+            "overlaps": result["overlaps"],
+            "min_distance": round(result["min_distance"], 3)
         }), 200
 
     except Exception as e:
         print(f"Error analyzing layout: {e}")
         return jsonify({"message": f"Error analyzing layout: {str(e)}"}), 500
+
+@ai_bp.route("/map-objects", methods=["POST"])
+@jwt_required()
+def map_objects():
+    """
+    Batch label -> asset mapping for re-tagging jobs.
+    Body: {"scans": [["sofa", "lamp"], ["desk"]]} or {"detected_objects": ["sofa", "lamp"]}
+    """
+    data = request.get_json()
+    if not data or ('scans' not in data and 'detected_objects' not in data):
+        return jsonify({"message": "scans or detected_objects is required"}), 400
+
+    if 'scans' in data:
+        scans = data.get('scans') or []
+        if not isinstance(scans, list) or not all(isinstance(scan, list) for scan in scans):
+            return jsonify({"message": "scans must be a list of label lists"}), 400
+        return jsonify({"results": furniture_index.map_many(scans)}), 200
+
+    return jsonify({"recommended_items": furniture_index.map_labels(data.get('detected_objects') or [])}), 200
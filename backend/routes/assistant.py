@@ -1,20 +1,153 @@
 import json
 import re
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from services.ai_service import get_ai_service
+from services.semantic_cache import get_semantic_cache, context_key
+from services.conversation_memory import get_conversation_memory
+from services.structured_output import SCHEMAS
+from services.metrics import record_cache_hit
+from services.governor import GovernorRejected
 
 assistant_bp = Blueprint("assistant", __name__, url_prefix="/api/assistant")
 
+SUGGESTED_ACTIONS = ("none", "remove_object", "add_item", "change_color")
+FALLBACK_TEXT = "I'm having a brief creative block. Could you try rephrasing that?"
+
+JSON_RESPONSE_FORMAT = """3. Respond ONLY in the following JSON format:
+    {
+      "text": "Your markdown-formatted response here",
+      "suggested_action": "none | remove_object | add_item | change_color"
+    }
+    
+    If you suggest adding an item, set suggested_action to 'add_item'."""
+
+# Streaming can't wait for a closing brace, so the action comes as a trailer line instead
+ACTION_MARKER = "ACTION:"
+STREAM_RESPONSE_FORMAT = """3. Respond with the Markdown advice only (no JSON, no code fences).
+    4. End with one final line exactly like: ACTION: none | remove_object | add_item | change_color
+    
+    If you suggest adding an item, use ACTION: add_item."""
+
+
+def _build_prompt(room_type, style_theme, current_furniture, user_message, response_format, history=""):
+    if history:
+        history = f"""
+    CONVERSATION SO FAR (use it to resolve follow-up questions; do not repeat earlier advice):
+    {history}
+    """
+    # Advanced prompt for Gemini
+    return f"""
+    You are 'Alankara AI', a world-class interior designer. Give helpful, professional, and friendly advice.
+    
+    CONTEXT (Remember this from the user's room scan):
+    - Room Type: {room_type}
+    - Style Theme: {style_theme}
+    - Detailed Objects in Room: {', '.join(current_furniture) if current_furniture else 'Empty'}
+    {history}
+    USER QUERY: "{user_message}"
+    
+    TASK:
+    1. Provide advice using beautiful Markdown (use bold, italics, and bullet points).
+    2. Be specific to the room type and style provided.
+    {response_format}
+    """
+
+
+def _wants_stream():
+    return request.args.get('stream') == '1' or 'text/event-stream' in request.headers.get('Accept', '')
+
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+class _ActionTrailerSplitter:
+    """
+    Splits streamed text into user-visible chunks and the trailing 'ACTION: x' line.
+    Only a partial line that could still turn into the marker is held back.
+    """
+
+    def __init__(self):
+        self.pending = ""
+        self.action = "none"
+
+    def _could_be_marker(self, line):
+        line = line.lstrip()
+        return ACTION_MARKER.startswith(line) or line.startswith(ACTION_MARKER)
+
+    def _take_action(self, line):
+        action = line.strip()[len(ACTION_MARKER):].strip().strip("`*").lower()
+        if action in SUGGESTED_ACTIONS:
+            self.action = action
+
+    def feed(self, chunk):
+        self.pending += chunk
+        out = []
+        *complete, self.pending = self.pending.split("\n")
+        for line in complete:
+            if line.strip().startswith(ACTION_MARKER):
+                self._take_action(line)
+            else:
+                out.append(line + "\n")
+        if self.pending and not self._could_be_marker(self.pending):
+            out.append(self.pending)
+            self.pending = ""
+        return "".join(out)
+
+    def finish(self):
+        rest, self.pending = self.pending, ""
+        if rest.strip().startswith(ACTION_MARKER):
+            self._take_action(rest)
+            return ""
+        return rest
+
+
+def _replay_answer(answer):
+    yield _sse("chunk", {"text": answer.get("text", "")})
+    yield _sse("done", {"text": answer.get("text", ""), "suggested_action": answer.get("suggested_action", "none")})
+
+
+def _stream_chat(ai_service, prompt, on_complete=None):
+    splitter = _ActionTrailerSplitter()
+    parts = []
+    failed = False
+    try:
+        for chunk in ai_service.stream_assistant_response(prompt):
+            visible = splitter.feed(chunk)
+            if visible:
+                parts.append(visible)
+                yield _sse("chunk", {"text": visible})
+        visible = splitter.finish()
+        if visible:
+            parts.append(visible)
+            yield _sse("chunk", {"text": visible})
+    except GovernorRejected as e:
+        # Headers are already sent, so the 429 travels as an event
+        print(f"Streaming assistant chat refused: {e}")
+        failed = True
+        yield _sse("error", {"message": "AI service is busy. Please retry shortly.", "retry_after": e.retry_after})
+        if not parts:
+            parts.append(FALLBACK_TEXT)
+            yield _sse("chunk", {"text": FALLBACK_TEXT})
+    except Exception as e:
+        print(f"Error in streaming assistant chat: {e}")
+        failed = True
+        if not parts:
+            parts.append(FALLBACK_TEXT)
+            yield _sse("chunk", {"text": FALLBACK_TEXT})
+
+    answer = {"text": "".join(parts).strip(), "suggested_action": splitter.action}
+    if on_complete and not failed and answer["text"]:
+        on_complete(answer)
+    yield _sse("done", answer)
+
+
 @assistant_bp.route("/chat", methods=["POST"])
 @jwt_required()
 def chat():
+    # Chat only talks to Gemini; local vision models stay unloaded
     ai_service = get_ai_service()
-    
-    # We no longer need assistant_pipe check here as Gemini is a cloud API
-    # But lazy-init local vision models if they'll be used for context (future)
-    if not ai_service._models_loaded:
-        ai_service._init_models()
 
     data = request.get_json()
     if not data or 'user_message' not in data:
@@ -30,8 +163,8 @@ def chat():
     
     # Override with rich context if available
     from routes.ai import ai_context_store
-    if context_id and context_id in ai_context_store:
-        ctx = ai_context_store[context_id]
+    ctx = ai_context_store.get(context_id) if context_id else None
+    if ctx:
         room_type = ctx.get("room_type", room_type)
         style_theme = ctx.get("style", style_theme)
         # Append detected objects to current furniture
@@ -39,28 +172,53 @@ def chat():
         if detected:
             current_furniture = list(set(current_furniture + detected))
 
-    # Advanced prompt for Gemini
-    prompt = f"""
-    You are 'Alankara AI', a world-class interior designer. Give helpful, professional, and friendly advice.
-    
-    CONTEXT (Remember this from the user's room scan):
-    - Room Type: {room_type}
-    - Style Theme: {style_theme}
-    - Detailed Objects in Room: {', '.join(current_furniture) if current_furniture else 'Empty'}
-    
-    USER QUERY: "{user_message}"
-    
-    TASK:
-    1. Provide advice using beautiful Markdown (use bold, italics, and bullet points).
-    2. Be specific to the room type and style provided.
-    3. Respond ONLY in the following JSON format:
-    {{
-      "text": "Your markdown-formatted response here",
-      "suggested_action": "none | remove_object | add_item | change_color"
-    }}
-    
-    If you suggest adding an item, set suggested_action to 'add_item'.
-    """
+    # Earlier turns of this conversation, per user and scan context, within a fixed token budget
+    memory = get_conversation_memory()
+    session_id = f"{get_jwt_identity()}:{context_id}" if context_id else None
+    session = memory.load(session_id)
+    history = memory.history_prompt(session)
+
+    # Reworded repeats of a recent question reuse its answer instead of a new Gemini call.
+    # Follow-ups depend on earlier turns, so only opening questions are served from the cache.
+    semantic_cache = get_semantic_cache()
+    semantic_context = context_key(room_type, style_theme, current_furniture, owner=get_jwt_identity())
+    cached_answer = None
+    cache_headers = {}
+    if semantic_cache and not history and isinstance(user_message, str) and user_message.strip():
+        cached_answer, score = semantic_cache.lookup(user_message, semantic_context)
+        cache_headers = {
+            "X-Semantic-Cache": "HIT" if cached_answer else "MISS",
+            "X-Semantic-Cache-Score": f"{score:.3f}"
+        }
+        if cached_answer:
+            record_cache_hit("chat", "semantic")
+
+    cache_headers["X-Conversation-Turns"] = str(session["turn_count"])
+
+    def remember(answer):
+        if semantic_cache and cache_headers.get("X-Semantic-Cache") == "MISS":
+            semantic_cache.add(user_message, semantic_context, answer)
+        memory.append(session_id, user_message, answer.get("text", ""))
+
+    if _wants_stream():
+        if cached_answer:
+            memory.append(session_id, user_message, cached_answer.get("text", ""))
+            events = _replay_answer(cached_answer)
+        else:
+            prompt = _build_prompt(room_type, style_theme, current_furniture, user_message,
+                                   STREAM_RESPONSE_FORMAT, history)
+            events = _stream_chat(ai_service, prompt, on_complete=remember)
+        return Response(stream_with_context(events), mimetype="text/event-stream", headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            **cache_headers
+        })
+
+    if cached_answer:
+        memory.append(session_id, user_message, cached_answer.get("text", ""))
+        return jsonify(cached_answer), 200, cache_headers
+
+    prompt = _build_prompt(room_type, style_theme, current_furniture, user_message, JSON_RESPONSE_FORMAT, history)
     
     try:
         raw_text = ai_service.get_assistant_response(prompt)
@@ -68,20 +226,26 @@ def chat():
             raise ValueError("Empty response from AI")
             
         print(f"Assistant Raw Output: {raw_text}")
-        response_data = ai_service.parse_json_response(raw_text)
+        response_data = ai_service.parse_json_response(raw_text, SCHEMAS["assistant_chat"])
         
-        if not response_data:
+        if response_data:
+            remember(response_data)
+        else:
             # Emergency extraction if JSON is wrapped in text
             response_data = {
                 "text": raw_text.strip(),
                 "suggested_action": "none"
             }
+            memory.append(session_id, user_message, response_data["text"])
             
-        return jsonify(response_data), 200
+        return jsonify(response_data), 200, cache_headers
 
+    except GovernorRejected:
+        # Handled app-wide as 429 + Retry-After
+        raise
     except Exception as e:
         print(f"Error in assistant chat: {e}")
         return jsonify({
-            "text": "I'm having a brief creative block. Could you try rephrasing that?",
+            "text": FALLBACK_TEXT,
             "suggested_action": "none"
         }), 200
@@ -19,14 +19,15 @@ def search_products():
         return jsonify({"message": "Search query is required"}), 400
         
     try:
-        from services.product_scraper import get_or_scrape_products
-        results = get_or_scrape_products(query)
+        from services.product_scraper import search_products_or_scrape
+        results, cache_status = search_products_or_scrape(query)
         
         return jsonify({
             "message": "Products retrieved successfully",
             "query": query,
-            "results": results
-        }), 200
+            "results": results,
+            "cache": cache_status
+        }), 200, {"X-Cache": cache_status.upper()}
     except Exception as e:
         print(f"Error in product search: {e}")
         return jsonify({"message": "Failed to search products", "error": str(e)}), 500
@@ -35,8 +36,9 @@ def search_products():
 @jwt_required()
 def auto_book_product():
     """
-    Initiates LangChain Agent to automatically book a product.
-    If Agent fails or needs info, returns FALLBACK or INFO_REQUIRED.
+    Books a product. By default the user is sent straight to the product page (FALLBACK).
+    With "mode": "agent" the LangChain booking agent runs instead; it may finish, or return
+    INFO_REQUIRED/PROCESSING with a session_id to continue via /book/resume.
     """
     current_user_id = get_jwt_identity()
     data = request.get_json()
@@ -44,6 +46,22 @@ def auto_book_product():
     
     if not product_url:
         return jsonify({"message": "Product URL is required"}), 400
+
+    if data.get("mode") == "agent":
+        from services.agent_service import run_booking_agent
+        from services.governor import GovernorRejected
+        try:
+            result = run_booking_agent(product_url, current_user_id)
+            return _agent_response(result, product_url)
+        except GovernorRejected:
+            raise
+        except Exception as e:
+            print(f"Error in booking agent: {e}")
+            return jsonify({
+                "status": "FALLBACK",
+                "message": "Booking assistant failed; redirecting to product page for purchase.",
+                "redirect_url": product_url
+            }), 200
         
     try:
         # User requested to bypass the LangChain agent security flow and 
@@ -62,24 +80,41 @@ def auto_book_product():
             "redirect_url": product_url
         }), 500
 
+def _agent_response(result, product_url):
+    if result.get("status") == "FALLBACK":
+        # Same contract as the default flow: the client opens the product page
+        result.setdefault("redirect_url", product_url)
+        result.setdefault("message", "Redirecting to product page for purchase.")
+    return jsonify(result), 200
+
 @products_bp.route("/book/resume", methods=["POST"])
 @jwt_required()
 def resume_booking():
     """
-    Resumes an agent session that was paused for user input.
+    Resumes an agent session that was paused for user input (INFO_REQUIRED), or that ran
+    out of turns for one request (PROCESSING, answer optional), from its last checkpoint.
     """
     data = request.get_json()
     session_id = data.get("session_id")
     user_answer = data.get("answer")
     
-    if not session_id or not user_answer:
-        return jsonify({"message": "Session ID and Answer are required"}), 400
+    if not session_id:
+        return jsonify({"message": "Session ID is required"}), 400
         
+    from services.agent_service import (resume_booking_agent, AgentSessionNotFound,
+                                        AgentSessionBusy)
+    from services.governor import GovernorRejected
     try:
-        # TODO: Resume Agent Logic
-        return jsonify({
-            "status": "FAILED",
-            "message": "Resume logic not implemented"
-        }), 501
+        result = resume_booking_agent(session_id, get_jwt_identity(), user_answer)
+        return _agent_response(result, result.get("product_url"))
+    except AgentSessionNotFound as e:
+        return jsonify({"message": str(e)}), 404
+    except AgentSessionBusy as e:
+        return jsonify({"message": str(e)}), 409
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except GovernorRejected:
+        raise
     except Exception as e:
+        print(f"Error resuming booking: {e}")
         return jsonify({"message": str(e)}), 500
@@ -1,9 +1,57 @@
 import os
 import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage, ToolMessage, AIMessage
+from langchain_core.messages import HumanMessage, ToolMessage, AIMessage, messages_from_dict, messages_to_dict
 from langchain_core.tools import tool
 from services.product_scraper import get_or_scrape_products
+from services.structured_output import SCHEMAS, extract_json
+from services.metrics import track_ai_call, registry
+from services.governor import get_governor
+from services.circuit_breaker import get_breaker, CircuitOpen
+from services.context_store import create_store
+
+# Default time a tool call may take before the agent is told it timed out
+AGENT_TOOL_TIMEOUT_SECONDS = float(os.getenv("AGENT_TOOL_TIMEOUT_SECONDS", "30"))
+# Tool calls of one turn run in parallel on this many threads (shared by all bookings)
+AGENT_TOOL_WORKERS = int(os.getenv("AGENT_TOOL_WORKERS", "8"))
+# Per-tool overrides; find may hit the vendor search, cart drives a browser page
+AGENT_TOOL_TIMEOUTS = {"find": 20.0, "cart": 45.0}
+# Tools whose results are never reused: asking again means the agent needs a new answer
+UNMEMOIZED_TOOLS = {"ask"}
+
+# Model turns run per HTTP request (keeps each request inside proxy/tunnel timeouts);
+# a session that needs more is checkpointed and continued via /book/resume
+AGENT_TURNS_PER_REQUEST = int(os.getenv("AGENT_TURNS_PER_REQUEST", "3"))
+AGENT_MAX_TURNS = int(os.getenv("AGENT_MAX_TURNS", "10"))
+AGENT_SESSION_TTL_SECONDS = int(os.getenv("AGENT_SESSION_TTL_SECONDS", "3600"))
+AGENT_MAX_SESSIONS = int(os.getenv("AGENT_MAX_SESSIONS", "1000"))
+# A request's claim on a session expires after this long (its worker died mid-turn)
+AGENT_RUNNING_LEASE_SECONDS = int(os.getenv("AGENT_RUNNING_LEASE_SECONDS", "180"))
+
+_tool_duration = registry.histogram(
+    "agent_tool_duration_seconds", "Booking agent tool call latency.", ("tool", "outcome"))
+
+_llm = None
+_llm_key = None
+_llm_lock = threading.Lock()
+_tool_executor = None
+_tool_executor_lock = threading.Lock()
+_session_store = None
+_session_store_lock = threading.Lock()
+
+
+class AgentSessionNotFound(Exception):
+    """No resumable session with that id for this user (finished, expired or never existed)."""
+    pass
+
+
+class AgentSessionBusy(Exception):
+    """The session is already being advanced by another request."""
+    pass
 
 # --- TOOLS ---
 
@@ -35,62 +83,288 @@ def buy_tool(product_url: str) -> str:
     print(f"AGENT_TOOL: buy({product_url})")
     return json.dumps({"status": "FALLBACK", "reason": "SECURE_HANDOFF_REQUIRED"})
 
-# --- MANUAL AGENT LOOP ---
+TOOLS = [find_tool, cart_tool, ask_tool, buy_tool]
+TOOL_MAP = {t.name: t for t in TOOLS}
 
-def run_booking_agent(product_url: str, user_id: int):
+
+def get_booking_llm():
+    """The Gemini chat model with the booking tools bound; built once per process (per API key)."""
+    global _llm, _llm_key
     api_key = os.getenv("GEMINI_API_KEY")
-    os.environ["GOOGLE_API_KEY"] = api_key
-    
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=api_key, temperature=0.0)
-    tools = [find_tool, cart_tool, ask_tool, buy_tool]
-    llm_with_tools = llm.bind_tools(tools)
-    
-    messages = [
-        HumanMessage(content=f"You are a shopping assistant. Buy this item: {product_url}. If it's a name, search for it. Use tools. Conclude with a JSON final answer: {{\"status\": \"...\", \"reason\": \"...\"}}")
-    ]
-    
-    # Tool mapping for execution
-    tool_map = {t.name: t for t in tools}
-    
-    # Limit turns to prevent tunnel timeouts (503)
-    max_turns = 3
-    for i in range(max_turns):
-        print(f"AGENT_LOOP: Turn {i+1}")
-        response = llm_with_tools.invoke(messages)
+    if _llm is None or _llm_key != api_key:
+        with _llm_lock:
+            if _llm is None or _llm_key != api_key:
+                os.environ["GOOGLE_API_KEY"] = api_key
+                llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=api_key, temperature=0.0)
+                _llm = llm.bind_tools(TOOLS)
+                _llm_key = api_key
+    return _llm
+
+
+def _get_tool_executor():
+    global _tool_executor
+    if _tool_executor is None:
+        with _tool_executor_lock:
+            if _tool_executor is None:
+                _tool_executor = ThreadPoolExecutor(max_workers=AGENT_TOOL_WORKERS, thread_name_prefix="agent-tool")
+    return _tool_executor
+
+
+def _tool_key(tool_call):
+    return f"{tool_call['name']}:{json.dumps(tool_call['args'], sort_keys=True, default=str)}"
+
+
+def _invoke_tool(app, tool_name, tool_args):
+    """Run one tool; returns (result, seconds). Worker threads get the request's app context."""
+    started = time.perf_counter()
+    tool_func = TOOL_MAP.get(tool_name)
+    if tool_func is None:
+        result = f"Error: Tool {tool_name} not found."
+    elif app is None:
+        result = tool_func.invoke(tool_args)
+    else:
+        with app.app_context():
+            result = tool_func.invoke(tool_args)
+    return str(result), time.perf_counter() - started
+
+
+def run_tool_calls(tool_calls, memo):
+    """
+    Run one turn's tool calls concurrently, each under its own timeout, so the turn takes
+    as long as its slowest tool. Identical calls (same tool and arguments) run once per
+    session: `memo` maps them to earlier results. Errors and timeouts are returned to the
+    model as error results instead of aborting the turn.
+    Returns (results in call order, per-call timings).
+    """
+    from flask import current_app, has_app_context
+    app = current_app._get_current_object() if has_app_context() else None
+
+    keys = [_tool_key(tc) for tc in tool_calls]
+    started = time.perf_counter()
+    futures = {}
+    for key, tool_call in zip(keys, tool_calls):
+        if key not in memo and key not in futures:
+            print(f"AGENT_LOOP: Executing {tool_call['name']}...")
+            futures[key] = _get_tool_executor().submit(_invoke_tool, app, tool_call["name"], tool_call["args"])
+
+    results, timings = {}, []
+    for key, tool_call in zip(keys, tool_calls):
+        tool_name = tool_call["name"]
+        if key in results or key not in futures:
+            timings.append({"tool": tool_name, "ms": 0.0, "outcome": "memo"})
+            continue
+        future = futures[key]
+        timeout = AGENT_TOOL_TIMEOUTS.get(tool_name, AGENT_TOOL_TIMEOUT_SECONDS)
+        # All calls started together; each waits only for what is left of its own budget
+        done, _ = wait([future], timeout=max(0.0, started + timeout - time.perf_counter()))
+        if not done:
+            future.cancel()
+            result, seconds, outcome = json.dumps(
+                {"status": "ERROR", "message": f"{tool_name} timed out after {timeout:g}s"}), timeout, "timeout"
+        elif future.exception() is not None:
+            result, seconds, outcome = json.dumps(
+                {"status": "ERROR", "message": str(future.exception())}), time.perf_counter() - started, "error"
+        else:
+            (result, seconds), outcome = future.result(), "ok"
+            # A timed-out call may succeed on a retry, so only completed calls are remembered
+            if tool_name not in UNMEMOIZED_TOOLS:
+                memo[key] = result
+        results[key] = result
+        _tool_duration.observe(seconds, tool=tool_name, outcome=outcome)
+        timings.append({"tool": tool_name, "ms": round(seconds * 1000, 1), "outcome": outcome})
+
+    return [results[key] if key in results else memo[key] for key in keys], timings
+
+# --- SESSIONS ---
+
+def _get_session_store():
+    global _session_store
+    if _session_store is None:
+        with _session_store_lock:
+            if _session_store is None:
+                _session_store = create_store("agent_sessions", max_entries=AGENT_MAX_SESSIONS,
+                                              ttl=AGENT_SESSION_TTL_SECONDS)
+    return _session_store
+
+
+def _checkpoint(session, messages):
+    """Persist everything needed to continue: messages, tool memo, timings and any pending question."""
+    session["messages"] = messages_to_dict(messages)
+    session["updated_at"] = time.time()
+    _get_session_store().set(session["session_id"], session)
+
+
+def _load_session(session_id, user_id):
+    session = _get_session_store().get(session_id)
+    if not isinstance(session, dict) or session.get("user_id") != str(user_id):
+        raise AgentSessionNotFound(f"No resumable booking session '{session_id}'")
+    return session
+
+
+def _tool_status(result):
+    try:
+        parsed = json.loads(result)
+    except (TypeError, ValueError):
+        return None, {}
+    return (parsed.get("status"), parsed) if isinstance(parsed, dict) else (None, {})
+
+
+def _claim(session_id):
+    """Atomically mark the session as being advanced by this request (expires if the worker dies)."""
+    if not _get_session_store().add(f"lock:{session_id}", time.time(), ttl=AGENT_RUNNING_LEASE_SECONDS):
+        raise AgentSessionBusy(f"Booking session '{session_id}' is already running")
+
+
+def _release(session_id):
+    _get_session_store().delete(f"lock:{session_id}")
+
+
+def _finish(session, messages):
+    _get_session_store().delete(session["session_id"])
+    final_text = messages[-1].content
+    print(f"AGENT_FINAL: {final_text}")
+
+    result = extract_json(final_text, SCHEMAS["booking_result"])
+    if result is None:
+        result = {"status": "FAILED", "reason": "Agent output was not valid JSON", "raw": final_text}
+    result["session_id"] = session["session_id"]
+    result["product_url"] = session["product_url"]
+    result["timings"] = session["timings"]
+    return result
+
+
+# --- MANUAL AGENT LOOP ---
+
+def _run_turns(session, messages):
+    """
+    Advance a session by up to AGENT_TURNS_PER_REQUEST model turns, checkpointing after each.
+    Stops early when the agent concludes, or when it calls `ask`: the question is returned
+    as INFO_REQUIRED and the ask call is left open until resume_booking_agent answers it.
+    """
+    llm_with_tools = get_booking_llm()
+    memo, timings = session["memo"], session["timings"]
+
+    for _ in range(AGENT_TURNS_PER_REQUEST):
+        if session["turns"] >= AGENT_MAX_TURNS:
+            break
+        session["turns"] += 1
+        turn = session["turns"]
+        print(f"AGENT_LOOP: Turn {turn}")
+        turn_start = time.perf_counter()
+        try:
+            with get_breaker("booking_agent").call(), get_governor().slot(), \
+                    track_ai_call("booking_agent") as call:
+                response = llm_with_tools.invoke(messages)
+                call.record_usage(response)
+        except CircuitOpen:
+            # Same outcome as a failed agent: hand the user the product page
+            _get_session_store().delete(session["session_id"])
+            return {"status": "FALLBACK", "reason": "AI_UNAVAILABLE", "session_id": session["session_id"],
+                    "product_url": session["product_url"]}
+        except Exception as e:
+            session["turns"] -= 1
+            if not session["turns"]:
+                # Nothing paid for yet: drop the session and let the caller fall back
+                _get_session_store().delete(session["session_id"])
+                raise
+            # Keep the turns already paid for; the client resumes from this checkpoint
+            print(f"AGENT_LOOP: Turn {turn} failed, session checkpointed: {e}")
+            session["status"] = "PROCESSING"
+            _checkpoint(session, messages)
+            return {"status": "PROCESSING", "session_id": session["session_id"],
+                    "message": "Booking assistant was interrupted; resume to continue.", "timings": timings}
+        llm_ms = round((time.perf_counter() - turn_start) * 1000, 1)
         messages.append(response)
-        
+
         if not response.tool_calls:
             # End of conversation
-            break
-            
-        for tool_call in response.tool_calls:
-            tool_name = tool_call["name"]
-            tool_args = tool_call["args"]
-            print(f"AGENT_LOOP: Executing {tool_name}...")
-            
-            # Execute tool
-            tool_func = tool_map.get(tool_name)
-            if tool_func:
-                result = tool_func.invoke(tool_args)
-            else:
-                result = f"Error: Tool {tool_name} not found."
-                
+            timings.append({"turn": turn, "llm_ms": llm_ms, "tools_ms": 0.0, "tools": []})
+            return _finish(session, messages)
+
+        tools_start = time.perf_counter()
+        results, tool_timings = run_tool_calls(response.tool_calls, memo)
+        timings.append({"turn": turn, "llm_ms": llm_ms,
+                        "tools_ms": round((time.perf_counter() - tools_start) * 1000, 1), "tools": tool_timings})
+        print(f"AGENT_LOOP: Turn {turn} timings {timings[-1]}")
+
+        pending = None
+        for tool_call, result in zip(response.tool_calls, results):
+            status, parsed = _tool_status(result)
+            if pending is None and tool_call["name"] == "ask" and status == "INFO_REQUIRED":
+                # Answered on resume, with the user's reply as this tool call's result
+                pending = {"tool_call_id": tool_call["id"], "question": parsed.get("question", "")}
+                continue
             # Append ToolMessage with explicit name
             messages.append(ToolMessage(
-                content=str(result),
+                content=result,
                 tool_call_id=tool_call["id"],
-                name=tool_name # Explicitly set name to avoid "empty name" error
+                name=tool_call["name"] # Explicitly set name to avoid "empty name" error
             ))
-            
-    # Final response extraction
-    final_text = messages[-1].content
-    print(f"AGENT_FINAL: {final_text}")
-    
+
+        if pending is not None:
+            session["status"] = "INFO_REQUIRED"
+            session["pending"] = pending
+            _checkpoint(session, messages)
+            return {"status": "INFO_REQUIRED", "question": pending["question"],
+                    "session_id": session["session_id"], "timings": timings}
+        _checkpoint(session, messages)
+
+    if session["turns"] >= AGENT_MAX_TURNS:
+        return _finish(session, messages)
+    # Out of turns for this request but not for the session
+    session["status"] = "PROCESSING"
+    _checkpoint(session, messages)
+    return {"status": "PROCESSING", "session_id": session["session_id"], "timings": timings}
+
+
+def run_booking_agent(product_url: str, user_id: int):
+    """Start a booking session. Returns a final status, or INFO_REQUIRED/PROCESSING with a session_id to resume."""
+    messages = [
+        HumanMessage(content=f"You are a shopping assistant. Buy this item: {product_url}. If it's a name, search for it. Use tools. Conclude with a JSON final answer: {{\"status\": \"...\", \"reason\": \"...\"}}")
+    ]
+    session = {
+        "session_id": uuid.uuid4().hex,
+        "user_id": str(user_id),
+        "product_url": product_url,
+        "status": "RUNNING",
+        "turns": 0,
+        "pending": None,
+        "memo": {},
+        "timings": [],
+        "created_at": time.time(),
+    }
+    _claim(session["session_id"])
+    try:
+        return _run_turns(session, messages)
+    finally:
+        _release(session["session_id"])
+
+
+def resume_booking_agent(session_id: str, user_id: int, answer: str = None):
+    """
+    Continue a checkpointed session from its last turn. A session waiting on a question
+    needs the user's answer; one that only ran out of turns (PROCESSING) continues as is.
+    """
+    _load_session(session_id, user_id)
+    _claim(session_id)
     try:
-        # Clean markdown if present
-        if "```" in final_text:
-            final_text = final_text.split("```")[1]
-            if final_text.startswith("json"): final_text = final_text[4:]
-        return json.loads(final_text.strip())
-    except:
-        return {"status": "FAILED", "reason": "Agent output was not valid JSON", "raw": final_text}
+        # Re-read under the claim: another request may have advanced or finished it meanwhile
+        session = _load_session(session_id, user_id)
+        pending = session.get("pending")
+        if pending and not answer:
+            raise ValueError("This booking session is waiting for an answer")
+
+        messages = messages_from_dict(session["messages"])
+        if pending:
+            messages.append(ToolMessage(
+                content=json.dumps({"status": "ANSWERED", "question": pending["question"], "answer": answer}),
+                tool_call_id=pending["tool_call_id"],
+                name="ask"
+            ))
+        elif answer:
+            messages.append(HumanMessage(content=answer))
+        session["pending"] = None
+        session["status"] = "RUNNING"
+        return _run_turns(session, messages)
+    finally:
+        _release(session_id)
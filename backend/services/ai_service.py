@@ -1,32 +1,213 @@
 # Deferred imports for speed
 # import torch
 # from transformers import pipeline
+import gc
 import json
-import re
 import os
+import sys
+import time
+import threading
 import google.generativeai as genai
 from dotenv import load_dotenv
+from services.response_cache import ResponseCache, prompt_key
+from services.singleflight import model_calls
+from services.metrics import track_ai_call, record_cache_hit
+from services.governor import get_governor, GovernorRejected, PRIORITY_INTERACTIVE, PRIORITY_DEFAULT
+from services.circuit_breaker import get_breaker, CircuitOpen
+from services.structured_output import (
+    IncrementalJSONExtractor, JSON_GENERATION_CONFIG, extract_json, validate
+)
 
 # Load env vars
 load_dotenv()
 
+# Local model memory budget and how long an unused model stays resident
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "4096"))
+MODEL_IDLE_TIMEOUT_SECONDS = int(os.getenv("MODEL_IDLE_TIMEOUT_SECONDS", "900"))
+# Local models to load and pin at startup, e.g. "detr,blip". Under gunicorn with preload_app the
+# weights load once in the master and workers share the pages copy-on-write.
+AI_PRELOAD_MODELS = [m.strip() for m in os.getenv("AI_PRELOAD_MODELS", "").split(",") if m.strip()]
+
+
+def _model_size_bytes(model):
+    """Resident size of a transformers pipeline/model: parameter and buffer bytes."""
+    module = getattr(model, "model", model)
+    try:
+        size = sum(p.numel() * p.element_size() for p in module.parameters())
+        size += sum(b.numel() * b.element_size() for b in module.buffers())
+        return size
+    except Exception:
+        return 0
+
+
+class ModelRegistry:
+    """
+    Local models loaded only when a route asks for them, kept under a memory budget
+    (least recently used goes first) and unloaded after sitting idle.
+    """
+
+    def __init__(self, budget_mb=MODEL_MEMORY_BUDGET_MB, idle_timeout=MODEL_IDLE_TIMEOUT_SECONDS):
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self.idle_timeout = idle_timeout
+        self._specs = {}    # name -> (loader, estimated_bytes)
+        self._entries = {}  # name -> {"model", "size_bytes", "load_seconds", "loaded_at", "last_used", "pinned"}
+        self._history = {}  # name -> {"loads", "unloads", "last_load_seconds"}
+        self._lock = threading.RLock()
+        self._load_locks = {}
+        self._reaper = None
+        # Threads do not survive fork; a worker starts its own reaper on its first load
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._reaper = None
+        # A lock held by a parent thread mid-load would never be released in the child
+        self._lock = threading.RLock()
+        self._load_locks = {name: threading.Lock() for name in self._load_locks}
+
+    def register(self, name, loader, estimated_mb=0):
+        with self._lock:
+            self._specs[name] = (loader, estimated_mb * 1024 * 1024)
+            self._load_locks[name] = threading.Lock()
+            self._history.setdefault(name, {"loads": 0, "unloads": 0, "last_load_seconds": None})
+
+    def is_loaded(self, name):
+        return name in self._entries
+
+    def get(self, name):
+        """Return the model, loading it first if needed. Raises KeyError for unknown names."""
+        entry = self._entries.get(name)
+        if entry is None:
+            with self._load_locks[name]:
+                entry = self._entries.get(name)
+                if entry is None:
+                    entry = self._load(name)
+        entry["last_used"] = time.time()
+        return entry["model"]
+
+    def _load(self, name):
+        loader, estimated_bytes = self._specs[name]
+        self._make_room(estimated_bytes, keep=name)
+
+        print(f"Loading local model '{name}'...")
+        start = time.time()
+        model = loader()
+        load_seconds = time.time() - start
+        size_bytes = _model_size_bytes(model) or estimated_bytes
+
+        entry = {
+            "model": model,
+            "size_bytes": size_bytes,
+            "load_seconds": load_seconds,
+            "loaded_at": time.time(),
+            "last_used": time.time(),
+            "pinned": False,
+        }
+        with self._lock:
+            self._entries[name] = entry
+            self._history[name]["loads"] += 1
+            self._history[name]["last_load_seconds"] = round(load_seconds, 2)
+        print(f"Model '{name}' loaded in {load_seconds:.1f}s ({size_bytes / 1024 / 1024:.0f} MB)")
+
+        self._make_room(0, keep=name)
+        self._start_reaper()
+        return entry
+
+    def _resident_bytes(self):
+        return sum(e["size_bytes"] for e in self._entries.values())
+
+    def _make_room(self, needed_bytes, keep=None):
+        """Unload least recently used models until `needed_bytes` more fits in the budget."""
+        with self._lock:
+            candidates = sorted(
+                (e["last_used"], n) for n, e in self._entries.items() if n != keep and not e["pinned"]
+            )
+            for _, victim in candidates:
+                if self._resident_bytes() + needed_bytes <= self.budget_bytes:
+                    break
+                self.unload(victim)
+
+    def pin(self, name):
+        """Exempt a loaded model from idle/budget unloading (used for models preloaded before fork)."""
+        self.get(name)
+        self._entries[name]["pinned"] = True
+
+    def unload(self, name):
+        with self._lock:
+            entry = self._entries.pop(name, None)
+            if entry is None:
+                return
+            self._history[name]["unloads"] += 1
+        del entry
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        print(f"Model '{name}' unloaded")
+
+    def unload_idle(self):
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            idle = [n for n, e in self._entries.items() if e["last_used"] < cutoff and not e["pinned"]]
+        for name in idle:
+            self.unload(name)
+
+    def _start_reaper(self):
+        with self._lock:
+            if self._reaper is not None:
+                return
+
+            def reap():
+                while True:
+                    time.sleep(max(5, min(60, self.idle_timeout)))
+                    self.unload_idle()
+
+            self._reaper = threading.Thread(target=reap, name="model-reaper", daemon=True)
+            self._reaper.start()
+
+    def stats(self):
+        with self._lock:
+            models = {}
+            for name in self._specs:
+                entry = self._entries.get(name)
+                models[name] = dict(self._history[name], loaded=entry is not None)
+                if entry:
+                    models[name].update({
+                        "size_mb": round(entry["size_bytes"] / 1024 / 1024, 1),
+                        "load_seconds": round(entry["load_seconds"], 2),
+                        "idle_seconds": round(time.time() - entry["last_used"], 1),
+                        "pinned": entry["pinned"],
+                    })
+            return {
+                "budget_mb": round(self.budget_bytes / 1024 / 1024),
+                "resident_mb": round(self._resident_bytes() / 1024 / 1024, 1),
+                "idle_timeout_seconds": self.idle_timeout,
+                "torch_imported": "torch" in sys.modules,
+                "models": models,
+            }
+
+
 # Model Singleton
 class AIService:
     _instance = None
+    _instance_lock = threading.Lock()
     
     @classmethod
     def get_instance(cls):
         if cls._instance is None:
-            cls._instance = AIService()
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = AIService()
         return cls._instance
 
     def __init__(self):
-        self.device = "cpu" # Default, updated in _init_models
-        self.cache = {}
+        self.device = "cpu" # Default, updated when a local model loads
+        self.cache = ResponseCache()
         self.gemini_model = None
-        self.detr_pipe = None
-        self.blip_pipe = None
-        self._models_loaded = False
+
+        # Local vision models (DETR/BLIP) load only when a route asks for them
+        self.models = ModelRegistry()
+        self.models.register("detr", self._load_detr, estimated_mb=170)
+        self.models.register("blip", self._load_blip, estimated_mb=1000)
         
         # Init Gemini
         api_key = os.getenv("GEMINI_API_KEY")
@@ -36,26 +217,45 @@ class AIService:
             print("Gemini 2.5 Flash initialized")
         else:
             print("Warning: GEMINI_API_KEY not found in environment")
+
+    def _pipeline(self, task, model_name):
+        import torch
+        from transformers import pipeline
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        return pipeline(task, model=model_name, device=self.device)
+
+    def _load_detr(self):
+        return self._pipeline("object-detection", "facebook/detr-resnet-50")
+
+    def _load_blip(self):
+        return self._pipeline("image-to-text", "Salesforce/blip-image-captioning-base")
+
+    @property
+    def detr_pipe(self):
+        return self.models.get("detr")
+
+    @property
+    def blip_pipe(self):
+        return self.models.get("blip")
+
+    @property
+    def _models_loaded(self):
+        return self.models.is_loaded("detr") and self.models.is_loaded("blip")
     
     def _init_models(self):
+        """Eagerly load both local vision models. Prefer detr_pipe/blip_pipe, which load on demand."""
         if self._models_loaded:
             return
             
-        print("Initializing Local AI Models (Lazy)...")
+        print("Initializing Local AI Models...")
         try:
-            import torch
-            from transformers import pipeline
-            self.device = "cuda" if torch.cuda.is_available() else "cpu"
-            
-            # We keep local models for image analysis (DETR/BLIP)
-            self.detr_pipe = pipeline("object-detection", model="facebook/detr-resnet-50", device=self.device)
-            self.blip_pipe = pipeline("image-to-text", model="Salesforce/blip-image-captioning-base", device=self.device)
-            self._models_loaded = True
+            self.models.get("detr")
+            self.models.get("blip")
             print(f"Local vision models loaded successfully on {self.device}")
         except Exception as e:
             print(f"Error loading models in AIService: {e}")
 
-    def get_assistant_response(self, prompt):
+    def get_assistant_response(self, prompt, priority=PRIORITY_INTERACTIVE):
         # Always try to get key lazily (pick up from env even if not set at init time)
         if not self.gemini_model:
             api_key = os.getenv("GEMINI_API_KEY")
@@ -66,41 +266,192 @@ class AIService:
             else:
                 return "I'm having trouble connecting to my brain. Please check the API key."
         
-        if prompt in self.cache:
-            return self.cache[prompt]
+        cached = self.cache.get(prompt)
+        if cached is not None:
+            record_cache_hit("chat", "response")
+            return cached
             
+        # Identical prompts already in flight share one Gemini call
+        return model_calls.do(f"chat:{prompt_key(prompt)}", self._generate, prompt, priority)
+
+    def _generate(self, prompt, priority):
         try:
             # Request JSON structure specifically from Gemini
-            response = self.gemini_model.generate_content(prompt)
-            result_text = response.text
+            with get_breaker("chat").call(), get_governor().slot(priority), track_ai_call("chat") as call:
+                response = self.gemini_model.generate_content(prompt)
+                call.record_usage(response)
+                result_text = response.text
             
-            if len(self.cache) > 100:
-                self.cache.clear()
-            self.cache[prompt] = result_text
+            self.cache.set(prompt, result_text)
             return result_text
+        except GovernorRejected:
+            # Callers turn this into 429 + Retry-After
+            raise
+        except CircuitOpen:
+            print("Chat circuit open, skipping Gemini")
+            return None
         except Exception as e:
             print(f"Error calling Gemini: {e}")
             return None
 
-    def parse_json_response(self, raw_text):
-        if not raw_text:
-            return None
-            
+    def stream_assistant_response(self, prompt, priority=PRIORITY_INTERACTIVE):
+        """Yield response text chunks as Gemini produces them. Cached prompts yield once."""
+        if not self.gemini_model:
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                yield "I'm having trouble connecting to my brain. Please check the API key."
+                return
+            genai.configure(api_key=api_key)
+            self.gemini_model = genai.GenerativeModel('gemini-2.5-flash')
+
+        cached = self.cache.get(prompt)
+        if cached is not None:
+            record_cache_hit("chat_stream", "response")
+            yield cached
+            return
+
+        parts = []
+        with get_breaker("chat").call(), get_governor().slot(priority), \
+                track_ai_call("chat_stream") as call:
+            response = self.gemini_model.generate_content(prompt, stream=True)
+            for chunk in response:
+                call.record_usage(chunk)
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. safety metadata) raise instead of returning ""
+                    text = ""
+                if text:
+                    parts.append(text)
+                    yield text
+
+        self.cache.set(prompt, "".join(parts))
+
+    def get_structured_response(self, prompt, schema=None, priority=PRIORITY_DEFAULT):
+        """
+        Ask Gemini for a JSON-typed response and return the first object that matches
+        `schema`, or None (also when the governor has no capacity; callers fall back).
+        The response is streamed through the incremental extractor, so we stop reading
+        as soon as a valid object has arrived.
+        """
+        if not self.gemini_model:
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                return None
+            genai.configure(api_key=api_key)
+            self.gemini_model = genai.GenerativeModel('gemini-2.5-flash')
+
+        # JSON-mode answers are cached separately from free-text answers to the same prompt
+        cache_prompt = "application/json\n" + prompt
+        cached = self.cache.get(cache_prompt)
+        if cached is not None:
+            record_cache_hit("structured", "response")
+            return extract_json(cached, schema)
+
+        return model_calls.do(f"json:{prompt_key(prompt)}", self._generate_structured,
+                              prompt, cache_prompt, schema, priority)
+
+    def _generate_structured(self, prompt, cache_prompt, schema, priority):
+        extractor = IncrementalJSONExtractor()
         try:
-            # Gemini often wraps JSON in markdown blocks
-            # Match code blocks first
-            json_block_match = re.search(r'```json\s*(.*?)\s*```', raw_text, re.DOTALL)
-            if json_block_match:
-                return json.loads(json_block_match.group(1).strip())
-            
-            # Fallback to standard regex if no markdown blocks
-            json_match = re.search(r'\{.*\}', raw_text, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group(0))
+            with get_breaker("structured").call(), get_governor().slot(priority), \
+                    track_ai_call("structured") as call:
+                response = self.gemini_model.generate_content(
+                    prompt, generation_config=JSON_GENERATION_CONFIG, stream=True
+                )
+                for chunk in response:
+                    call.record_usage(chunk)
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        continue
+                    for obj in extractor.feed(text):
+                        if schema is None or not validate(obj, schema):
+                            self.cache.set(cache_prompt, json.dumps(obj))
+                            return obj
+                for obj in extractor.close():
+                    if schema is None or not validate(obj, schema):
+                        self.cache.set(cache_prompt, json.dumps(obj))
+                        return obj
         except Exception as e:
-            print(f"JSON Parse Error: {e} for text: {raw_text}")
+            print(f"Error calling Gemini: {e}")
+            return None
+
+        print(f"Structured response did not match schema ({len(extractor.objects)} objects, "
+              f"{extractor.errors} unparseable)")
         return None
 
+    def parse_json_response(self, raw_text, schema=None):
+        """First JSON object in a model response (bare, fenced or wrapped in prose), or None."""
+        data = extract_json(raw_text, schema)
+        if data is None and raw_text:
+            print(f"JSON Parse Error: no {'valid ' if schema else ''}JSON object in text: {raw_text[:500]}")
+        return data
+
 # Getter for blueprints
 def get_ai_service():
     return AIService.get_instance()
+
+
+_warmup = {"ready": threading.Event(), "started_at": None, "finished_at": None, "models": [], "error": None}
+
+
+def warm_up(models=None):
+    """
+    Build the service and load/pin the preload models. Called from create_app, so with
+    gunicorn preload_app it runs once in the master before workers fork. Marks the
+    process ready even if a model fails, since routes fall back to loading on demand.
+    """
+    models = AI_PRELOAD_MODELS if models is None else models
+    _warmup["started_at"] = time.time()
+    try:
+        service = get_ai_service()
+        for name in models:
+            service.models.pin(name)
+            _warmup["models"].append(name)
+    except Exception as e:
+        _warmup["error"] = str(e)
+        print(f"Model warm-up failed: {e}")
+    finally:
+        _warmup["finished_at"] = time.time()
+        _warmup["ready"].set()
+        if models:
+            print(f"Warm-up finished in {_warmup['finished_at'] - _warmup['started_at']:.1f}s: {_warmup['models']}")
+
+
+def warm_up_in_background(models=None):
+    """Run warm_up in a daemon thread (AI_WARMUP_BACKGROUND=1): the app serves while models load."""
+    thread = threading.Thread(target=warm_up, args=(models,), name="ai-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def wait_for_warm_up(timeout=None):
+    """Block until warm-up has finished in this process; returns whether it has."""
+    return _warmup["ready"].wait(timeout)
+
+
+def is_ready():
+    return _warmup["ready"].is_set()
+
+
+def _warmup_after_fork():
+    # A background warm-up still running in the parent is not carried over (only the forking
+    # thread survives a fork), so this process starts cold and must run its own warm-up
+    if not _warmup["ready"].is_set():
+        _warmup.update(ready=threading.Event(), started_at=None, finished_at=None, models=[], error=None)
+
+
+os.register_at_fork(after_in_child=_warmup_after_fork)
+
+
+def readiness():
+    started, finished = _warmup["started_at"], _warmup["finished_at"]
+    return {
+        "ready": is_ready(),
+        "pid": os.getpid(),
+        "preload_models": AI_PRELOAD_MODELS,
+        "pinned_models": list(_warmup["models"]),
+        "warmup_seconds": round(finished - started, 2) if started and finished else None,
+        "error": _warmup["error"],
+    }
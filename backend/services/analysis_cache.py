@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+from PIL import Image
+from services.context_store import open_sqlite, STORE_PATH
+
+ANALYSIS_CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH", STORE_PATH)
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "2000"))
+ANALYSIS_CACHE_TTL_SECONDS = int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Max differing bits (out of 64) for two frames to count as the same room
+ANALYSIS_CACHE_MAX_DISTANCE = int(os.getenv("ANALYSIS_CACHE_MAX_DISTANCE", "6"))
+# Flat or low-texture frames (blank walls, solid colours, lens cap) all hash to ~0 or ~all
+# ones, so any two of them look identical. Such frames are only matched exactly: the hash
+# needs at least this many set and unset bits, and the thumbnail this much contrast (std dev, 0-255)
+ANALYSIS_CACHE_MIN_HASH_BITS = int(os.getenv("ANALYSIS_CACHE_MIN_HASH_BITS", "8"))
+ANALYSIS_CACHE_MIN_CONTRAST = float(os.getenv("ANALYSIS_CACHE_MIN_CONTRAST", "6.0"))
+
+# Only these fields are reused from a cached analysis
+CACHED_FIELDS = ("room_type", "style", "description", "detected_objects")
+
+
+def content_hash(image_bytes):
+    """Exact hash of the uploaded bytes."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def dhash(image, hash_size=8):
+    """
+    64-bit difference hash: compares neighbouring pixels of a tiny grayscale thumbnail,
+    so re-encodes, small crops and exposure changes of the same frame land a few bits apart.
+    """
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def has_detail(image_hash, image=None, hash_size=8):
+    """
+    Whether a frame carries enough structure for perceptual near-matching.
+    Checks the hash's bit balance, and the grayscale contrast when the image is given.
+    """
+    bits = bin(image_hash).count("1")
+    total = hash_size * hash_size
+    if bits < ANALYSIS_CACHE_MIN_HASH_BITS or total - bits < ANALYSIS_CACHE_MIN_HASH_BITS:
+        return False
+    if image is not None:
+        small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+        if float(np.asarray(small, dtype=np.float32).std()) < ANALYSIS_CACHE_MIN_CONTRAST:
+            return False
+    return True
+
+
+def _to_signed(value):
+    # SQLite INTEGER is a signed 64-bit column
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+class AnalysisCache:
+    """Persistent room-analysis cache keyed by exact content hash, with dHash near-duplicate lookup."""
+
+    def __init__(self, path=ANALYSIS_CACHE_PATH, max_entries=ANALYSIS_CACHE_MAX_ENTRIES,
+                 ttl=ANALYSIS_CACHE_TTL_SECONDS, max_distance=ANALYSIS_CACHE_MAX_DISTANCE):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "exact_misses": 0, "near_hits": 0, "near_misses": 0,
+                       "near_skipped": 0, "evictions": 0}
+
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                sha256 TEXT PRIMARY KEY,
+                dhash INTEGER NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_analysis_cache_accessed ON analysis_cache (accessed_at)")
+        conn.commit()
+
+    def _conn(self):
+        # sqlite3 connections may not be shared across threads, nor across a fork (gunicorn preload)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = open_sqlite(self.path)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, field):
+        with self._lock:
+            self._stats[field] += 1
+
+    def _touch(self, conn, sha256):
+        conn.execute("UPDATE analysis_cache SET accessed_at = ? WHERE sha256 = ?", (time.time(), sha256))
+        conn.commit()
+
+    def get_exact(self, sha256):
+        """Cached analysis for these exact bytes, or None. Needs no image decode."""
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT result FROM analysis_cache WHERE sha256 = ? AND created_at > ?",
+            (sha256, time.time() - self.ttl),
+        ).fetchone()
+        if row is None:
+            self._count("exact_misses")
+            return None
+        self._touch(conn, sha256)
+        self._count("exact_hits")
+        return json.loads(row[0])
+
+    def get_similar(self, image_hash, image=None):
+        """
+        Closest cached analysis within max_distance bits of `image_hash`.
+        Returns (analysis, distance) or (None, None). Frames without enough detail
+        (see has_detail; pass `image` to check contrast too) never near-match.
+        """
+        if not has_detail(image_hash, image):
+            self._count("near_skipped")
+            return None, None
+        conn = self._conn()
+        rows = conn.execute(
+            "SELECT sha256, dhash FROM analysis_cache WHERE created_at > ?",
+            (time.time() - self.ttl,),
+        ).fetchall()
+        if not rows:
+            self._count("near_misses")
+            return None, None
+
+        hashes = np.array([r[1] for r in rows], dtype=np.int64).view(np.uint64)
+        xor = hashes ^ np.uint64(image_hash)
+        distances = np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+        best = int(np.argmin(distances))
+        distance = int(distances[best])
+
+        if distance > self.max_distance:
+            self._count("near_misses")
+            return None, None
+
+        sha256 = rows[best][0]
+        row = conn.execute("SELECT result FROM analysis_cache WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is None:
+            self._count("near_misses")
+            return None, None
+        self._touch(conn, sha256)
+        self._count("near_hits")
+        return json.loads(row[0]), distance
+
+    def put(self, sha256, image_hash, analysis):
+        now = time.time()
+        result = {field: analysis.get(field) for field in CACHED_FIELDS}
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO analysis_cache (sha256, dhash, result, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (sha256, _to_signed(image_hash), json.dumps(result), now, now),
+        )
+        conn.execute("DELETE FROM analysis_cache WHERE created_at <= ?", (now - self.ttl,))
+        overflow = conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM analysis_cache WHERE sha256 IN "
+                "(SELECT sha256 FROM analysis_cache ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+            with self._lock:
+                self._stats["evictions"] += overflow
+        conn.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        # Every lookup starts with the exact probe, so that is the denominator
+        lookups = stats["exact_hits"] + stats["exact_misses"]
+        stats["hit_rate"] = round((stats["exact_hits"] + stats["near_hits"]) / lookups, 4) if lookups else 0.0
+        stats["size"] = self._conn().execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+        stats["max_entries"] = self.max_entries
+        return stats
+
+
+_analysis_cache = None
+_analysis_cache_lock = threading.Lock()
+
+
+def get_analysis_cache():
+    global _analysis_cache
+    if _analysis_cache is None:
+        with _analysis_cache_lock:
+            if _analysis_cache is None:
+                _analysis_cache = AnalysisCache()
+    return _analysis_cache
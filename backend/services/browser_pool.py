@@ -0,0 +1,247 @@
+import os
+import time
+import atexit
+import asyncio
+import threading
+
+# Chromium processes kept running per worker process
+BROWSER_POOL_BROWSERS = int(os.getenv("BROWSER_POOL_BROWSERS", "1"))
+# Pages open at once across the pool; further leases wait (bounds memory under parallel bookings)
+BROWSER_POOL_MAX_PAGES = int(os.getenv("BROWSER_POOL_MAX_PAGES", "4"))
+# A browser is relaunched after serving this many leases (bounds Chromium's slow memory growth)
+BROWSER_POOL_BROWSER_MAX_LEASES = int(os.getenv("BROWSER_POOL_BROWSER_MAX_LEASES", "200"))
+# How long a tool waits for a free page before giving up
+BROWSER_POOL_LEASE_TIMEOUT_SECONDS = float(os.getenv("BROWSER_POOL_LEASE_TIMEOUT_SECONDS", "30"))
+BROWSER_POOL_HEALTH_CHECK_SECONDS = float(os.getenv("BROWSER_POOL_HEALTH_CHECK_SECONDS", "30"))
+BROWSER_POOL_USER_AGENT = os.getenv(
+    "BROWSER_POOL_USER_AGENT", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36")
+
+
+class BrowserPoolError(Exception):
+    """The pool could not provide a page (Playwright missing, browser launch failed, or timed out)."""
+    pass
+
+
+class BrowserPool:
+    """
+    Long-lived headless Chromium for the booking tools. One daemon thread runs an asyncio
+    loop that owns Playwright and BROWSER_POOL_BROWSERS warm browsers. Tools lease a page
+    instead of launching a browser per call:
+
+        result = get_browser_pool().run(lambda page: add_to_cart(page, url))
+
+    Only the browsers are pooled. Every lease gets its own new browser context (a few ms),
+    closed with the page afterwards, so cookies, storage, service workers and cache from one
+    user's booking never reach another's. Leases are spread round-robin across browsers; a
+    browser is relaunched after BROWSER_POOL_BROWSER_MAX_LEASES leases once it is idle, and
+    a health check relaunches browsers that have crashed or disconnected.
+    """
+
+    def __init__(self, browsers=BROWSER_POOL_BROWSERS, max_pages=BROWSER_POOL_MAX_PAGES,
+                 browser_max_leases=BROWSER_POOL_BROWSER_MAX_LEASES):
+        self.browser_count = max(1, browsers)
+        self.max_pages = max(1, max_pages)
+        self.browser_max_leases = browser_max_leases
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        # Everything below is only touched on the pool's loop
+        self._playwright = None
+        self._browsers = [None] * self.browser_count
+        self._browser_leases = [0] * self.browser_count
+        self._browser_active = [0] * self.browser_count
+        self._next_browser = 0
+        self._pages = None
+        self._launch_lock = None
+        self._health_task = None
+        self._stats = {"leases": 0, "contexts_created": 0, "browser_launches": 0,
+                       "browser_recycles": 0, "failed_leases": 0, "in_use": 0}
+
+    # --- loop thread ---------------------------------------------------------------------
+
+    def _ensure_loop(self):
+        if self._loop is not None:
+            return self._loop
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                started = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    self._pages = asyncio.Semaphore(self.max_pages)
+                    self._launch_lock = asyncio.Lock()
+                    self._health_task = loop.create_task(self._health_loop())
+                    loop.call_soon(started.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name="browser-pool", daemon=True)
+                self._thread.start()
+                started.wait()
+                self._loop = loop
+        return self._loop
+
+    def _submit(self, coro, timeout):
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise BrowserPoolError(f"Browser pool did not finish within {timeout:g}s")
+
+    # --- browsers and contexts (run on the loop) -----------------------------------------
+
+    async def _browser(self, index):
+        browser = self._browsers[index]
+        if browser is not None and browser.is_connected():
+            return browser
+        async with self._launch_lock:
+            browser = self._browsers[index]
+            if browser is not None and browser.is_connected():
+                return browser
+            if self._playwright is None:
+                try:
+                    from playwright.async_api import async_playwright
+                except ImportError as e:
+                    raise BrowserPoolError("Playwright is not installed") from e
+                self._playwright = await async_playwright().start()
+            start = time.perf_counter()
+            browser = await self._playwright.chromium.launch(headless=True)
+            self._browsers[index] = browser
+            self._browser_leases[index] = 0
+            self._stats["browser_launches"] += 1
+            print(f"Browser pool: launched browser {index} in {time.perf_counter() - start:.2f}s")
+            return browser
+
+    async def _recycle_if_due(self, index):
+        browser = self._browsers[index]
+        if (browser is None or self._browser_active[index]
+                or self._browser_leases[index] < self.browser_max_leases):
+            return
+        # Idle and past its lease budget: the next lease on this slot launches a fresh one
+        self._browsers[index] = None
+        self._stats["browser_recycles"] += 1
+        try:
+            await browser.close()
+        except Exception:
+            pass
+
+    async def _lease(self, fn):
+        async with self._pages:
+            self._stats["leases"] += 1
+            index = self._next_browser
+            self._next_browser = (self._next_browser + 1) % self.browser_count
+            browser = await self._browser(index)
+            self._browser_leases[index] += 1
+            self._browser_active[index] += 1
+            self._stats["in_use"] += 1
+            context = None
+            ok = False
+            try:
+                # A new context per lease: nothing from the previous user's booking survives
+                context = await browser.new_context(user_agent=BROWSER_POOL_USER_AGENT)
+                self._stats["contexts_created"] += 1
+                page = await context.new_page()
+                result = await fn(page)
+                ok = True
+                return result
+            finally:
+                self._stats["in_use"] -= 1
+                self._browser_active[index] -= 1
+                if not ok:
+                    self._stats["failed_leases"] += 1
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+                await self._recycle_if_due(index)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(BROWSER_POOL_HEALTH_CHECK_SECONDS)
+            for index, browser in enumerate(self._browsers):
+                if browser is not None and not browser.is_connected():
+                    print(f"Browser pool: browser {index} disconnected, relaunching")
+                    self._browsers[index] = None
+                    try:
+                        await self._browser(index)
+                    except Exception as e:
+                        print(f"Browser pool: relaunch of browser {index} failed: {e}")
+
+    async def _warm_up(self):
+        for index in range(self.browser_count):
+            await self._browser(index)
+
+    async def _close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+        for browser in self._browsers:
+            if browser is not None:
+                try:
+                    await browser.close()
+                except Exception:
+                    pass
+        self._browsers = [None] * self.browser_count
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    # --- public API (any thread) ---------------------------------------------------------
+
+    def run(self, fn, timeout=None):
+        """
+        Lease a page in a new context, await fn(page) on the pool's loop and return its
+        result. fn is an async function; the context is closed afterwards whatever happens.
+        Exceptions from fn propagate; pool problems raise BrowserPoolError.
+        """
+        timeout = BROWSER_POOL_LEASE_TIMEOUT_SECONDS if timeout is None else timeout
+        return self._submit(self._lease(fn), timeout)
+
+    def warm_up(self, timeout=60):
+        """Launch the browsers ahead of the first booking."""
+        start = time.perf_counter()
+        try:
+            self._submit(self._warm_up(), timeout)
+        except Exception as e:
+            # Not fatal: leases launch browsers on demand
+            print(f"Browser pool warm-up failed: {e}")
+            return False
+        print(f"Browser pool warm in {time.perf_counter() - start:.2f}s")
+        return True
+
+    def close(self, timeout=10):
+        if self._loop is None:
+            return
+        try:
+            self._submit(self._close(), timeout)
+        except Exception as e:
+            print(f"Browser pool: close failed: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def stats(self):
+        return dict(self._stats, max_pages=self.max_pages,
+                    browsers_connected=sum(1 for b in self._browsers if b is not None and b.is_connected()))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BrowserPool()
+                atexit.register(_pool.close)
+    return _pool
+
+
+def _after_fork():
+    # The loop thread and browser processes belong to the parent; a forked worker starts its own
+    global _pool
+    _pool = None
+
+
+os.register_at_fork(after_in_child=_after_fork)
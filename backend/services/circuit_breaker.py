@@ -0,0 +1,152 @@
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from services.metrics import registry
+from services.governor import GovernorRejected
+
+# Failure share over the window that opens the circuit, once at least CIRCUIT_MIN_CALLS were seen
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_WINDOW_SECONDS = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "60"))
+# Calls slower than this count as failures even if they succeed
+CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", "20"))
+# How long the circuit stays open before letting a probe through
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+_transitions = registry.counter(
+    "ai_circuit_transitions_total", "Circuit breaker state changes.", ("breaker", "state"))
+_short_circuits = registry.counter(
+    "ai_circuit_short_circuits_total", "Model calls skipped because the circuit was open.", ("breaker",))
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the model while its circuit is open; callers use their local fallback."""
+    pass
+
+
+class CircuitBreaker:
+    """
+    Tracks recent outcomes of one model endpoint. Too many failures or slow calls open the
+    circuit, and calls fail immediately with CircuitOpen. After CIRCUIT_OPEN_SECONDS one probe
+    call is let through (half-open): success closes the circuit, failure reopens it.
+    """
+
+    # Not the endpoint's fault: local admission control, or a client that hung up mid-stream
+    NEUTRAL_ERRORS = (GovernorRejected, GeneratorExit)
+
+    def __init__(self, name, failure_rate=CIRCUIT_FAILURE_RATE, min_calls=CIRCUIT_MIN_CALLS,
+                 window_seconds=CIRCUIT_WINDOW_SECONDS, slow_call_seconds=CIRCUIT_SLOW_CALL_SECONDS,
+                 open_seconds=CIRCUIT_OPEN_SECONDS):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._outcomes = deque()  # (timestamp, failed)
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        if state != self.state:
+            print(f"Circuit '{self.name}': {self.state} -> {state}")
+            self.state = state
+            _transitions.inc(breaker=self.name, state=state)
+
+    def _admit(self):
+        """None if the call must be skipped, else whether it is the half-open probe."""
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            _short_circuits.inc(breaker=self.name)
+            return None
+
+    def allow(self):
+        """True if a call may go to the model now (claims the probe when half-open)."""
+        return self._admit() is not None
+
+    def record(self, failed, probe=False):
+        now = time.monotonic()
+        with self._lock:
+            if probe:
+                self._probe_in_flight = False
+                if failed:
+                    self._opened_at = now
+                    self._set_state(OPEN)
+                else:
+                    self._outcomes.clear()
+                    self._set_state(CLOSED)
+                return
+            if self.state != CLOSED:
+                # A call admitted before the circuit opened; the probe decides from here
+                return
+
+            self._outcomes.append((now, failed))
+            while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+                self._outcomes.popleft()
+            if len(self._outcomes) >= self.min_calls:
+                failures = sum(1 for _, f in self._outcomes if f)
+                if failures / len(self._outcomes) >= self.failure_rate:
+                    self._opened_at = now
+                    self._outcomes.clear()
+                    self._set_state(OPEN)
+
+    def release_probe(self):
+        with self._lock:
+            self._probe_in_flight = False
+
+    @contextmanager
+    def call(self):
+        """Guard one model call; raises CircuitOpen without calling when the circuit is open."""
+        probe = self._admit()
+        if probe is None:
+            raise CircuitOpen(f"{self.name} circuit is open")
+        start = time.monotonic()
+        try:
+            yield
+        except self.NEUTRAL_ERRORS:
+            if probe:
+                self.release_probe()
+            raise
+        except BaseException:
+            self.record(True, probe)
+            raise
+        self.record(time.monotonic() - start > self.slow_call_seconds, probe)
+
+    def stats(self):
+        with self._lock:
+            failures = sum(1 for _, f in self._outcomes if f)
+            return {
+                "state": self.state,
+                "recent_calls": len(self._outcomes),
+                "recent_failures": failures,
+                "open_for_seconds": round(time.monotonic() - self._opened_at, 1) if self.state != CLOSED else 0,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """One breaker per model endpoint/call site, shared by every thread in the process."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def breaker_stats():
+    return {name: breaker.stats() for name, breaker in list(_breakers.items())}
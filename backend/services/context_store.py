@@ -0,0 +1,316 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# Backend used by create_store(): "sqlite" is shared by every worker on the host,
+# "memory" is private to the process (fine for a single dev server)
+STORE_BACKEND = os.getenv("CONTEXT_STORE_BACKEND", "sqlite").lower()
+STORE_PATH = os.getenv(
+    "CONTEXT_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "shared_store.db"),
+)
+CONTEXT_MAX_ENTRIES = int(os.getenv("CONTEXT_STORE_MAX_ENTRIES", "5000"))
+CONTEXT_TTL_SECONDS = int(os.getenv("CONTEXT_STORE_TTL_SECONDS", str(24 * 3600)))
+
+# How many writes between full sweeps of expired/over-cap rows in the SQLite backend
+SWEEP_EVERY_WRITES = 50
+
+
+def open_sqlite(path):
+    """Open a SQLite connection tuned for many short reads/writes from several processes."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=5.0)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class _StoreStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def as_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class MemoryStore:
+    """In-process LRU store with per-entry TTL. Expired entries are dropped lazily on access."""
+
+    def __init__(self, max_entries=1000, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._stats = _StoreStats()
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= now:
+                del self._data[key]
+                self._stats.expirations += 1
+                self._stats.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            self._stats.sets += 1
+            self._evict()
+
+    def add(self, key, value, ttl=None):
+        """Set key only if it is absent (or expired); True if this call set it. Atomic."""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > now):
+                return False
+            self._data[key] = (now + ttl if ttl else None, value)
+            self._data.move_to_end(key)
+            self._stats.sets += 1
+            self._evict()
+            return True
+
+    def _evict(self):
+        # Caller holds the lock; least recently used entries go first
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self._stats.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            stats = self._stats.as_dict()
+            stats.update({"backend": "memory", "size": len(self._data), "max_entries": self.max_entries})
+        return stats
+
+
+class SQLiteStore:
+    """
+    Store shared by every process on the host through one SQLite file.
+    Values must be JSON-serialisable. Each namespace is capped (checked every SWEEP_EVERY_WRITES
+    writes) and evicted least-recently-used first.
+    """
+
+    def __init__(self, path, namespace="default", max_entries=1000, ttl=3600):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = _StoreStats()
+        self._writes = 0
+
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS kv_store (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_kv_store_accessed ON kv_store (namespace, accessed_at)")
+        conn.commit()
+
+    def _conn(self):
+        # sqlite3 connections may not be shared across threads, nor across a fork (gunicorn preload)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = open_sqlite(self.path)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, field, amount=1):
+        with self._lock:
+            setattr(self._stats, field, getattr(self._stats, field) + amount)
+
+    def get(self, key, default=None):
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, expires_at FROM kv_store WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+
+        if row is None:
+            self._count("misses")
+            return default
+
+        value, expires_at = row
+        if expires_at is not None and expires_at <= now:
+            conn.execute("DELETE FROM kv_store WHERE namespace = ? AND key = ?", (self.namespace, key))
+            conn.commit()
+            self._count("expirations")
+            self._count("misses")
+            return default
+
+        conn.execute(
+            "UPDATE kv_store SET accessed_at = ? WHERE namespace = ? AND key = ?",
+            (now, self.namespace, key),
+        )
+        conn.commit()
+        self._count("hits")
+        return json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO kv_store (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (self.namespace, key, json.dumps(value), now + ttl if ttl else None, now),
+        )
+        conn.commit()
+        self._count("sets")
+
+        with self._lock:
+            self._writes += 1
+            sweep = self._writes % SWEEP_EVERY_WRITES == 0
+        if sweep:
+            self.sweep()
+
+    def add(self, key, value, ttl=None):
+        """
+        Set key only if it is absent (or expired); True if this call set it. Atomic across
+        processes: the insert runs in one write transaction, so of several concurrent callers
+        exactly one wins.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        conn = self._conn()
+        try:
+            conn.execute(
+                "DELETE FROM kv_store WHERE namespace = ? AND key = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+                (self.namespace, key, now),
+            )
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO kv_store (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), now + ttl if ttl else None, now),
+            ).rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if inserted:
+            self._count("sets")
+        return inserted == 1
+
+    def delete(self, key):
+        conn = self._conn()
+        conn.execute("DELETE FROM kv_store WHERE namespace = ? AND key = ?", (self.namespace, key))
+        conn.commit()
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM kv_store WHERE namespace = ?", (self.namespace,))
+        conn.commit()
+
+    def sweep(self):
+        """Drop expired rows, then evict least-recently-used rows above the cap."""
+        conn = self._conn()
+        expired = conn.execute(
+            "DELETE FROM kv_store WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+            (self.namespace, time.time()),
+        ).rowcount
+        overflow = len(self) - self.max_entries
+        evicted = 0
+        if overflow > 0:
+            evicted = conn.execute(
+                """
+                DELETE FROM kv_store WHERE namespace = ? AND key IN (
+                    SELECT key FROM kv_store WHERE namespace = ? ORDER BY accessed_at LIMIT ?
+                )
+                """,
+                (self.namespace, self.namespace, overflow),
+            ).rowcount
+        conn.commit()
+        self._count("expirations", expired)
+        self._count("evictions", evicted)
+
+    def __len__(self):
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM kv_store WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        return row[0]
+
+    def stats(self):
+        with self._lock:
+            stats = self._stats.as_dict()
+        stats.update({
+            "backend": "sqlite",
+            "namespace": self.namespace,
+            "size": len(self),
+            "max_entries": self.max_entries,
+        })
+        return stats
+
+
+def create_store(namespace, max_entries=1000, ttl=3600, backend=None):
+    """Build a store for one namespace using the configured backend."""
+    backend = (backend or STORE_BACKEND).lower()
+    if backend == "memory":
+        return MemoryStore(max_entries=max_entries, ttl=ttl)
+    if backend == "sqlite":
+        return SQLiteStore(STORE_PATH, namespace=namespace, max_entries=max_entries, ttl=ttl)
+    raise ValueError(f"Unknown CONTEXT_STORE_BACKEND '{backend}'. Use 'sqlite' or 'memory'.")
+
+
+_context_store = None
+_context_store_lock = threading.Lock()
+
+
+def get_context_store():
+    """Room-scan context shared between analyze-room and the assistant chat."""
+    global _context_store
+    if _context_store is None:
+        with _context_store_lock:
+            if _context_store is None:
+                _context_store = create_store(
+                    "room_context", max_entries=CONTEXT_MAX_ENTRIES, ttl=CONTEXT_TTL_SECONDS
+                )
+    return _context_store
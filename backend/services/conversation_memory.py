@@ -0,0 +1,164 @@
+import os
+import re
+import time
+import threading
+from contextlib import contextmanager
+from services.context_store import create_store
+
+# Prompt budget for conversation history (summary + recent turns), in estimated tokens
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "800"))
+# Most recent turns kept verbatim; older ones are folded into the summary
+CONVERSATION_WINDOW_TURNS = int(os.getenv("CONVERSATION_WINDOW_TURNS", "6"))
+# Fold in batches so the summary is rewritten every few turns, not on every message
+CONVERSATION_COMPACT_EVERY = int(os.getenv("CONVERSATION_COMPACT_EVERY", "4"))
+CONVERSATION_TTL_SECONDS = int(os.getenv("CONVERSATION_TTL_SECONDS", str(24 * 3600)))
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "5000"))
+# Lease held on a session while one exchange is written; lapses on its own if the worker dies
+CONVERSATION_LOCK_SECONDS = float(os.getenv("CONVERSATION_LOCK_SECONDS", "5"))
+
+# Longest single message stored verbatim; the prompt window trims further if needed
+MAX_TURN_CHARS = 2000
+
+_MARKDOWN = re.compile(r"[*_#`>]+")
+_WHITESPACE = re.compile(r"\s+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return (len(text) + 3) // 4
+
+
+def _plain(text):
+    return _WHITESPACE.sub(" ", _MARKDOWN.sub("", str(text))).strip()
+
+
+def _gist(text, max_chars):
+    """First sentence of `text` without markdown, cut to `max_chars`."""
+    text = _plain(text)
+    text = _SENTENCE_END.split(text, 1)[0]
+    return text if len(text) <= max_chars else text[:max_chars - 3].rstrip() + "..."
+
+
+def _truncate(text, max_tokens):
+    max_chars = max_tokens * 4
+    return text if len(text) <= max_chars else text[:max(0, max_chars - 3)].rstrip() + "..."
+
+
+class ConversationMemory:
+    """
+    Chat history per session, kept in the shared store. Recent turns are stored verbatim
+    and older ones are compacted into an extractive summary (one line per turn), so the
+    history section of the prompt stays under a fixed token budget however long the
+    conversation runs. No model calls are made to summarise.
+    """
+
+    def __init__(self, store=None, token_budget=CONVERSATION_TOKEN_BUDGET,
+                 window_turns=CONVERSATION_WINDOW_TURNS, compact_every=CONVERSATION_COMPACT_EVERY):
+        # Not `store or ...`: stores define __len__, so an empty one is falsy
+        self.store = store if store is not None else create_store(
+            "conversations", max_entries=CONVERSATION_MAX_SESSIONS, ttl=CONVERSATION_TTL_SECONDS)
+        self.token_budget = token_budget
+        self.window_turns = window_turns
+        self.compact_every = compact_every
+
+    def load(self, session_id):
+        session = self.store.get(session_id) if session_id else None
+        return session or {"summary": [], "turns": [], "turn_count": 0, "updated_at": None}
+
+    def history_prompt(self, session):
+        """Render the summary and as many recent turns as fit in the token budget."""
+        if not session["turns"] and not session["summary"]:
+            return ""
+
+        # The summary may use at most a third of the budget; recent turns get the rest
+        summary_lines = []
+        summary_budget = self.token_budget // 3
+        for line in reversed(session["summary"]):
+            cost = estimate_tokens(line) + 1
+            if cost > summary_budget:
+                break
+            summary_lines.insert(0, line)
+            summary_budget -= cost
+        used = sum(estimate_tokens(line) + 1 for line in summary_lines)
+
+        turn_lines = []
+        remaining = self.token_budget - used
+        for turn in reversed(session["turns"]):
+            user = f"User: {turn['user']}"
+            assistant = f"Assistant: {turn['assistant']}"
+            cost = estimate_tokens(user) + estimate_tokens(assistant) + 2
+            if cost > remaining:
+                if not turn_lines:
+                    # Always keep the latest exchange, shortened to fit
+                    half = max(remaining // 2, 16)
+                    turn_lines = [_truncate(user, half), _truncate(assistant, half)]
+                break
+            turn_lines = [user, assistant] + turn_lines
+            remaining -= cost
+
+        sections = []
+        if summary_lines:
+            sections.append("Earlier in this conversation:\n" + "\n".join(summary_lines))
+        if turn_lines:
+            sections.append("Most recent messages:\n" + "\n".join(turn_lines))
+        return "\n\n".join(sections)
+
+    @contextmanager
+    def _locked(self, session_id):
+        """
+        Serialise read-modify-write of one session across threads and workers: the lease is
+        claimed with the store's atomic add, so two chats on one session cannot drop a turn.
+        """
+        key = f"lock:{session_id}"
+        while not self.store.add(key, time.time(), ttl=CONVERSATION_LOCK_SECONDS):
+            time.sleep(0.005)
+        try:
+            yield
+        finally:
+            self.store.delete(key)
+
+    def append(self, session_id, user_message, answer_text):
+        """Record one exchange, compacting older turns into the summary when the window overflows."""
+        if not session_id:
+            return None
+        with self._locked(session_id):
+            return self._append(session_id, user_message, answer_text)
+
+    def _append(self, session_id, user_message, answer_text):
+        session = self.load(session_id)
+        session["turns"].append({
+            "user": _plain(user_message)[:MAX_TURN_CHARS],
+            "assistant": _plain(answer_text)[:MAX_TURN_CHARS],
+        })
+        session["turn_count"] += 1
+
+        if len(session["turns"]) >= self.window_turns + self.compact_every:
+            folded = session["turns"][:-self.window_turns]
+            session["turns"] = session["turns"][-self.window_turns:]
+            session["summary"].extend(
+                f"- Asked: {_gist(t['user'], 120)} Advised: {_gist(t['assistant'], 160)}" for t in folded
+            )
+            # Lines that can no longer fit the summary share of the budget are dropped for good
+            while sum(estimate_tokens(l) + 1 for l in session["summary"]) > self.token_budget // 3:
+                session["summary"].pop(0)
+
+        session["updated_at"] = time.time()
+        self.store.set(session_id, session)
+        return session
+
+    def clear(self, session_id):
+        self.store.delete(session_id)
+
+
+_conversation_memory = None
+_conversation_memory_lock = threading.Lock()
+
+
+def get_conversation_memory():
+    global _conversation_memory
+    if _conversation_memory is None:
+        with _conversation_memory_lock:
+            if _conversation_memory is None:
+                _conversation_memory = ConversationMemory()
+    return _conversation_memory
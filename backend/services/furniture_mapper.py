@@ -0,0 +1,89 @@
+import os
+import re
+import json
+import threading
+
+FURNITURE_LABELS_PATH = os.getenv(
+    "FURNITURE_LABELS_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "furniture_labels.json"),
+)
+
+_WHITESPACE = re.compile(r"[\s_\-]+")
+
+
+def normalize_label(label):
+    """Lowercase, trim and collapse separators: ' Dining_Table ' -> 'dining table'."""
+    return _WHITESPACE.sub(" ", str(label).strip().lower())
+
+
+def singularize(label):
+    """Cheap English plural stripping for detector/LLM labels ('boxes' -> 'box', 'lamps' -> 'lamp')."""
+    if label.endswith("ies") and len(label) > 4:
+        return label[:-3] + "y"
+    if label.endswith(("sses", "ches", "shes", "xes")):
+        return label[:-2]
+    if label.endswith("s") and not label.endswith(("ss", "us")) and len(label) > 3:
+        return label[:-1]
+    return label
+
+
+class FurnitureIndex:
+    """Inverted index from normalised labels to catalog assets, built once from the label table."""
+
+    def __init__(self, table):
+        self.assets = {}
+        self.index = {}
+        for asset in table.get("assets", []):
+            model_id = asset["model_id"]
+            self.assets[model_id] = {"model_id": model_id, "name": asset["name"]}
+            for label in asset.get("labels", []):
+                ids = self.index.setdefault(normalize_label(label), [])
+                if model_id not in ids:
+                    ids.append(model_id)
+        self.defaults = [m for m in table.get("defaults", []) if m in self.assets]
+
+    @classmethod
+    def from_file(cls, path=FURNITURE_LABELS_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def lookup(self, label):
+        """Asset ids for one label; tries the exact form first, then the singular form."""
+        key = normalize_label(label)
+        ids = self.index.get(key)
+        if ids is None:
+            ids = self.index.get(singularize(key), [])
+        return ids
+
+    def map_labels(self, labels):
+        """Recommendations for one scan, in first-detected order, with the default set if nothing matched."""
+        seen = []
+        for label in labels:
+            if isinstance(label, dict):
+                label = label.get("label", "")
+            for model_id in self.lookup(label):
+                if model_id not in seen:
+                    seen.append(model_id)
+
+        if not seen:
+            seen = self.defaults
+        return [dict(self.assets[m]) for m in seen]
+
+    def map_many(self, scans):
+        """Batch form of map_labels for offline re-tagging."""
+        return [self.map_labels(labels) for labels in scans]
+
+
+_furniture_index = None
+_furniture_index_lock = threading.Lock()
+
+
+def get_furniture_index():
+    global _furniture_index
+    if _furniture_index is None:
+        with _furniture_index_lock:
+            if _furniture_index is None:
+                _furniture_index = FurnitureIndex.from_file()
+                print(f"Furniture index loaded: {len(_furniture_index.assets)} assets, "
+                      f"{len(_furniture_index.index)} labels")
+    return _furniture_index
@@ -0,0 +1,153 @@
+import os
+import math
+import time
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+from services.metrics import registry
+
+# Sustained model calls per second and the burst allowed above it (token bucket); a rate of 0 turns it off
+AI_RATE_PER_SECOND = float(os.getenv("AI_RATE_PER_SECOND", "5"))
+AI_RATE_BURST = int(os.getenv("AI_RATE_BURST", "10"))
+# Model calls allowed in flight at once in this process
+AI_MAX_IN_FLIGHT = int(os.getenv("AI_MAX_IN_FLIGHT", "8"))
+# Callers allowed to wait for a slot; beyond this new calls are refused straight away
+AI_MAX_QUEUED = int(os.getenv("AI_MAX_QUEUED", "64"))
+# How long a caller may wait for a slot before failing fast with 429
+AI_QUEUE_TIMEOUT_SECONDS = float(os.getenv("AI_QUEUE_TIMEOUT_SECONDS", "10"))
+
+# Lower runs first
+PRIORITY_INTERACTIVE = 0  # chat: a user is watching
+PRIORITY_DEFAULT = 1      # synchronous analysis and other request-path calls
+PRIORITY_BULK = 2         # async jobs and batch fan-out
+
+_PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_DEFAULT: "default", PRIORITY_BULK: "bulk"}
+
+_queue_wait = registry.histogram(
+    "ai_governor_wait_seconds", "Time model calls waited for a governor slot.", ("priority",),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30))
+_rejections = registry.counter(
+    "ai_governor_rejections_total", "Model calls refused by the governor.", ("priority", "reason"))
+
+
+class GovernorRejected(Exception):
+    """Raised when a model call could not get a slot in time; maps to 429 with Retry-After."""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Governor:
+    """
+    Admission control for outbound model calls: a token bucket caps the request rate,
+    a counter caps calls in flight, and waiting callers are served lowest priority value
+    first (FIFO within a priority). A caller that cannot start before its deadline is
+    refused, so overload turns into quick 429s instead of every request timing out.
+    """
+
+    def __init__(self, rate=AI_RATE_PER_SECOND, burst=AI_RATE_BURST, max_in_flight=AI_MAX_IN_FLIGHT,
+                 max_queued=AI_MAX_QUEUED, timeout=AI_QUEUE_TIMEOUT_SECONDS):
+        self.rate = max(rate, 0.0)
+        self.burst = max(1, burst)
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._in_flight = 0
+        self._waiting = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stats = {"admitted": 0, "rejected": 0}
+
+    def _refill(self, now):
+        if self.rate <= 0:
+            self._tokens = float(self.burst)  # No rate limit, only the in-flight cap
+        else:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _retry_after(self):
+        # Rough time for the current backlog to drain at the sustained rate
+        backlog = len(self._waiting) + self._in_flight
+        return max(1, math.ceil(backlog / max(self.rate, 0.1)))
+
+    def _reject(self, priority, reason, message):
+        self._stats["rejected"] += 1
+        _rejections.inc(priority=_PRIORITY_NAMES.get(priority, str(priority)), reason=reason)
+        raise GovernorRejected(message, retry_after=self._retry_after())
+
+    def acquire(self, priority=PRIORITY_DEFAULT, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        with self._cond:
+            if len(self._waiting) >= self.max_queued:
+                self._reject(priority, "queue_full", "AI request queue is full")
+
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    is_next = self._waiting[0] == entry
+                    if is_next and self._in_flight < self.max_in_flight and self._tokens >= 1:
+                        heapq.heappop(self._waiting)
+                        self._tokens -= 1
+                        self._in_flight += 1
+                        self._stats["admitted"] += 1
+                        break
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._waiting.remove(entry)
+                        heapq.heapify(self._waiting)
+                        self._reject(priority, "timeout", f"No AI capacity within {timeout:g}s")
+
+                    wait = remaining
+                    if is_next and self._in_flight < self.max_in_flight:
+                        # Only short of rate tokens: sleep until the next one is due
+                        wait = min(remaining, (1 - self._tokens) / self.rate)
+                    self._cond.wait(wait)
+            finally:
+                # Whoever is now at the head may be able to go
+                self._cond.notify_all()
+
+        _queue_wait.observe(time.monotonic() - start, priority=_PRIORITY_NAMES.get(priority, str(priority)))
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority=PRIORITY_DEFAULT, timeout=None):
+        """Hold one model-call slot for the duration of the block."""
+        self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            return dict(self._stats, in_flight=self._in_flight, waiting=len(self._waiting),
+                        tokens=round(self._tokens, 2), rate_per_second=self.rate,
+                        max_in_flight=self.max_in_flight)
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor():
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                _governor = Governor()
+    return _governor
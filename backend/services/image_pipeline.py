@@ -0,0 +1,68 @@
+import io
+import os
+import threading
+from PIL import Image, ImageOps
+
+# Longest side sent to the vision model; phone cameras upload 4000px+ frames
+VISION_MAX_SIDE = int(os.getenv("VISION_MAX_SIDE", "1536"))
+# JPEG or WEBP
+VISION_IMAGE_FORMAT = os.getenv("VISION_IMAGE_FORMAT", "JPEG").upper()
+VISION_IMAGE_QUALITY = int(os.getenv("VISION_IMAGE_QUALITY", "85"))
+
+_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+_stats_lock = threading.Lock()
+_stats = {"images": 0, "bytes_in": 0, "bytes_out": 0}
+
+
+class PreparedImage:
+    """An upload after orientation, downsizing and re-encoding, plus its size accounting."""
+
+    def __init__(self, image, data, mime_type, original_size):
+        self.image = image
+        self.data = data
+        self.mime_type = mime_type
+        self.original_size = original_size
+
+    @property
+    def bytes_saved(self):
+        return self.original_size - len(self.data)
+
+    def as_part(self):
+        """Inline blob for generate_content, so the SDK doesn't re-encode the PIL image."""
+        return {"mime_type": self.mime_type, "data": self.data}
+
+
+def prepare_image(image_bytes, max_side=VISION_MAX_SIDE, fmt=VISION_IMAGE_FORMAT, quality=VISION_IMAGE_QUALITY):
+    """
+    Decode an upload once, apply its EXIF orientation, shrink it to `max_side` and
+    re-encode it without metadata. Raises ValueError for an unsupported output format.
+    """
+    if fmt not in _MIME_TYPES:
+        raise ValueError(f"Unsupported VISION_IMAGE_FORMAT '{fmt}'. Use JPEG or WEBP.")
+
+    img = Image.open(io.BytesIO(image_bytes))
+    # For JPEGs, let libjpeg decode at the smallest scale that still covers max_side
+    img.draft("RGB", (max_side, max_side))
+    img = ImageOps.exif_transpose(img)
+    img = img.convert("RGB")
+    img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    buffer = io.BytesIO()
+    # No exif/icc arguments are passed, so metadata is dropped
+    img.save(buffer, format=fmt, quality=quality, optimize=True)
+    prepared = PreparedImage(img, buffer.getvalue(), _MIME_TYPES[fmt], len(image_bytes))
+
+    with _stats_lock:
+        _stats["images"] += 1
+        _stats["bytes_in"] += prepared.original_size
+        _stats["bytes_out"] += len(prepared.data)
+
+    return prepared
+
+
+def pipeline_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["bytes_saved"] = stats["bytes_in"] - stats["bytes_out"]
+    return stats
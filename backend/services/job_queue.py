@@ -0,0 +1,125 @@
+import os
+import time
+import uuid
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from services.context_store import create_store
+
+ANALYSIS_JOB_WORKERS = int(os.getenv("ANALYSIS_JOB_WORKERS", "2"))
+# Jobs queued or running in this process before new submissions are refused
+ANALYSIS_JOB_MAX_PENDING = int(os.getenv("ANALYSIS_JOB_MAX_PENDING", "32"))
+ANALYSIS_JOB_TTL_SECONDS = int(os.getenv("ANALYSIS_JOB_TTL_SECONDS", "3600"))
+# An unfinished job with no update for this long is reported failed: the worker process
+# running it died (restart, OOM kill) and no thread is left to finish it
+ANALYSIS_JOB_TIMEOUT_SECONDS = int(os.getenv("ANALYSIS_JOB_TIMEOUT_SECONDS", "600"))
+
+JOB_FINISHED_STATES = ("done", "failed")
+
+
+class JobQueueFull(Exception):
+    """Raised when the local worker pool already has its maximum of pending jobs."""
+    pass
+
+
+class JobQueue:
+    """
+    Bounded background pool for slow AI calls. Job state lives in the shared store,
+    so any worker can answer a status poll; finished jobs expire after the TTL.
+    """
+
+    def __init__(self, workers=ANALYSIS_JOB_WORKERS, max_pending=ANALYSIS_JOB_MAX_PENDING,
+                 ttl=ANALYSIS_JOB_TTL_SECONDS, timeout=ANALYSIS_JOB_TIMEOUT_SECONDS):
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.store = create_store("jobs", max_entries=max(1000, max_pending * 50), ttl=ttl)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ai-job")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, *args, owner=None, **kwargs):
+        """
+        Queue `fn(*args, progress=..., **kwargs)`, which must return (body, http_status).
+        Returns the new job record.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f"{self._pending} jobs already pending")
+            self._pending += 1
+
+        now = time.time()
+        job = {
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "owner": owner,
+            "status": "queued",
+            "stage": "queued",
+            "created_at": now,
+            "updated_at": now,
+            "http_status": None,
+            "result": None,
+            "error": None,
+        }
+        try:
+            self.store.set(job["id"], job)
+            self._executor.submit(self._run, dict(job), fn, args, kwargs)
+        except Exception:
+            # Never queued, so _run will not release the slot; the caller never saw the id
+            with self._lock:
+                self._pending -= 1
+            self.store.delete(job["id"])
+            raise
+        return job
+
+    def get(self, job_id):
+        job = self.store.get(job_id)
+        if job and job["status"] not in JOB_FINISHED_STATES and time.time() - job["updated_at"] > self.timeout:
+            self._update(job, status="failed", stage="failed", http_status=504,
+                         error=f"Job made no progress for {self.timeout}s")
+        return job
+
+    def _update(self, job, **fields):
+        job.update(fields)
+        job["updated_at"] = time.time()
+        self.store.set(job["id"], job)
+
+    def _run(self, job, fn, args, kwargs):
+        try:
+            self._update(job, status="running", stage="running")
+
+            def progress(stage):
+                self._update(job, stage=stage)
+
+            body, http_status = fn(*args, progress=progress, **kwargs)
+            status = "done" if http_status < 400 else "failed"
+            self._update(job, status=status, stage=status, http_status=http_status, result=body)
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job, status="failed", stage="failed", http_status=500, error=str(e))
+        finally:
+            with self._lock:
+                self._pending -= 1
+            if job["status"] not in JOB_FINISHED_STATES:
+                # Interrupted before a result was recorded (SystemExit, KeyboardInterrupt)
+                try:
+                    self._update(job, status="failed", stage="failed", http_status=500, error="Job interrupted")
+                except Exception:
+                    traceback.print_exc()
+
+    def stats(self):
+        with self._lock:
+            pending = self._pending
+        return {"pending": pending, "max_pending": self.max_pending, "store": self.store.stats()}
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue()
+    return _job_queue
@@ -0,0 +1,139 @@
+import numpy as np
+
+# Centres closer than this (in metres) count as a collision even without extents
+CLOSE_THRESHOLD = 0.3
+# Above this many objects, switch from the dense pairwise matrix to a KD-tree broadphase
+DENSE_MAX_OBJECTS = 64
+# Matches the original loop's starting value when nothing is closer
+MAX_REPORTED_DISTANCE = 100.0
+
+
+def _axis(value, key, default=0.0):
+    if isinstance(value, dict):
+        try:
+            return float(value.get(key, default) or 0.0)
+        except (TypeError, ValueError):
+            return default
+    return default
+
+
+def _half_extents(obj):
+    """Footprint half-widths (x, z) of one object, or zeros if the payload has no size."""
+    size = obj.get('extents') or obj.get('size') or obj.get('dimensions')
+    if isinstance(size, dict):
+        width = _axis(size, 'x', _axis(size, 'width'))
+        depth = _axis(size, 'z', _axis(size, 'depth'))
+    else:
+        width = _axis(obj, 'width')
+        depth = _axis(obj, 'depth')
+
+    scale = obj.get('scale', 1.0)
+    try:
+        scale = float(scale) if not isinstance(scale, dict) else _axis(scale, 'x', 1.0)
+    except (TypeError, ValueError):
+        scale = 1.0
+
+    return abs(width) * scale / 2.0, abs(depth) * scale / 2.0
+
+
+def objects_to_arrays(objects):
+    """Convert the `objects` payload into (N, 3) positions and (N, 2) footprint half-extents."""
+    n = len(objects)
+    positions = np.zeros((n, 3), dtype=np.float64)
+    half_extents = np.zeros((n, 2), dtype=np.float64)
+
+    for i, obj in enumerate(objects):
+        pos = obj.get('position') or {}
+        positions[i] = (_axis(pos, 'x'), _axis(pos, 'y'), _axis(pos, 'z'))
+        half_extents[i] = _half_extents(obj)
+
+    return positions, half_extents
+
+
+def _footprints_overlap(positions, half_extents, i, j):
+    """Axis-aligned footprint test on the floor plane (x, z) for index arrays i, j."""
+    dx = np.abs(positions[i, 0] - positions[j, 0])
+    dz = np.abs(positions[i, 2] - positions[j, 2])
+    reach_x = half_extents[i, 0] + half_extents[j, 0]
+    reach_z = half_extents[i, 1] + half_extents[j, 1]
+    return (dx < reach_x) & (dz < reach_z)
+
+
+def _dense_pairs(positions, half_extents):
+    n = len(positions)
+    diff = positions[:, None, :] - positions[None, :, :]
+    dist = np.sqrt(np.einsum('ijk,ijk->ij', diff, diff))
+
+    i, j = np.triu_indices(n, k=1)
+    pair_dist = dist[i, j]
+    colliding = (pair_dist < CLOSE_THRESHOLD) | _footprints_overlap(positions, half_extents, i, j)
+
+    min_distance = float(pair_dist.min()) if pair_dist.size else MAX_REPORTED_DISTANCE
+    return int(np.count_nonzero(colliding)), min_distance
+
+
+def _tree_pairs(positions, half_extents):
+    from scipy.spatial import cKDTree
+
+    tree = cKDTree(positions)
+    nearest, _ = tree.query(positions, k=2)
+    min_distance = float(nearest[:, 1].min())
+
+    # Pairs whose centres are within the collision threshold
+    close = tree.query_pairs(CLOSE_THRESHOLD, output_type='ndarray')
+
+    # Footprint candidates: two boxes can only overlap if their floor-plane centres
+    # are within the sum of their largest half-diagonals
+    max_reach = 2.0 * float(np.hypot(half_extents[:, 0], half_extents[:, 1]).max())
+    pairs = close
+    if max_reach > 0:
+        floor_tree = cKDTree(positions[:, [0, 2]])
+        candidates = floor_tree.query_pairs(max_reach, output_type='ndarray')
+        if len(candidates):
+            hit = _footprints_overlap(positions, half_extents, candidates[:, 0], candidates[:, 1])
+            pairs = np.concatenate([close, candidates[hit]])
+
+    if len(pairs):
+        pairs = np.unique(np.sort(pairs, axis=1), axis=0)
+    return int(len(pairs)), min_distance
+
+
+def analyze_objects(objects):
+    """
+    Collision count, nearest-neighbour distance and clutter score for a scene.
+    Small scenes use one vectorised pairwise matrix; large ones use a KD-tree broadphase.
+    """
+    positions, half_extents = objects_to_arrays(objects)
+    n = len(positions)
+
+    if n < 2:
+        overlaps, min_distance = 0, MAX_REPORTED_DISTANCE
+    elif n <= DENSE_MAX_OBJECTS:
+        overlaps, min_distance = _dense_pairs(positions, half_extents)
+    else:
+        overlaps, min_distance = _tree_pairs(positions, half_extents)
+
+    min_distance = min(min_distance, MAX_REPORTED_DISTANCE)
+    clutter_score = min(1.0, (overlaps / n if n else 0.0) + (0.5 if n > 10 else 0))
+
+    return {
+        "object_count": n,
+        "overlaps": overlaps,
+        "min_distance": min_distance,
+        "clutter_score": clutter_score,
+    }
+
+
+def layout_suggestions(result):
+    """Human-readable suggestions for an `analyze_objects` result."""
+    suggestions = []
+    if result["clutter_score"] > 0.5:
+        suggestions.append("The room looks slightly crowded. Consider increasing space between items.")
+    if result["overlaps"] > 0:
+        suggestions.append(f"Detected {result['overlaps']} potential collisions or very close placements.")
+    if result["min_distance"] > 2.0 and result["object_count"] > 2:
+        suggestions.append("Items are spread quite far apart. Try grouping them for a cozy feel.")
+
+    if not suggestions:
+        suggestions.append("Layout looks balanced!")
+    return suggestions
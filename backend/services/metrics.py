@@ -0,0 +1,326 @@
+import os
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+from services.context_store import open_sqlite, STORE_PATH
+
+# Latency buckets in seconds, from cached/fast text calls up to slow multi-image vision calls
+AI_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+# Rough spend estimate (USD per million tokens); set to the billed model's price list
+AI_PRICE_PROMPT_PER_MTOK = float(os.getenv("AI_PRICE_PROMPT_PER_MTOK", "0.30"))
+AI_PRICE_RESPONSE_PER_MTOK = float(os.getenv("AI_PRICE_RESPONSE_PER_MTOK", "2.50"))
+
+# Gunicorn runs several worker processes, each with its own counters. With multiprocess
+# metrics on, every process writes a snapshot of its metrics to a shared SQLite file and
+# /metrics serves the sum over all of them, so any worker can answer a scrape.
+METRICS_MULTIPROCESS = os.getenv("METRICS_MULTIPROCESS", "1") == "1"
+METRICS_PATH = os.getenv("METRICS_PATH", STORE_PATH)
+# How often each process writes its snapshot; other workers' figures lag a scrape by at most this
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+# Snapshots of processes that stopped writing this long ago are dropped
+METRICS_RETENTION_SECONDS = int(os.getenv("METRICS_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (list(extra) if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=(), on_update=None):
+        self.name, self.help, self.labels = name, help_text, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        self._on_update = on_update
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(l, "") for l in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        if self._on_update is not None:
+            self._on_update()
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    @staticmethod
+    def merge(total, value):
+        return (total or 0) + value
+
+    def render(self, values=None):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        if values is None:
+            with self._lock:
+                values = dict(self._values)
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=AI_LATENCY_BUCKETS, on_update=None):
+        self.name, self.help, self.labels = name, help_text, tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        self._on_update = on_update
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(l, "") for l in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+        if self._on_update is not None:
+            self._on_update()
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), list(series)] for key, series in self._series.items()]
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    @staticmethod
+    def merge(total, series):
+        return list(series) if total is None else [a + b for a, b in zip(total, series)]
+
+    def render(self, series_by_key=None):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        if series_by_key is None:
+            with self._lock:
+                series_by_key = {key: list(series) for key, series in self._series.items()}
+        for key, series in sorted(series_by_key.items()):
+            for bound, count in zip(self.buckets, series):
+                le = _format_labels(self.labels, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{le} {count}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    All metrics of this process. In multiprocess mode a background thread writes their
+    values to the metrics_snapshots table (one row per process and metric) every
+    METRICS_FLUSH_SECONDS, and render() sums the latest snapshot of every process, live or
+    exited, so counters stay monotonic when workers are restarted.
+    """
+
+    def __init__(self, multiprocess=METRICS_MULTIPROCESS, path=METRICS_PATH, flush_seconds=METRICS_FLUSH_SECONDS):
+        self._metrics = []
+        self.multiprocess = multiprocess
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self._process_id = None
+        self._flusher = None
+        self._flush_lock = threading.Lock()
+        self._local = threading.local()
+        if multiprocess:
+            os.register_at_fork(after_in_child=self._after_fork)
+            atexit.register(self._flush_at_exit)
+
+    def _on_update(self):
+        # First value recorded in this process starts its flusher
+        if self._flusher is None:
+            self._ensure_flusher()
+
+    def counter(self, name, help_text, labels=()):
+        metric = Counter(name, help_text, labels, on_update=self._on_update if self.multiprocess else None)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=AI_LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labels, buckets,
+                           on_update=self._on_update if self.multiprocess else None)
+        self._metrics.append(metric)
+        return metric
+
+    def _after_fork(self):
+        # The child inherits the parent's in-memory values, which the parent reports itself
+        for metric in self._metrics:
+            metric.reset()
+        self._process_id = None
+        self._flusher = None
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = open_sqlite(self.path)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS metrics_snapshots ("
+                " process TEXT NOT NULL, metric TEXT NOT NULL, data TEXT NOT NULL,"
+                " updated_at REAL NOT NULL, PRIMARY KEY (process, metric))"
+            )
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def _ensure_flusher(self):
+        if self._flusher is not None:
+            return
+        with self._flush_lock:
+            if self._flusher is None:
+                # pid plus start time: a reused pid must not overwrite an exited process's totals
+                self._process_id = f"{os.getpid()}-{time.time():.6f}"
+                self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+                self._flusher.start()
+
+    def _flush_at_exit(self):
+        if self._flusher is not None:
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Metrics flush at exit failed: {e}")
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Metrics flush failed: {e}")
+
+    def flush(self):
+        """Write this process's current values to the shared snapshot table."""
+        if not self.multiprocess:
+            return
+        self._ensure_flusher()
+        now = time.time()
+        rows = [(self._process_id, m.name, json.dumps(m.snapshot()), now) for m in self._metrics]
+        conn = self._conn()
+        conn.executemany(
+            "INSERT OR REPLACE INTO metrics_snapshots (process, metric, data, updated_at) VALUES (?, ?, ?, ?)",
+            rows,
+        )
+        conn.execute("DELETE FROM metrics_snapshots WHERE updated_at < ?", (now - METRICS_RETENTION_SECONDS,))
+        conn.commit()
+
+    def render(self):
+        """Everything in the Prometheus text exposition format (version 0.0.4)."""
+        if not self.multiprocess:
+            lines = []
+            for metric in self._metrics:
+                lines.extend(metric.render())
+            return "\n".join(lines) + "\n"
+
+        # Our own snapshot first, so this worker's latest figures are included
+        self.flush()
+        by_name = {m.name: m for m in self._metrics}
+        totals = {name: {} for name in by_name}
+        for name, data in self._conn().execute("SELECT metric, data FROM metrics_snapshots"):
+            if name not in by_name:
+                continue  # A metric a newer/older release no longer defines
+            values = totals[name]
+            for key, value in json.loads(data):
+                key = tuple(key)
+                values[key] = by_name[name].merge(values.get(key), value)
+
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(totals[metric.name]))
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+ai_call_duration = registry.histogram(
+    "ai_call_duration_seconds", "Latency of outbound model calls.", ("call_site", "outcome"))
+ai_calls = registry.counter(
+    "ai_calls_total", "Outbound model calls by outcome (ok, error, timeout, cancelled).", ("call_site", "outcome"))
+ai_prompt_tokens = registry.counter(
+    "ai_prompt_tokens_total", "Prompt tokens reported by the model.", ("call_site",))
+ai_response_tokens = registry.counter(
+    "ai_response_tokens_total", "Response tokens reported by the model.", ("call_site",))
+ai_cost = registry.counter(
+    "ai_estimated_cost_usd_total", "Estimated spend from token usage and AI_PRICE_* rates.", ("call_site",))
+ai_cache_hits = registry.counter(
+    "ai_cache_hits_total", "Model calls avoided by a cache.", ("call_site", "cache"))
+
+# Exception class names that mean the call ran out of time rather than failed
+_TIMEOUT_ERRORS = ("TimeoutError", "DeadlineExceeded", "ReadTimeout", "ConnectTimeout")
+
+
+class _CallRecord:
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+
+    def record_usage(self, response):
+        """
+        Take token counts from a Gemini response/stream chunk (usage_metadata) or a
+        LangChain message (usage_metadata dict). Streams report running totals, so
+        calling this for every chunk keeps the last figures.
+        """
+        usage = getattr(response, "usage_metadata", None)
+        if not usage:
+            return
+        if isinstance(usage, dict):
+            prompt, output = usage.get("input_tokens"), usage.get("output_tokens")
+        else:
+            prompt = getattr(usage, "prompt_token_count", None)
+            output = getattr(usage, "candidates_token_count", None)
+        self.prompt_tokens = prompt or self.prompt_tokens
+        self.response_tokens = output or self.response_tokens
+
+
+@contextmanager
+def track_ai_call(call_site):
+    """
+    Time one model call and record its outcome and token usage:
+
+        with track_ai_call("chat") as call:
+            response = model.generate_content(prompt)
+            call.record_usage(response)
+    """
+    call = _CallRecord()
+    outcome = "ok"
+    start = time.perf_counter()
+    try:
+        yield call
+    except GeneratorExit:
+        # A streaming client went away mid-response
+        outcome = "cancelled"
+        raise
+    except BaseException as e:
+        outcome = "timeout" if type(e).__name__ in _TIMEOUT_ERRORS else "error"
+        raise
+    finally:
+        ai_call_duration.observe(time.perf_counter() - start, call_site=call_site, outcome=outcome)
+        ai_calls.inc(call_site=call_site, outcome=outcome)
+        if call.prompt_tokens or call.response_tokens:
+            ai_prompt_tokens.inc(call.prompt_tokens, call_site=call_site)
+            ai_response_tokens.inc(call.response_tokens, call_site=call_site)
+            ai_cost.inc(call.prompt_tokens * AI_PRICE_PROMPT_PER_MTOK / 1e6
+                        + call.response_tokens * AI_PRICE_RESPONSE_PER_MTOK / 1e6, call_site=call_site)
+
+
+def record_cache_hit(call_site, cache):
+    ai_cache_hits.inc(call_site=call_site, cache=cache)
@@ -0,0 +1,88 @@
+import io
+import numpy as np
+from PIL import Image
+
+PALETTE_SIZE = 5
+# Longest side fed to the quantizer in fast mode; a few thousand pixels is plenty for 5 colours
+FAST_SAMPLE_SIDE = 96
+# Longest side requested from libjpeg's scaled (1/2, 1/4, 1/8) DCT decoding
+FAST_DECODE_SIDE = 256
+# Quality mode keeps the original 200x200 k-means input
+QUALITY_SAMPLE_SIZE = (200, 200)
+
+PALETTE_MODES = ("fast", "quality")
+
+
+def _to_hex(rgb):
+    return '#{:02x}{:02x}{:02x}'.format(int(rgb[0]), int(rgb[1]), int(rgb[2]))
+
+
+def _fast_palette(image_bytes, n_colors):
+    img = Image.open(io.BytesIO(image_bytes))
+    # draft() makes JPEG decoding skip straight to a reduced scale; no-op for other formats
+    img.draft('RGB', (FAST_DECODE_SIDE, FAST_DECODE_SIDE))
+    img = img.convert('RGB')
+    img.thumbnail((FAST_SAMPLE_SIDE, FAST_SAMPLE_SIDE), Image.Resampling.BILINEAR)
+
+    quantized = img.quantize(colors=n_colors, method=Image.Quantize.MEDIANCUT)
+    palette = quantized.getpalette()
+    counts = quantized.getcolors(maxcolors=256) or []
+
+    colors = [(count, tuple(palette[idx * 3: idx * 3 + 3])) for count, idx in counts]
+    return colors
+
+
+def _quality_palette(image_bytes, n_colors):
+    import cv2
+    from sklearn.cluster import KMeans
+
+    file_bytes = np.frombuffer(image_bytes, np.uint8)
+    img = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    img = cv2.resize(img, QUALITY_SAMPLE_SIZE, interpolation=cv2.INTER_AREA)
+    pixels = img.reshape(-1, 3)
+
+    # Fixed seed so the same image always gives the same palette
+    kmeans = KMeans(n_clusters=n_colors, n_init=10, random_state=0)
+    labels = kmeans.fit_predict(pixels)
+    counts = np.bincount(labels, minlength=n_colors)
+    centers = kmeans.cluster_centers_.astype(int)
+
+    return [(int(counts[i]), tuple(centers[i])) for i in range(n_colors)]
+
+
+def extract_palette(image_bytes, mode="fast", n_colors=PALETTE_SIZE):
+    """
+    Dominant colours of an image, sorted by pixel share.
+    Returns a list of {"hex", "rgb", "weight"} dicts. Both modes are deterministic.
+    """
+    if mode not in PALETTE_MODES:
+        raise ValueError(f"Unknown palette mode '{mode}'. Use one of: {', '.join(PALETTE_MODES)}")
+
+    if mode == "quality":
+        colors = _quality_palette(image_bytes, n_colors)
+    else:
+        colors = _fast_palette(image_bytes, n_colors)
+
+    total = sum(count for count, _ in colors) or 1
+    # Ties broken by colour value so ordering never depends on cluster numbering
+    colors.sort(key=lambda c: (-c[0], c[1]))
+
+    return [
+        {
+            "hex": _to_hex(rgb),
+            "rgb": [int(v) for v in rgb],
+            "weight": round(count / total, 4),
+        }
+        for count, rgb in colors
+    ]
+
+
+def recommend_style(palette):
+    """Basic style recommendation from the average palette brightness."""
+    avg_v = np.mean([c["rgb"] for c in palette])
+    if avg_v > 180:
+        return "Minimalist"
+    if avg_v < 80:
+        return "Industrial"
+    return "Modern"
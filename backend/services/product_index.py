@@ -0,0 +1,119 @@
+import os
+import re
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+# Local hits needed to answer a search without asking the vendor search API
+PRODUCT_INDEX_MIN_RESULTS = int(os.getenv("PRODUCT_INDEX_MIN_RESULTS", "3"))
+PRODUCT_INDEX_MAX_RESULTS = int(os.getenv("PRODUCT_INDEX_MAX_RESULTS", "10"))
+# BM25 column weights: a match in the title counts far more than one in the vendor name
+PRODUCT_INDEX_TITLE_WEIGHT = float(os.getenv("PRODUCT_INDEX_TITLE_WEIGHT", "10.0"))
+PRODUCT_INDEX_VENDOR_WEIGHT = float(os.getenv("PRODUCT_INDEX_VENDOR_WEIGHT", "1.0"))
+
+_MAX_QUERY_TERMS = 8
+_TERM = re.compile(r"\w+")
+
+# External-content FTS5 table over products(title, vendor): the index stores only the
+# inverted lists, and the triggers keep it in step with every insert/update/delete, so
+# freshly scraped products are searchable as soon as their transaction commits.
+_SCHEMA = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        title, vendor,
+        content='products', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, title, vendor) VALUES (new.id, new.title, new.vendor);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, title, vendor)
+        VALUES ('delete', old.id, old.title, old.vendor);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF title, vendor ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, title, vendor)
+        VALUES ('delete', old.id, old.title, old.vendor);
+        INSERT INTO products_fts(rowid, title, vendor) VALUES (new.id, new.title, new.vendor);
+    END
+    """,
+)
+
+_available = False
+
+
+def ensure_product_index(engine) -> bool:
+    """
+    Create the FTS5 index and its triggers if missing (idempotent; call after create_all).
+    A new index is filled from the rows already in products. Returns False, and local
+    search stays off, on databases other than SQLite or SQLite builds without FTS5.
+    """
+    global _available
+    if engine.dialect.name != "sqlite":
+        print(f"Product index disabled: FTS5 needs SQLite, not {engine.dialect.name}")
+        _available = False
+        return False
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'")).first()
+            for statement in _SCHEMA:
+                conn.execute(text(statement))
+            if not exists:
+                conn.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+                print("Product index built from existing products")
+    except OperationalError as e:
+        print(f"Product index disabled: {e}")
+        _available = False
+        return False
+    _available = True
+    return True
+
+
+def is_available() -> bool:
+    return _available
+
+
+def match_expression(query: str) -> str:
+    """
+    FTS5 query for free text: every term must match, as a prefix ("sof" finds "sofa").
+    Terms are quoted, so user input cannot inject FTS operators.
+    """
+    terms = _TERM.findall(query.lower())[:_MAX_QUERY_TERMS]
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search_product_index(query: str, limit: int = PRODUCT_INDEX_MAX_RESULTS):
+    """
+    Products matching query, best BM25 score first. Returns None when the index is
+    unavailable, so callers can tell "no local matches" from "cannot search locally".
+    Needs an app context.
+    """
+    if not _available:
+        return None
+    expression = match_expression(query)
+    if not expression:
+        return []
+
+    from extensions import db
+    from models import Product
+
+    rows = db.session.execute(text(
+        "SELECT rowid FROM products_fts WHERE products_fts MATCH :expression "
+        "ORDER BY bm25(products_fts, :title_weight, :vendor_weight) LIMIT :limit"
+    ), {
+        "expression": expression,
+        "title_weight": PRODUCT_INDEX_TITLE_WEIGHT,
+        "vendor_weight": PRODUCT_INDEX_VENDOR_WEIGHT,
+        "limit": limit,
+    }).all()
+    ids = [row[0] for row in rows]
+    if not ids:
+        return []
+    by_id = {p.id: p for p in Product.query.filter(Product.id.in_(ids)).all()}
+    return [by_id[i].to_dict() for i in ids if i in by_id]
@@ -1,5 +1,21 @@
 import os
-from tavily import TavilyClient
+import re
+import threading
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from services.singleflight import SingleFlight
+from services.product_search import VendorSearchError, get_tavily_client, search_all_vendors, search_vendor
+from services.product_index import PRODUCT_INDEX_MIN_RESULTS, search_product_index
+
+# Cached searches younger than this are served without contacting Tavily
+PRODUCT_SEARCH_FRESH_SECONDS = int(os.getenv("PRODUCT_SEARCH_FRESH_SECONDS", str(6 * 3600)))
+# Older than fresh but younger than this: served at once and refreshed in the background
+PRODUCT_SEARCH_STALE_SECONDS = int(os.getenv("PRODUCT_SEARCH_STALE_SECONDS", str(7 * 24 * 3600)))
+
+_QUERY_PUNCTUATION = re.compile(r"[^\w\s]+")
+_product_searches = SingleFlight()
+_refreshing = set()
+_refreshing_lock = threading.Lock()
 
 class ProductScraperError(Exception):
     pass
@@ -8,76 +24,163 @@ def search_amazon_products(query: str, max_results: int = 5) -> list[dict]:
     """
     Searches amazon.com using Tavily for a given query and returns a list of dictionaries.
     """
-    results = []
-    tavily_api_key = os.environ.get("TAVILY_API_KEY")
-    
-    if not tavily_api_key:
+    client = get_tavily_client()
+    if client is None:
         print("TAVILY_API_KEY not found in environment. Returning empty list.")
         return []
-
     try:
-        # Initialize Tavily client
-        client = TavilyClient(api_key=tavily_api_key)
-        
-        # Explicit search for Amazon
-        tavily_query = f"site:amazon.com {query} buy online furniture"
-        print(f"Querying Tavily for: {tavily_query}")
-        
-        # Execute search with include_images=True
-        # We also request raw content if available, but usually the snippet describes it well
-        response = client.search(
-            query=tavily_query,
-            search_depth="advanced",
-            include_images=True,
-            include_answer=False,
-            max_results=max_results
-        )
-        
-        search_results = response.get("results", [])
-        images = response.get("images", [])
-        
-        for i, item in enumerate(search_results):
-            # Fallback to amazon logo or a placeholder if images aren't found for that specific index
-            image_url = images[i] if i < len(images) else "https://via.placeholder.com/300?text=Amazon+Product"
-            
-            title = item.get("title", f"Amazon Product: {query}")
-            url = item.get("url", f"https://www.amazon.com/s?k={query}")
-            
-            # Tavily might not always return direct Amazon prices in snippets,
-            # so we'll do our best to extract it from the content snippet using $ regex,
-            # or provide a default layout
-            import re
-            price_match = re.search(r'\$(\d+(?:\.\d{2})?)', item.get("content", ""))
-            price = f"${price_match.group(1)}" if price_match else "Check Amazon"
-            
-            results.append({
-                "title": title[:70] + "..." if len(title) > 70 else title,
-                "vendor": "amazon.com",
-                "url": url,
-                "price": price,
-                "rating": "4.5 out of 5 stars", # Mock rating as snippets rarely show exact stars cleanly
-                "image_url": image_url
-            })
-            
+        return search_vendor(client, "amazon.com", query, max_results)
     except Exception as e:
         print(f"Tavily Scraper Exception: {str(e)}")
         raise ProductScraperError(f"Failed to scrape using Tavily: {str(e)}")
-        
-    return results
 
-def get_or_scrape_products(query: str) -> list[dict]:
-    """
-    Calls Tavily to search Amazon and returns raw results.
-    No DB dependency to avoid Flask app context issues.
-    """
+
+def normalize_query(query: str) -> str:
+    """Cache key for a search: lowercase, punctuation dropped, whitespace collapsed."""
+    return " ".join(_QUERY_PUNCTUATION.sub(" ", query.lower()).split())[:300]
+
+
+def _scrape(query: str) -> list[dict]:
     try:
-        scraped_data = search_amazon_products(query)
+        scraped_data = search_all_vendors(query)
         print(f"Tavily returned {len(scraped_data)} results for '{query}'.", flush=True)
         return scraped_data
-    except ProductScraperError as e:
+    except (ProductScraperError, VendorSearchError) as e:
         print(f"Scraper error: {e}")
         return []
     except Exception as e:
         print(f"Unexpected error in get_or_scrape_products: {e}")
         return []
 
+
+def _store_results(query_key: str, query: str, scraped: list[dict]):
+    """Upsert scraped products (by URL) and point the search row at them, in rank order."""
+    from extensions import db
+    from models import Product, ProductSearch, ProductSearchResult
+
+    now = datetime.utcnow()
+    try:
+        search = ProductSearch.query.filter_by(query_key=query_key).first()
+        if search is None:
+            search = ProductSearch(query_key=query_key, query_text=query[:300])
+            db.session.add(search)
+
+        products = []
+        for item in scraped:
+            product = Product.query.filter_by(url=item["url"], vendor=item["vendor"]).first()
+            if product is None:
+                product = Product(url=item["url"], vendor=item["vendor"])
+                db.session.add(product)
+            product.title = item["title"]
+            product.price = item.get("price")
+            product.rating = item.get("rating")
+            product.image_url = item.get("image_url")
+            product.last_scraped_at = now
+            if product not in products:
+                products.append(product)
+
+        search.results = [ProductSearchResult(product=p, rank=i) for i, p in enumerate(products)]
+        search.result_count = len(products)
+        search.refreshed_at = now
+        db.session.commit()
+    except IntegrityError:
+        # Another worker stored the same query first; theirs is just as fresh
+        db.session.rollback()
+        search = ProductSearch.query.filter_by(query_key=query_key).first()
+    return search
+
+
+def _scrape_and_store(query_key: str, query: str) -> list[dict]:
+    scraped = _scrape(query)
+    if not scraped:
+        return []
+    search = _store_results(query_key, query, scraped)
+    return [p.to_dict() for p in search.products()] if search else []
+
+
+def _refresh_in_background(app, query_key: str, query: str):
+    with _refreshing_lock:
+        if query_key in _refreshing:
+            return
+        _refreshing.add(query_key)
+
+    def refresh():
+        try:
+            with app.app_context():
+                if _scrape_and_store(query_key, query):
+                    print(f"Refreshed product search '{query_key}'")
+        except Exception as e:
+            print(f"Background product refresh failed for '{query_key}': {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(query_key)
+
+    threading.Thread(target=refresh, name="product-refresh", daemon=True).start()
+
+
+def search_products_cached(query: str) -> tuple[list[dict], str]:
+    """
+    Product search that stays local whenever it can:
+    1. the cached results of this exact query (stale-while-revalidate),
+    2. the full-text product index, if it has at least PRODUCT_INDEX_MIN_RESULTS matches,
+    3. a live vendor search, whose results are stored and indexed for next time.
+    Returns (results, cache_status) with status "fresh", "stale", "index" or "miss".
+    Needs an app context.
+    """
+    from flask import current_app
+    from extensions import db
+    from models import ProductSearch
+
+    query_key = normalize_query(query)
+    if not query_key:
+        return [], "miss"
+
+    search = ProductSearch.query.filter_by(query_key=query_key).first()
+    if search is not None and search.result_count:
+        age = (datetime.utcnow() - search.refreshed_at).total_seconds()
+        if age < PRODUCT_SEARCH_STALE_SECONDS:
+            search.hits = (search.hits or 0) + 1
+            results = [p.to_dict() for p in search.products()]
+            db.session.commit()
+            if age < PRODUCT_SEARCH_FRESH_SECONDS:
+                return results, "fresh"
+            _refresh_in_background(current_app._get_current_object(), query_key, query)
+            return results, "stale"
+
+    local = search_product_index(query)
+    if local and len(local) >= PRODUCT_INDEX_MIN_RESULTS:
+        return local, "index"
+
+    # Too little locally: scrape now. Concurrent misses for the same query share one Tavily call
+    results = _product_searches.do(query_key, _scrape_and_store, query_key, query)
+    if not results:
+        # Vendor search failed or found nothing; old or partial local results beat an empty page
+        if search is not None and search.result_count:
+            return [p.to_dict() for p in search.products()], "stale"
+        if local:
+            return local, "index"
+    return results, "miss"
+
+
+def search_products_or_scrape(query: str) -> tuple[list[dict], str]:
+    """
+    search_products_cached, falling back to a direct Tavily call (status "bypass") when
+    the database fails or outside an app context (e.g. from scripts), where it is not available.
+    """
+    from flask import has_app_context
+    if not has_app_context():
+        return _scrape(query), "bypass"
+    try:
+        results, status = search_products_cached(query)
+        print(f"Product search '{query}': {status} ({len(results)} results)")
+        return results, status
+    except SQLAlchemyError as e:
+        print(f"Product cache unavailable, scraping directly: {e}")
+        from extensions import db
+        db.session.rollback()
+        return _scrape(query), "bypass"
+
+
+def get_or_scrape_products(query: str) -> list[dict]:
+    """Product search for the agent tools: results only (see search_products_or_scrape)."""
+    return search_products_or_scrape(query)[0]
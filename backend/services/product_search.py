@@ -0,0 +1,174 @@
+import os
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+# Vendor sites searched for every query, in parallel
+PRODUCT_SEARCH_VENDORS = [v.strip() for v in os.getenv(
+    "PRODUCT_SEARCH_VENDORS", "amazon.com,wayfair.com,ikea.com").split(",") if v.strip()]
+# Each vendor is its own Tavily search, so a cache miss costs one Tavily call per vendor;
+# at most this many vendors are searched per query
+PRODUCT_SEARCH_MAX_VENDORS = int(os.getenv("PRODUCT_SEARCH_MAX_VENDORS", "3"))
+# Results returned once vendors are merged, and asked of each vendor
+PRODUCT_SEARCH_MAX_RESULTS = int(os.getenv("PRODUCT_SEARCH_MAX_RESULTS", "10"))
+PRODUCT_SEARCH_RESULTS_PER_VENDOR = int(os.getenv("PRODUCT_SEARCH_RESULTS_PER_VENDOR", "5"))
+# Vendors that have not answered by then are left out of this response
+PRODUCT_SEARCH_DEADLINE_SECONDS = float(os.getenv("PRODUCT_SEARCH_DEADLINE_SECONDS", "8"))
+PRODUCT_SEARCH_MAX_WORKERS = int(os.getenv("PRODUCT_SEARCH_MAX_WORKERS", "8"))
+
+_PRICE = re.compile(r"([$₹£€])\s?(\d[\d,]*(?:\.\d{2})?)")
+_TITLE_NOISE = re.compile(r"[^a-z0-9]+")
+# Amazon serves one product under many paths; the ASIN identifies it
+_AMAZON_ASIN = re.compile(r"/(?:dp|gp/product)/([A-Z0-9]{10})", re.IGNORECASE)
+
+_client = None
+_client_key = None
+_client_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class VendorSearchError(Exception):
+    """Every vendor search failed; nothing to merge."""
+    pass
+
+
+def get_tavily_client():
+    """
+    One TavilyClient per process (rebuilt if TAVILY_API_KEY changes), shared by all
+    threads instead of constructing a client per search. None without an API key.
+    """
+    global _client, _client_key
+    api_key = os.environ.get("TAVILY_API_KEY")
+    if not api_key:
+        return None
+    if _client is None or _client_key != api_key:
+        with _client_lock:
+            if _client is None or _client_key != api_key:
+                from tavily import TavilyClient
+                _client = TavilyClient(api_key=api_key)
+                _client_key = api_key
+    return _client
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=PRODUCT_SEARCH_MAX_WORKERS,
+                                               thread_name_prefix="vendor-search")
+    return _executor
+
+
+def _after_fork():
+    # The pool's threads do not exist in a forked child; it builds its own
+    global _executor
+    _executor = None
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def search_vendor(client, vendor: str, query: str, max_results: int = PRODUCT_SEARCH_RESULTS_PER_VENDOR) -> list[dict]:
+    """One Tavily search scoped to a vendor site, parsed into product dicts in rank order."""
+    response = client.search(
+        query=f"site:{vendor} {query} buy online furniture",
+        search_depth="advanced",
+        include_images=True,
+        include_answer=False,
+        max_results=max_results,
+    )
+    images = response.get("images", [])
+    results = []
+    for i, item in enumerate(response.get("results", [])):
+        title = item.get("title") or f"{vendor} product: {query}"
+        # Snippets rarely carry a clean price; take the first currency amount if there is one
+        price_match = _PRICE.search(item.get("content", ""))
+        results.append({
+            "title": title[:70] + "..." if len(title) > 70 else title,
+            "vendor": vendor,
+            "url": item.get("url") or f"https://www.{vendor}/s?k={query}",
+            "price": "".join(price_match.groups()) if price_match else f"Check {vendor}",
+            "rating": "4.5 out of 5 stars",  # Snippets rarely show exact stars cleanly
+            "image_url": images[i] if i < len(images) else "https://via.placeholder.com/300?text=Product",
+        })
+    return results
+
+
+def normalize_url(url: str) -> str:
+    """Dedup key for a product URL: host without www, path without tracking query/fragment."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    asin = _AMAZON_ASIN.search(parts.path) if "amazon." in host else None
+    if asin:
+        return f"{host}/dp/{asin.group(1).upper()}"
+    return f"{host}{parts.path.rstrip('/').lower()}"
+
+
+def normalize_title(title: str) -> str:
+    return _TITLE_NOISE.sub(" ", title.lower().removesuffix("...")).strip()[:60]
+
+
+def merge_results(per_vendor: dict[str, list[dict]], limit: int = PRODUCT_SEARCH_MAX_RESULTS) -> list[dict]:
+    """
+    Merge vendor result lists by reciprocal rank: each listing scores 1 / (rank + 1) in its
+    vendor's list, listings with the same normalized URL or title are one product (their
+    scores add up), and the best-scoring products come first. Ties keep vendor order.
+    """
+    merged = []   # [score, first_seen, product]
+    by_key = {}
+    for vendor_results in per_vendor.values():
+        for rank, product in enumerate(vendor_results):
+            keys = [k for k in (normalize_url(product["url"]), normalize_title(product["title"])) if k]
+            entry = next((by_key[k] for k in keys if k in by_key), None)
+            if entry is None:
+                entry = [0.0, len(merged), product]
+                merged.append(entry)
+            entry[0] += 1.0 / (rank + 1)
+            for k in keys:
+                by_key.setdefault(k, entry)
+    merged.sort(key=lambda e: (-e[0], e[1]))
+    return [product for _, _, product in merged[:limit]]
+
+
+def search_all_vendors(query: str, vendors: list[str] = None, deadline: float = PRODUCT_SEARCH_DEADLINE_SECONDS,
+                       max_results: int = PRODUCT_SEARCH_MAX_RESULTS) -> list[dict]:
+    """
+    Fan one query out to every vendor at once and merge what comes back within the deadline,
+    so the search takes as long as the slowest vendor (at most `deadline`), not their sum.
+    Each vendor costs one Tavily call; only the first PRODUCT_SEARCH_MAX_VENDORS are searched.
+    Vendors that fail or run late are skipped; raises VendorSearchError only if all fail.
+    """
+    client = get_tavily_client()
+    if client is None:
+        print("TAVILY_API_KEY not found in environment. Returning empty list.")
+        return []
+
+    vendors = (vendors or PRODUCT_SEARCH_VENDORS)[:max(1, PRODUCT_SEARCH_MAX_VENDORS)]
+    start = time.perf_counter()
+    executor = _get_executor()
+    futures = {executor.submit(search_vendor, client, vendor, query): vendor for vendor in vendors}
+    done, pending = wait(futures, timeout=deadline)
+
+    per_vendor, errors = {}, []
+    for future, vendor in futures.items():
+        # Keep the caller's vendor order so rank ties are broken the same way every time
+        if future in pending:
+            future.cancel()
+            errors.append(f"{vendor}: no answer within {deadline:g}s")
+        elif future.exception() is not None:
+            errors.append(f"{vendor}: {future.exception()}")
+        else:
+            per_vendor[vendor] = future.result()
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    counts = ", ".join(f"{v}={len(r)}" for v, r in per_vendor.items())
+    print(f"Vendor search '{query}' in {elapsed_ms:.0f} ms ({counts or 'no results'})")
+    for error in errors:
+        print(f"Vendor search skipped {error}")
+    if errors and not per_vendor:
+        raise VendorSearchError("; ".join(errors))
+    return merge_results(per_vendor, max_results)
@@ -0,0 +1,53 @@
+import os
+import re
+import hashlib
+from services.context_store import MemoryStore, SQLiteStore, STORE_PATH
+
+AI_RESPONSE_CACHE_SIZE = int(os.getenv("AI_RESPONSE_CACHE_SIZE", "512"))
+AI_RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("AI_RESPONSE_CACHE_TTL_SECONDS", "3600"))
+# Write-through copy in the shared SQLite file, so answers survive restarts and are shared by workers
+AI_RESPONSE_CACHE_PERSIST = os.getenv("AI_RESPONSE_CACHE_PERSIST", "0") == "1"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def prompt_key(prompt):
+    """Stable key for a prompt: whitespace-normalised, then hashed so keys stay small."""
+    normalized = _WHITESPACE.sub(" ", prompt).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe LRU+TTL cache of model responses, with an optional on-disk tier."""
+
+    def __init__(self, max_entries=AI_RESPONSE_CACHE_SIZE, ttl=AI_RESPONSE_CACHE_TTL_SECONDS,
+                 persist=AI_RESPONSE_CACHE_PERSIST):
+        self.memory = MemoryStore(max_entries=max_entries, ttl=ttl)
+        self.disk = SQLiteStore(STORE_PATH, namespace="ai_responses", max_entries=max_entries * 4, ttl=ttl) \
+            if persist else None
+
+    def get(self, prompt):
+        key = prompt_key(prompt)
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, prompt, value):
+        key = prompt_key(prompt)
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        stats = {"memory": self.memory.stats()}
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+        return stats
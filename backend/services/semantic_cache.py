@@ -0,0 +1,173 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from services.furniture_mapper import singularize
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "1") == "1"
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "512"))
+SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", str(6 * 3600)))
+# Cosine similarity needed to reuse an answer; tune with X-Semantic-Cache-Score. A question about a
+# different object ("rug" for "sofa") or with one word added ("... should I avoid ...") scores about
+# as high as a true rewording, so a hit also needs exactly the content words of the cached question
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+# Share of the similarity taken from word unigrams; the rest comes from character n-grams
+SEMANTIC_CACHE_WORD_WEIGHT = float(os.getenv("SEMANTIC_CACHE_WORD_WEIGHT", "0.8"))
+# "global" shares answers between users asking in the same room context; "user" keeps them per user
+SEMANTIC_CACHE_SCOPE = os.getenv("SEMANTIC_CACHE_SCOPE", "global").lower()
+
+# Spelling and wording variants folded together before vectorising
+_CANONICAL_TERMS = {
+    "colour": "color",
+    "colours": "colors",
+    "lounge": "living room",
+    "couch": "sofa",
+    "couches": "sofas",
+    "grey": "gray",
+    "favourite": "favorite",
+}
+_TERM_PATTERN = re.compile(r"\b(" + "|".join(_CANONICAL_TERMS) + r")\b")
+
+# Negations change the answer asked for, so unlike the stock English stop list they are content words;
+# the filler words only rephrase the question ("which sofa colour suits..." = "what colour sofa for...")
+_NEGATIONS = {"not", "no", "nor", "never", "none", "nothing", "cannot", "without"}
+_FILLER_WORDS = {"suit", "suits", "best", "good", "ideal", "recommend", "choose", "pick"}
+
+
+def _stop_words():
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    return sorted((ENGLISH_STOP_WORDS - _NEGATIONS) | _FILLER_WORDS)
+
+
+def _canonical_text(text):
+    text = str(text).lower()
+    return _TERM_PATTERN.sub(lambda m: _CANONICAL_TERMS[m.group(1)], text)
+
+
+def context_key(room_type, style, furniture=(), owner=None):
+    """
+    Answers are only shared between questions asked with the same prompt context: room type,
+    style and the furniture listed in the prompt (in any order), and the same user when
+    SEMANTIC_CACHE_SCOPE=user.
+    """
+    items = sorted({str(item).strip().lower() for item in furniture or () if str(item).strip()})
+    digest = hashlib.sha1("\n".join(items).encode("utf-8")).hexdigest()[:16]
+    key = f"{str(room_type).strip().lower()}|{str(style).strip().lower()}|{digest}"
+    if SEMANTIC_CACHE_SCOPE == "user":
+        key += f"|{owner}"
+    return key
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour cache of recent assistant answers. Questions are embedded with
+    stateless hashing vectorizers (character and word n-grams), so no fitting is needed
+    and memory is bounded by the entry cap.
+    """
+
+    def __init__(self, max_entries=SEMANTIC_CACHE_SIZE, threshold=SEMANTIC_CACHE_THRESHOLD,
+                 ttl=SEMANTIC_CACHE_TTL_SECONDS, word_weight=SEMANTIC_CACHE_WORD_WEIGHT):
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self.word_weight = min(max(word_weight, 0.0), 1.0)
+        self._char = HashingVectorizer(analyzer="char_wb", ngram_range=(3, 5), n_features=2 ** 18,
+                                       alternate_sign=False, norm="l2")
+        self._word = HashingVectorizer(analyzer="word", n_features=2 ** 18, alternate_sign=False,
+                                       norm="l2", stop_words=_stop_words())
+        self._terms = self._word.build_analyzer()
+        self._entries = OrderedDict()  # id -> (context, vector, terms, answer, created_at)
+        self._next_id = 0
+        self._matrix = None
+        self._matrix_ids = []
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _vectorize(self, text):
+        """Unit vector for a question, and its content words (stop words dropped, singular)."""
+        import scipy.sparse as sp
+        text = _canonical_text(text)
+        terms = frozenset(singularize(term) for term in self._terms(text))
+        # Weights add up to one, so the result is still unit length
+        vector = sp.hstack([
+            self._char.transform([text]) * ((1.0 - self.word_weight) ** 0.5),
+            self._word.transform([" ".join(sorted(terms))]) * (self.word_weight ** 0.5),
+        ]).tocsr()
+        return vector, terms
+
+    def _rebuild(self):
+        import scipy.sparse as sp
+        self._matrix_ids = list(self._entries)
+        vectors = [self._entries[i][1] for i in self._matrix_ids]
+        self._matrix = sp.vstack(vectors).tocsr() if vectors else None
+
+    def lookup(self, question, context):
+        """
+        Return (answer, score) for the closest question in `context` that passes the threshold
+        and has the same content words; answer is None if there is none.
+        """
+        query, terms = self._vectorize(question)
+        now = time.time()
+        with self._lock:
+            if self._matrix is None or len(self._matrix_ids) != len(self._entries):
+                self._rebuild()
+            if self._matrix is None:
+                self._stats["misses"] += 1
+                return None, 0.0
+
+            scores = (self._matrix @ query.T).toarray().ravel()
+            for row, entry_id in enumerate(self._matrix_ids):
+                entry = self._entries[entry_id]
+                if entry[0] != context or now - entry[4] > self.ttl:
+                    scores[row] = -1.0
+
+            for row in np.argsort(-scores):
+                score = float(scores[row])
+                if score < self.threshold:
+                    break
+                entry_id = self._matrix_ids[row]
+                if self._entries[entry_id][2] == terms:
+                    self._entries.move_to_end(entry_id)
+                    self._stats["hits"] += 1
+                    return self._entries[entry_id][3], score
+
+            self._stats["misses"] += 1
+            return None, max(float(scores.max()), 0.0)
+
+    def add(self, question, context, answer):
+        vector, terms = self._vectorize(question)
+        with self._lock:
+            self._entries[self._next_id] = (context, vector, terms, answer, time.time())
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+            self._matrix = None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({"size": len(self._entries), "max_entries": self.max_entries, "threshold": self.threshold,
+                          "word_weight": self.word_weight})
+        return stats
+
+
+_semantic_cache = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache():
+    """Process-wide semantic cache, or None when SEMANTIC_CACHE_ENABLED=0."""
+    global _semantic_cache
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticCache()
+    return _semantic_cache
@@ -0,0 +1,258 @@
+import re
+import json
+
+# Passed as generation_config to Gemini calls whose output we parse
+JSON_GENERATION_CONFIG = {"response_mime_type": "application/json"}
+
+# Per-endpoint output schemas (a small JSON Schema subset: type, required, properties, items)
+SCHEMAS = {
+    "room_analysis": {
+        "type": "object",
+        "required": ["room_type", "style", "detected_objects"],
+        "properties": {
+            "room_type": {"type": "string"},
+            "style": {"type": "string"},
+            "description": {"type": "string"},
+            "detected_objects": {"type": "array", "items": {"type": "string"}},
+        },
+    },
+    "assistant_chat": {
+        "type": "object",
+        "required": ["text"],
+        "properties": {
+            "text": {"type": "string"},
+            "suggested_action": {"type": "string"},
+        },
+    },
+    "refine_recommendations": {
+        "type": "object",
+        "required": ["refined_recommendations"],
+        "properties": {
+            "refined_recommendations": {"type": "array", "items": {"type": "string"}},
+        },
+    },
+    "booking_result": {
+        "type": "object",
+        "required": ["status"],
+        "properties": {
+            "status": {"type": "string"},
+        },
+    },
+}
+
+_OPEN = re.compile(r"[{\[]")
+_CLOSER = {"{": "}", "[": "]"}
+_STRUCTURAL = re.compile(r'[{}\[\]"]')
+_IN_STRING = re.compile(r'["\\]')
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "number": (int, float),
+    "integer": int,
+    "boolean": bool,
+}
+
+
+def validate(data, schema, path="$"):
+    """Return a list of schema violations (empty when `data` conforms)."""
+    errors = []
+    expected = schema.get("type")
+    if expected:
+        python_type = _TYPES[expected]
+        if not isinstance(data, python_type) or (expected in ("number", "integer") and isinstance(data, bool)):
+            return [f"{path}: expected {expected}, got {type(data).__name__}"]
+
+    if isinstance(data, dict):
+        for key in schema.get("required", []):
+            if key not in data:
+                errors.append(f"{path}.{key}: required")
+        for key, sub_schema in schema.get("properties", {}).items():
+            if key in data:
+                errors.extend(validate(data[key], sub_schema, f"{path}.{key}"))
+    elif isinstance(data, list) and "items" in schema:
+        for i, item in enumerate(data):
+            errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+    return errors
+
+
+class IncrementalJSONExtractor:
+    """
+    Finds top-level JSON objects/arrays in text that arrives in pieces (a streamed model
+    response). A forward scan that jumps between structural characters, keeping only the
+    open-bracket stack and string state between chunks, so work is linear however the text
+    is chunked. Prose and markdown fences around the JSON are skipped; quotes outside a
+    candidate are ignored, so "Here's the result:" does not confuse it.
+
+    A bracket in the prose ("see [1 for details") opens a candidate that never parses. When a
+    candidate hits a mismatched closer, fails to parse, or is still open at close(), the
+    scan resumes behind its opener without starting over: every bracket already met outside
+    a string is known to have closed at a given point (that span is parsed as is) or never
+    to close (skipped), so only brackets first seen inside a string are scanned again.
+    Nesting deeper than max_depth is not JSON a model sends; such a candidate is dropped.
+    """
+
+    def __init__(self, max_chars=1_000_000, max_depth=128):
+        self.max_chars = max_chars
+        self.max_depth = max_depth
+        self.objects = []
+        self.errors = 0
+        self._consumed = 0  # stream offset of the end of the text fed so far
+        self._known = {}    # stream offset of a bracket -> offset just past its closer, or None
+        self._reset()
+
+    def feed(self, chunk):
+        """Consume more text; returns the objects completed by this chunk."""
+        completed = []
+        base = self._consumed
+        self._consumed += len(chunk)
+        self._scan(chunk, base, completed)
+        return completed
+
+    def close(self):
+        """End of input: a candidate still open was not JSON; returns objects found behind it."""
+        completed = []
+        while self._stack:
+            rest, base = self._abandon("", self._consumed, self._consumed, completed)
+            self._scan(rest, base, completed)
+        return completed
+
+    def _scan(self, chunk, base, completed):
+        # `base` is the stream offset of chunk[0]
+        start = 0  # where the current candidate begins in this chunk
+        pos = 0
+        if self._escape and chunk:
+            # The previous chunk ended on a backslash inside a string
+            self._escape = False
+            pos = 1
+
+        while pos < len(chunk):
+            if not self._stack:
+                match = _OPEN.search(chunk, pos)
+                if match is None:
+                    break
+                start, pos = match.start(), match.end()
+                self._start = base + start
+                self._stack.append((_CLOSER[match.group()], self._start))
+                continue
+
+            match = (_IN_STRING if self._in_string else _STRUCTURAL).search(chunk, pos)
+            if match is None:
+                pos = len(chunk)
+                break
+            ch, pos = match.group(), match.end()
+            if self._in_string:
+                if ch == "\\":
+                    if pos < len(chunk):
+                        pos += 1
+                    else:
+                        self._escape = True
+                else:
+                    self._in_string = False
+                continue
+            failed_at = None
+            if ch == '"':
+                self._in_string = True
+            elif ch == "{" or ch == "[":
+                if len(self._stack) < self.max_depth:
+                    self._stack.append((_CLOSER[ch], base + pos - 1))
+                else:
+                    # Too deep: give up on every bracket open around it, retry from this one
+                    failed_at = base + pos - 1
+            elif ch != self._stack[-1][0]:
+                # Mismatched closer: the opener was prose, not JSON
+                failed_at = base + pos
+            else:
+                _, opened_at = self._stack.pop()
+                if self._stack:
+                    self._known[opened_at] = base + pos
+                elif self._emit("".join(self._parts) + chunk[start:pos], completed):
+                    self._reset()
+                    self._known = {k: v for k, v in self._known.items() if k >= base + pos}
+                else:
+                    failed_at = base + pos
+            if failed_at is not None:
+                chunk, base = self._abandon(chunk[start:], base + start, failed_at, completed)
+                start = pos = 0
+
+        if self._stack:
+            self._parts.append(chunk[start:])
+            self._size += len(chunk) - start
+            if self._size > self.max_chars:
+                # Runaway candidate (unbalanced output); drop it rather than grow without bound
+                self._reset()
+                self._known = {}
+                self.errors += 1
+
+    def _emit(self, text, completed):
+        try:
+            obj = json.loads(text)
+        except (ValueError, RecursionError):
+            return False
+        self.objects.append(obj)
+        completed.append(obj)
+        return True
+
+    def _abandon(self, tail, tail_at, failed_at, completed):
+        """
+        Drop the current candidate, which failed at stream offset `failed_at`. Balanced spans
+        inside it are parsed from what the scan recorded; returns the text from the first
+        bracket that still has to be scanned, and its stream offset.
+        """
+        origin = self._start
+        text = "".join(self._parts) + tail
+        self._known[origin] = None
+        for _, opened_at in self._stack:
+            self._known[opened_at] = None
+        self._reset()
+        self.errors += 1
+
+        stop = failed_at - origin
+        i = 1
+        while True:
+            match = _OPEN.search(text, i, stop)
+            if match is None:
+                i = max(i, stop)
+                break
+            i = match.start()
+            if origin + i not in self._known:
+                break  # Only ever seen inside a string: scan again from here
+            end = self._known[origin + i]
+            if end is not None and self._emit(text[i:end - origin], completed):
+                i = end - origin
+            else:
+                i += 1
+        return text[i:], origin + i
+
+    def _reset(self):
+        self._parts = []
+        self._size = 0
+        self._start = 0
+        self._stack = []  # (expected closer, stream offset of the opener)
+        self._in_string = False
+        self._escape = False
+
+
+def extract_json(text, schema=None):
+    """
+    First JSON value in `text` (object or array) that conforms to `schema`, or None.
+    A JSON-mode response parses directly; anything else goes through the linear scanner.
+    """
+    if not text:
+        return None
+
+    stripped = text.strip()
+    if stripped[:1] in ("{", "["):
+        try:
+            obj = json.loads(stripped)
+            if schema is None or not validate(obj, schema):
+                return obj
+        except (ValueError, RecursionError):
+            pass
+
+    extractor = IncrementalJSONExtractor()
+    for obj in extractor.feed(text) + extractor.close():
+        if schema is None or not validate(obj, schema):
+            return obj
+    return None
@@ -0,0 +1,126 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+import pytest
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+os.environ.setdefault("CONTEXT_STORE_PATH", os.path.join(tempfile.mkdtemp(), "store.db"))
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("langchain_google_genai")
+
+from langchain_core.messages import AIMessage
+import services.agent_service as agent
+
+
+class ScriptedLLM:
+    """Stands in for the bound Gemini model: answers turn N with script[N]."""
+
+    def __init__(self, script, delay=0.0):
+        self.script = script
+        self.delay = delay
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        time.sleep(self.delay)
+        step = self.script[sum(1 for m in messages if isinstance(m, AIMessage))]
+        if isinstance(step, Exception):
+            raise step
+        return AIMessage(content=step.get("content", ""), tool_calls=step.get("tool_calls", []))
+
+
+def use_llm(monkeypatch, llm):
+    monkeypatch.setattr(agent, "get_booking_llm", lambda: llm)
+    searches = []
+    monkeypatch.setattr(agent, "get_or_scrape_products",
+                        lambda q: searches.append(q) or [{"title": q, "url": "https://shop/p"}])
+    return searches
+
+
+def call(name, args, call_id):
+    return {"name": name, "args": args, "id": call_id, "type": "tool_call"}
+
+
+FINAL = {"content": json.dumps({"status": "FALLBACK", "reason": "SECURE_HANDOFF_REQUIRED"})}
+
+
+def test_pause_and_resume_without_repeating_turns(monkeypatch):
+    print("\n--- Checking INFO_REQUIRED pause and resume ---")
+    llm = ScriptedLLM([
+        {"tool_calls": [call("find", {"query": "sofa"}, "1"), call("ask", {"question": "Which colour?"}, "2")]},
+        {"tool_calls": [call("find", {"query": "sofa"}, "3")]},
+        FINAL,
+    ])
+    searches = use_llm(monkeypatch, llm)
+
+    paused = agent.run_booking_agent("https://shop/p", 7)
+    assert paused["status"] == "INFO_REQUIRED" and paused["question"] == "Which colour?"
+    with pytest.raises(agent.AgentSessionNotFound):
+        agent.resume_booking_agent(paused["session_id"], 8, "blue")  # Someone else's session
+    with pytest.raises(ValueError):
+        agent.resume_booking_agent(paused["session_id"], 7, None)
+
+    done = agent.resume_booking_agent(paused["session_id"], 7, "blue")
+    print(f"Model calls: {llm.calls}, searches: {searches}, result: {done['status']}")
+    assert done["status"] == "FALLBACK"
+    assert llm.calls == 3          # Turn 1 was not re-run on resume
+    assert searches == ["sofa"]    # The repeated find came from the session memo
+    with pytest.raises(agent.AgentSessionNotFound):
+        agent.resume_booking_agent(paused["session_id"], 7, "blue")  # Finished sessions are gone
+
+
+def test_model_failure_keeps_resumable_checkpoint(monkeypatch):
+    print("\n--- Checking a model error mid-session ---")
+    llm = ScriptedLLM([{"tool_calls": [call("find", {"query": "lamp"}, "1")]}, RuntimeError("503"), FINAL])
+    use_llm(monkeypatch, llm)
+    interrupted = agent.run_booking_agent("https://shop/p", 7)
+    assert interrupted["status"] == "PROCESSING" and interrupted["session_id"]
+
+    llm.script[1] = {"content": FINAL["content"]}
+    done = agent.resume_booking_agent(interrupted["session_id"], 7)
+    assert done["status"] == "FALLBACK"
+
+
+def test_failure_before_any_turn_leaves_nothing_behind(monkeypatch):
+    llm = ScriptedLLM([RuntimeError("503")])
+    use_llm(monkeypatch, llm)
+    before = len(agent._get_session_store())
+    with pytest.raises(RuntimeError):
+        agent.run_booking_agent("https://shop/p", 7)
+    assert len(agent._get_session_store()) == before
+
+
+def test_concurrent_resumes_run_the_session_once(monkeypatch):
+    print("\n--- Checking that two resumes of one session cannot both run ---")
+    llm = ScriptedLLM([{"tool_calls": [call("ask", {"question": "Size?"}, "1")]}, FINAL])
+    use_llm(monkeypatch, llm)
+    paused = agent.run_booking_agent("https://shop/p", 7)
+    llm.delay = 0.3
+
+    outcomes = []
+
+    def resume():
+        try:
+            outcomes.append(agent.resume_booking_agent(paused["session_id"], 7, "large")["status"])
+        except agent.AgentSessionBusy:
+            outcomes.append("busy")
+        except agent.AgentSessionNotFound:
+            outcomes.append("finished")
+
+    threads = [threading.Thread(target=resume) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"Outcomes: {outcomes}, model calls: {llm.calls}")
+    assert outcomes.count("FALLBACK") == 1
+    assert llm.calls == 2
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
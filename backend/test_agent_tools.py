@@ -0,0 +1,98 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+import pytest
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+os.environ.setdefault("CONTEXT_STORE_PATH", os.path.join(tempfile.mkdtemp(), "store.db"))
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("langchain_google_genai")
+
+import services.agent_service as agent
+
+
+class FakeTool:
+    """Stands in for a LangChain tool: records calls and sleeps to simulate the network."""
+
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def invoke(self, args):
+        with self._lock:
+            self.calls.append(args)
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return f"result for {json.dumps(args, sort_keys=True)}"
+
+
+def call(name, **args):
+    return {"name": name, "args": args, "id": f"{name}-{len(args)}"}
+
+
+def use_tools(monkeypatch, **tools):
+    monkeypatch.setattr(agent, "TOOL_MAP", tools)
+    return tools
+
+
+def test_turn_takes_as_long_as_its_slowest_tool(monkeypatch):
+    print("\n--- Checking that one turn's tool calls run concurrently ---")
+    tools = use_tools(monkeypatch, find=FakeTool(delay=0.3), cart=FakeTool(delay=0.3))
+    start = time.perf_counter()
+    results, timings = agent.run_tool_calls(
+        [call("find", query="sofa"), call("find", query="rug"), call("cart", url="https://shop/1")], {})
+    elapsed = time.perf_counter() - start
+    print(f"3 tools of 0.3s each in {elapsed:.2f}s; timings {timings}")
+    assert elapsed < 0.6
+    assert len(tools["find"].calls) == 2 and len(tools["cart"].calls) == 1
+    # Results come back in call order, whatever order the tools finished in
+    assert results[0].endswith('"sofa"}') and results[1].endswith('"rug"}')
+    assert [t["outcome"] for t in timings] == ["ok", "ok", "ok"]
+
+
+def test_repeated_calls_run_once(monkeypatch):
+    print("\n--- Checking de-duplication within a turn and across turns ---")
+    tools = use_tools(monkeypatch, find=FakeTool(), ask=FakeTool())
+    memo = {}
+    results, timings = agent.run_tool_calls([call("find", query="sofa"), call("find", query="sofa")], memo)
+    assert results[0] == results[1] and len(tools["find"].calls) == 1
+    assert [t["outcome"] for t in timings] == ["ok", "memo"]
+
+    results, timings = agent.run_tool_calls([call("find", query="sofa"), call("ask", question="Size?")], memo)
+    assert len(tools["find"].calls) == 1 and timings[0]["outcome"] == "memo"
+
+    # Questions to the user are never answered from the memo
+    agent.run_tool_calls([call("ask", question="Size?")], memo)
+    assert len(tools["ask"].calls) == 2
+
+
+def test_slow_and_failing_tools_become_error_results(monkeypatch):
+    print("\n--- Checking per-tool timeouts and errors ---")
+    monkeypatch.setattr(agent, "AGENT_TOOL_TIMEOUTS", {"cart": 0.2})
+    use_tools(monkeypatch, cart=FakeTool(delay=1.0),
+              find=FakeTool(error=RuntimeError("vendor down")))
+    memo = {}
+    start = time.perf_counter()
+    results, timings = agent.run_tool_calls(
+        [call("cart", url="https://shop/1"), call("find", query="sofa"), call("buy", product_url="x")], memo)
+    elapsed = time.perf_counter() - start
+    print(f"Results {results} in {elapsed:.2f}s")
+    assert elapsed < 0.6
+    assert json.loads(results[0]) == {"status": "ERROR", "message": "cart timed out after 0.2s"}
+    assert json.loads(results[1]) == {"status": "ERROR", "message": "vendor down"}
+    assert "not found" in results[2]
+    assert [t["outcome"] for t in timings] == ["timeout", "error", "ok"]
+    # Only completed calls are remembered, so a retry runs the tool again
+    assert not any(key.startswith(("cart:", "find:")) for key in memo)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
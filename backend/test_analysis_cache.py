@@ -0,0 +1,90 @@
+import io
+import os
+import sys
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+os.environ.setdefault("CONTEXT_STORE_PATH", os.path.join(tempfile.mkdtemp(), "store.db"))
+
+from services.analysis_cache import AnalysisCache, content_hash, dhash, has_detail
+
+
+def make_cache():
+    path = os.path.join(tempfile.mkdtemp(), "analysis.db")
+    return AnalysisCache(path=path, max_entries=50, ttl=3600, max_distance=6)
+
+
+def textured_room(seed=0):
+    rng = np.random.default_rng(seed)
+    pixels = np.zeros((240, 320, 3), dtype=np.uint8)
+    for _ in range(12):
+        x, y = rng.integers(0, 280), rng.integers(0, 200)
+        pixels[y:y + 40, x:x + 40] = rng.integers(0, 255, 3)
+    return Image.fromarray(pixels)
+
+
+def reencode(image, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    data = buffer.getvalue()
+    return data, Image.open(io.BytesIO(data)).convert("RGB")
+
+
+def test_flat_frames_never_near_match():
+    print("\n--- Checking that solid colours only match exactly ---")
+    cache = make_cache()
+    red_bytes, red = reencode(Image.new("RGB", (320, 240), (200, 30, 30)), 90)
+    green_bytes, green = reencode(Image.new("RGB", (320, 240), (30, 200, 30)), 90)
+    print(f"dHash red={dhash(red):#x} green={dhash(green):#x}")
+    assert not has_detail(dhash(red), red)
+
+    cache.put(content_hash(red_bytes), dhash(red), {"room_type": "red room"})
+    assert cache.get_exact(content_hash(green_bytes)) is None
+    assert cache.get_similar(dhash(green), green) == (None, None)
+    # The red frame itself still hits exactly
+    assert cache.get_exact(content_hash(red_bytes))["room_type"] == "red room"
+    assert cache.stats()["near_skipped"] == 1
+
+
+def test_reencoded_photo_near_matches():
+    print("\n--- Checking that a re-encoded photo is a near hit ---")
+    cache = make_cache()
+    original_bytes, original = reencode(textured_room(), 95)
+    again_bytes, again = reencode(original, 60)
+    assert original_bytes != again_bytes and has_detail(dhash(original), original)
+
+    cache.put(content_hash(original_bytes), dhash(original), {"room_type": "living room"})
+    analysis, distance = cache.get_similar(dhash(again), again)
+    print(f"Near hit at distance {distance}")
+    assert analysis["room_type"] == "living room" and distance <= 6
+
+    _, other = reencode(textured_room(seed=7), 90)
+    assert cache.get_similar(dhash(other), other) == (None, None)
+
+
+def test_stats_count_every_miss():
+    print("\n--- Checking hit-rate accounting ---")
+    cache = make_cache()
+    data, image = reencode(textured_room(), 90)
+    sha, image_hash = content_hash(data), dhash(image)
+
+    # Cold lookup: exact miss, then near miss
+    assert cache.get_exact(sha) is None
+    assert cache.get_similar(image_hash, image) == (None, None)
+    cache.put(sha, image_hash, {"room_type": "bedroom"})
+    assert cache.get_exact(sha) is not None
+
+    stats = cache.stats()
+    print(f"Stats: {stats}")
+    assert stats["exact_hits"] == 1 and stats["exact_misses"] == 1
+    assert stats["near_misses"] == 1 and stats["hit_rate"] == 0.5
+
+
+if __name__ == "__main__":
+    test_flat_frames_never_near_match()
+    test_reencoded_photo_near_matches()
+    test_stats_count_every_miss()
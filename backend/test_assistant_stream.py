@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import pytest
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+os.environ.setdefault("CONTEXT_STORE_PATH", os.path.join(tempfile.mkdtemp(), "store.db"))
+
+from flask import Flask
+from flask_jwt_extended import create_access_token
+from extensions import jwt
+import routes.assistant as assistant
+from services.governor import GovernorRejected
+
+
+class FakeAIService:
+    def __init__(self, chunks, delay=0.0, error=None):
+        self.chunks = chunks
+        self.delay = delay
+        self.error = error
+
+    def stream_assistant_response(self, prompt):
+        for chunk in self.chunks:
+            time.sleep(self.delay)
+            yield chunk
+        if self.error:
+            raise self.error
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.config["JWT_SECRET_KEY"] = "test-secret-key-of-at-least-32-bytes"
+    jwt.init_app(app)
+    app.register_blueprint(assistant.assistant_bp)
+    with app.app_context():
+        token = create_access_token(identity="1")
+    client = app.test_client()
+    client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+    return client
+
+
+def parse_events(body):
+    events = []
+    for block in body.split("\n\n"):
+        if block.startswith("event:"):
+            name, data = block.split("\n", 1)
+            events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_action_trailer_is_split_across_chunks():
+    splitter = assistant._ActionTrailerSplitter()
+    visible = "".join(splitter.feed(c) for c in ["Try **warm** gre", "y.\nACT", "ION: add_i", "tem"])
+    visible += splitter.finish()
+    assert visible == "Try **warm** grey.\n" and splitter.action == "add_item"
+
+
+def test_chunks_reach_the_client_before_the_answer_is_complete(client, monkeypatch):
+    print("\n--- Checking that chat streams as the model writes ---")
+    chunks = ["A deep ", "green sofa ", "suits this room.\n", "ACTION: none"]
+    monkeypatch.setattr(assistant, "get_ai_service", lambda: FakeAIService(chunks, delay=0.2))
+    response = client.post("/api/assistant/chat?stream=1", buffered=False,
+                           json={"user_message": "stream test: which sofa colour?", "room_type": "den"})
+    assert response.mimetype == "text/event-stream"
+    arrivals = []
+    for part in response.response:
+        arrivals.append((time.perf_counter(), part.decode() if isinstance(part, bytes) else part))
+    spread = arrivals[-1][0] - arrivals[0][0]
+    print(f"{len(arrivals)} parts over {spread:.2f}s")
+    # The model takes 0.8s; its first words must not wait for the last
+    assert spread >= 0.5
+
+    events = parse_events("".join(text for _, text in arrivals))
+    assert [name for name, _ in events] == ["chunk", "chunk", "chunk", "done"]
+    assert events[-1][1] == {"text": "A deep green sofa suits this room.", "suggested_action": "none"}
+
+
+def test_refusal_mid_stream_becomes_an_error_event(client, monkeypatch):
+    service = FakeAIService([], error=GovernorRejected("queue full", retry_after=3))
+    monkeypatch.setattr(assistant, "get_ai_service", lambda: service)
+    response = client.post("/api/assistant/chat?stream=1",
+                           json={"user_message": "stream test: busy?", "room_type": "den"})
+    events = parse_events(response.get_data(as_text=True))
+    names = [name for name, _ in events]
+    assert names == ["error", "chunk", "done"] and events[0][1]["retry_after"] == 3
+    assert events[-1][1]["text"] == assistant.FALLBACK_TEXT
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
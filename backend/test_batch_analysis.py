@@ -0,0 +1,93 @@
+import io
+import os
+import sys
+import time
+import tempfile
+import threading
+import pytest
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+os.environ.setdefault("CONTEXT_STORE_PATH", os.path.join(tempfile.mkdtemp(), "store.db"))
+
+from flask import Flask
+from flask_jwt_extended import create_access_token
+from extensions import jwt
+import routes.ai as ai_routes
+
+ROOMS = {
+    b"bedroom": ({"room_type": "bedroom", "style": "Rustic", "detected_objects": ["bed", "lamp"]}, 200),
+    b"living": ({"room_type": "living_room", "style": "Rustic", "detected_objects": ["sofa", "lamp"]}, 200),
+    b"broken": ({"message": "Error processing image: truncated"}, 500),
+}
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.config["JWT_SECRET_KEY"] = "test-secret-key-of-at-least-32-bytes"
+    jwt.init_app(app)
+    app.register_blueprint(ai_routes.ai_bp)
+    with app.app_context():
+        token = create_access_token(identity="1")
+    client = app.test_client()
+    client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+    return client
+
+
+def fake_analysis(monkeypatch, delay=0.2):
+    running = {"now": 0, "max": 0}
+    lock = threading.Lock()
+
+    def run_room_analysis(image_bytes, bypass_cache=False, progress=None, priority=None):
+        with lock:
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+        time.sleep(delay)
+        with lock:
+            running["now"] -= 1
+        body, status = ROOMS[image_bytes]
+        return dict(body), status
+
+    monkeypatch.setattr(ai_routes, "run_room_analysis", run_room_analysis)
+    return running
+
+
+def upload(*names):
+    return {"images": [(io.BytesIO(name), f"{name.decode()}.jpg") for name in names]}
+
+
+def test_batch_runs_in_parallel_and_keeps_order(client, monkeypatch):
+    print("\n--- Checking parallel fan-out of a multi-image scan ---")
+    running = fake_analysis(monkeypatch)
+    monkeypatch.setattr(ai_routes, "ANALYZE_BATCH_CONCURRENCY", 3)
+    start = time.perf_counter()
+    response = client.post("/api/ai/analyze-rooms", data=upload(b"bedroom", b"living", b"broken", b"living"),
+                           content_type="multipart/form-data")
+    elapsed = time.perf_counter() - start
+    body = response.get_json()
+    print(f"Status {response.status_code} in {elapsed:.2f}s, max parallel {running['max']}")
+    assert response.status_code == 200
+    assert running["max"] == 3 and elapsed < 0.7          # 4 images at 0.2s each, 3 at a time
+    assert [r["filename"] for r in body["results"]] == ["bedroom.jpg", "living.jpg", "broken.jpg", "living.jpg"]
+    assert [r["status"] for r in body["results"]] == [200, 200, 500, 200]
+
+    summary = body["summary"]
+    assert summary["room_type"] == "living_room" and summary["images_analyzed"] == 3
+    assert summary["detected_objects"] == ["bed", "lamp", "sofa"]
+
+
+def test_batch_limits_and_total_failure(client, monkeypatch):
+    fake_analysis(monkeypatch, delay=0)
+    monkeypatch.setattr(ai_routes, "ANALYZE_BATCH_MAX_IMAGES", 2)
+    response = client.post("/api/ai/analyze-rooms", data=upload(b"bedroom", b"living", b"living"),
+                           content_type="multipart/form-data")
+    assert response.status_code == 400
+
+    response = client.post("/api/ai/analyze-rooms", data=upload(b"broken", b"broken"),
+                           content_type="multipart/form-data")
+    assert response.status_code == 502 and response.get_json()["summary"] is None
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,147 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+
+from services.browser_pool import BrowserPool
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+
+    async def goto(self, url):
+        await asyncio.sleep(0.05)
+        # Whatever a previous lease left behind would be visible here
+        seen = dict(self.context.storage)
+        self.context.storage[url] = "cart"
+        return seen
+
+
+class FakeContext:
+    open_pages = 0
+    max_open_pages = 0
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.storage = {}
+        self.closed = False
+
+    async def new_page(self):
+        FakeContext.open_pages += 1
+        FakeContext.max_open_pages = max(FakeContext.max_open_pages, FakeContext.open_pages)
+        return FakePage(self)
+
+    async def close(self):
+        if not self.closed:
+            FakeContext.open_pages -= 1
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.contexts = []
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **kwargs):
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.connected = False
+
+
+class FakeChromium:
+    def __init__(self):
+        self.launched = []
+
+    async def launch(self, **kwargs):
+        browser = FakeBrowser()
+        self.launched.append(browser)
+        return browser
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.chromium = FakeChromium()
+
+    async def stop(self):
+        pass
+
+
+def make_pool(**kwargs):
+    pool = BrowserPool(**kwargs)
+    pool._playwright = FakePlaywright()  # Skip the real Playwright import/launch
+    return pool
+
+
+def test_each_lease_gets_a_fresh_context():
+    print("\n--- Checking that leases never share browser state ---")
+    pool = make_pool(browsers=1, max_pages=2)
+    try:
+        first = pool.run(lambda page: page.goto("https://shop/user-a"))
+        second = pool.run(lambda page: page.goto("https://shop/user-b"))
+        browser = pool._playwright.chromium.launched[0]
+        print(f"Contexts created: {len(browser.contexts)}, second lease saw: {second}")
+        assert first == {} and second == {}
+        assert len(browser.contexts) == 2
+        assert all(c.closed for c in browser.contexts)
+        assert len(pool._playwright.chromium.launched) == 1  # The browser itself stays warm
+    finally:
+        pool.close()
+
+
+def test_page_cap_and_browser_recycling():
+    print("\n--- Checking the page cap and browser recycling ---")
+    FakeContext.open_pages = FakeContext.max_open_pages = 0
+    pool = make_pool(browsers=1, max_pages=3, browser_max_leases=5)
+    try:
+        threads = [threading.Thread(target=pool.run, args=(lambda page: page.goto("https://shop/x"),))
+                   for _ in range(9)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        print(f"9 leases in {time.perf_counter() - start:.2f}s, max open pages {FakeContext.max_open_pages}")
+        stats = pool.stats()
+        print(f"Stats: {stats}")
+        assert FakeContext.max_open_pages <= 3
+        assert stats["leases"] == 9 and stats["in_use"] == 0
+        assert stats["browser_recycles"] >= 1
+    finally:
+        pool.close()
+
+
+def test_failed_lease_closes_context():
+    print("\n--- Checking that a failing tool still closes its context ---")
+    pool = make_pool(browsers=1, max_pages=1)
+
+    async def broken(page):
+        raise RuntimeError("net::ERR_CONNECTION_RESET")
+
+    try:
+        try:
+            pool.run(broken)
+            assert False, "exception should propagate"
+        except RuntimeError:
+            pass
+        browser = pool._playwright.chromium.launched[0]
+        assert browser.contexts[0].closed
+        assert pool.stats()["failed_leases"] == 1
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    test_each_lease_gets_a_fresh_context()
+    test_page_cap_and_browser_recycling()
+    test_failed_lease_closes_context()
@@ -0,0 +1,121 @@
+import os
+import sys
+import time
+import tempfile
+
+import pytest
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+os.environ.setdefault("CONTEXT_STORE_PATH", os.path.join(tempfile.mkdtemp(), "store.db"))
+
+import services.ai_service as ai_service
+from services.circuit_breaker import CircuitBreaker, CircuitOpen, get_breaker, CLOSED, OPEN, HALF_OPEN
+from services.governor import GovernorRejected
+
+
+def fail(breaker, error=RuntimeError("503 from model")):
+    try:
+        with breaker.call():
+            raise error
+    except type(error):
+        pass
+
+
+def succeed(breaker):
+    with breaker.call():
+        pass
+
+
+def test_failures_open_the_circuit():
+    print("\n--- Checking that repeated failures open the circuit ---")
+    breaker = CircuitBreaker("test-open", failure_rate=0.5, min_calls=4, open_seconds=60)
+    succeed(breaker)
+    fail(breaker)
+    succeed(breaker)
+    assert breaker.state == CLOSED  # Below min_calls, no verdict yet
+    fail(breaker)
+    print(f"After 2/4 failures: {breaker.stats()}")
+    assert breaker.state == OPEN
+
+    start = time.monotonic()
+    with pytest.raises(CircuitOpen):
+        with breaker.call():
+            raise AssertionError("an open circuit must not call the model")
+    assert time.monotonic() - start < 0.05
+
+
+def test_probe_closes_or_reopens():
+    print("\n--- Checking the half-open probe ---")
+    breaker = CircuitBreaker("test-probe", failure_rate=0.5, min_calls=2, open_seconds=0.05)
+    fail(breaker)
+    fail(breaker)
+    assert breaker.state == OPEN
+    time.sleep(0.06)
+
+    # Only one probe at a time while half-open
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record(True, probe=True)
+    assert breaker.state == OPEN
+
+    time.sleep(0.06)
+    succeed(breaker)
+    print(f"After a good probe: {breaker.stats()}")
+    assert breaker.state == CLOSED and breaker.stats()["recent_calls"] == 0
+
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker("test-slow", failure_rate=1.0, min_calls=2, slow_call_seconds=0.01)
+    for _ in range(2):
+        with breaker.call():
+            time.sleep(0.02)
+    assert breaker.state == OPEN
+
+
+def test_governor_rejections_are_neutral():
+    print("\n--- Checking that local 429s do not trip the circuit ---")
+    breaker = CircuitBreaker("test-neutral", failure_rate=0.5, min_calls=2, open_seconds=0.05)
+    for _ in range(5):
+        fail(breaker, GovernorRejected("queue full"))
+    assert breaker.state == CLOSED and breaker.stats()["recent_calls"] == 0
+
+    # A rejected probe hands the probe back instead of reopening
+    fail(breaker)
+    fail(breaker)
+    time.sleep(0.06)
+    fail(breaker, GovernorRejected("queue full"))
+    assert breaker.state == HALF_OPEN and breaker.allow()
+
+
+def test_breakers_are_shared_by_name():
+    assert get_breaker("test-shared") is get_breaker("test-shared")
+    assert get_breaker("test-shared") is not get_breaker("test-other")
+
+
+class FailingModel:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        raise RuntimeError("503 Service Unavailable")
+
+
+def test_ai_service_falls_back_while_open(monkeypatch):
+    print("\n--- Checking that AIService stops calling a failing model ---")
+    breaker = CircuitBreaker("test-chat", failure_rate=0.5, min_calls=2, open_seconds=60)
+    monkeypatch.setattr(ai_service, "get_breaker", lambda name: breaker)
+    service = ai_service.AIService()
+    service.gemini_model = FailingModel()
+
+    answers = [service.get_assistant_response(f"breaker test question {i}") for i in range(5)]
+    print(f"Answers {answers}, model calls {service.gemini_model.calls}, breaker {breaker.stats()}")
+    assert answers == [None] * 5
+    assert service.gemini_model.calls == 2
+    assert breaker.state == OPEN
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,104 @@
+import os
+import sys
+import time
+import tempfile
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+os.environ.setdefault("CONTEXT_STORE_PATH", os.path.join(tempfile.mkdtemp(), "store.db"))
+
+import services.context_store as context_store
+from services.context_store import MemoryStore, SQLiteStore
+
+
+def sqlite_store(namespace="test", **kwargs):
+    return SQLiteStore(os.path.join(tempfile.mkdtemp(), "store.db"), namespace=namespace, **kwargs)
+
+
+def test_memory_store_lru_and_ttl():
+    print("\n--- Checking the in-process store ---")
+    store = MemoryStore(max_entries=2, ttl=60)
+    store.set("a", 1)
+    store.set("b", 2)
+    assert store.get("a") == 1      # "a" is now most recently used
+    store.set("c", 3)
+    assert store.get("b") is None and store.get("a") == 1
+    store.set("short", 4, ttl=0.05)
+    time.sleep(0.1)
+    assert store.get("short", "gone") == "gone"
+    stats = store.stats()
+    print(f"Stats: {stats}")
+    assert stats["evictions"] == 2 and stats["expirations"] == 1
+
+
+def test_sqlite_store_ttl_and_cap():
+    print("\n--- Checking expiry and the entry cap in the shared store ---")
+    store = sqlite_store(max_entries=5, ttl=60)
+    store.set("ctx", {"room_type": "bedroom"}, ttl=0.05)
+    time.sleep(0.1)
+    assert store.get("ctx") is None
+
+    old_sweep = context_store.SWEEP_EVERY_WRITES
+    context_store.SWEEP_EVERY_WRITES = 1
+    try:
+        for i in range(8):
+            store.set(f"k{i}", i)
+    finally:
+        context_store.SWEEP_EVERY_WRITES = old_sweep
+    print(f"Stats: {store.stats()}")
+    assert len(store) == 5 and store.get("k7") == 7 and store.get("k0") is None
+
+
+def test_sqlite_store_is_shared_between_processes():
+    print("\n--- Checking that a forked worker sees the same store ---")
+    store = sqlite_store()
+    store.set("parent", "hello")
+    pid = os.fork()
+    if pid == 0:
+        ok = store.get("parent") == "hello"
+        store.set("child", {"from": os.getpid()})
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    assert store.get("child")["from"] == pid
+
+
+def test_add_has_one_winner_across_processes():
+    print("\n--- Checking that add() is set-if-absent across processes ---")
+    store = sqlite_store(ttl=60)
+    children = []
+    for _ in range(6):
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if store.add("lock:session", os.getpid()) else 3)
+        children.append(pid)
+    winners = [pid for pid in children if os.WEXITSTATUS(os.waitpid(pid, 0)[1]) == 0]
+    print(f"Winners: {winners}")
+    assert len(winners) == 1 and store.get("lock:session") == winners[0]
+
+    # An expired claim can be taken over
+    assert store.add("lease", 1, ttl=0.05) and not store.add("lease", 2)
+    time.sleep(0.1)
+    assert store.add("lease", 3) and store.get("lease") == 3
+
+    memory = MemoryStore()
+    assert memory.add("k", 1) and not memory.add("k", 2) and memory.get("k") == 1
+
+
+def test_memory_store_add_is_bounded():
+    print("\n--- Checking that add() evicts like set() ---")
+    store = MemoryStore(max_entries=3, ttl=60)
+    for i in range(10):
+        assert store.add(f"claim:{i}", i)
+    stats = store.stats()
+    print(f"Stats: {stats}")
+    assert len(store) == 3 and stats["evictions"] == 7
+    assert store.get("claim:0") is None and store.get("claim:9") == 9
+
+
+if __name__ == "__main__":
+    test_memory_store_lru_and_ttl()
+    test_sqlite_store_ttl_and_cap()
+    test_sqlite_store_is_shared_between_processes()
+    test_add_has_one_winner_across_processes()
+    test_memory_store_add_is_bounded()
@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+os.environ.setdefault("CONTEXT_STORE_PATH", os.path.join(tempfile.mkdtemp(), "store.db"))
+
+from services.context_store import MemoryStore
+from services.conversation_memory import ConversationMemory, estimate_tokens
+
+
+def make_memory(**kwargs):
+    return ConversationMemory(store=MemoryStore(), **kwargs)
+
+
+def test_recent_turns_are_kept_verbatim():
+    memory = make_memory(token_budget=800, window_turns=6, compact_every=4)
+    memory.append("1:ctx", "Which **sofa** colour?", "Try *deep green*. It suits oak floors.")
+    memory.append("1:ctx", "And the rug?", "A cream jute rug.")
+    history = memory.history_prompt(memory.load("1:ctx"))
+    print(f"\n{history}")
+    assert "User: Which sofa colour?" in history and "Assistant: A cream jute rug." in history
+    assert memory.history_prompt(memory.load("2:ctx")) == ""      # Sessions are separate
+    assert memory.append(None, "q", "a") is None
+
+
+def test_long_conversations_stay_within_the_budget():
+    print("\n--- Checking the token budget over a long conversation ---")
+    memory = make_memory(token_budget=300, window_turns=4, compact_every=2)
+    for i in range(40):
+        memory.append("1:ctx", f"Question {i}: what about the lamp near window {i}?",
+                      f"Answer {i}. Use a warm 2700K bulb in lamp {i}. " + "More detail. " * 30)
+    session = memory.load("1:ctx")
+    history = memory.history_prompt(session)
+    print(f"{session['turn_count']} turns, {len(session['turns'])} verbatim, "
+          f"{len(session['summary'])} summary lines, ~{estimate_tokens(history)} tokens")
+    assert session["turn_count"] == 40 and len(session["turns"]) < 4 + 2
+    assert estimate_tokens(history) <= 300 + 20       # Section headers are not budgeted
+    assert "Question 39" in history                   # The latest exchange is always there
+    assert "Earlier in this conversation:" in history and "- Asked: Question" in history
+
+
+class SlowStore(MemoryStore):
+    """Widens the gap between reading a session and writing it back."""
+
+    def get(self, key, default=None):
+        value = super().get(key, default)
+        time.sleep(0.001)
+        return value
+
+
+def test_concurrent_appends_keep_every_turn():
+    print("\n--- Checking that concurrent chats on one session lose no turns ---")
+    memory = ConversationMemory(store=SlowStore(), window_turns=1000, compact_every=1000)
+
+    def chat(n):
+        for i in range(20):
+            memory.append("1:ctx", f"question {n}-{i}", f"answer {n}-{i}")
+
+    threads = [threading.Thread(target=chat, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    session = memory.load("1:ctx")
+    print(f"{session['turn_count']} turns recorded, {len(session['turns'])} kept")
+    assert session["turn_count"] == 160 and len(session["turns"]) == 160
+    assert memory.store.get("lock:1:ctx") is None
+
+
+if __name__ == "__main__":
+    test_recent_turns_are_kept_verbatim()
+    test_long_conversations_stay_within_the_budget()
+    test_concurrent_appends_keep_every_turn()
@@ -0,0 +1,47 @@
+import os
+import sys
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+
+from services.furniture_mapper import FurnitureIndex, get_furniture_index, normalize_label, singularize
+
+TABLE = {
+    "assets": [
+        {"model_id": "sofa_01", "name": "Velvet Sofa", "labels": ["sofa", "couch"]},
+        {"model_id": "desk_01", "name": "Desk", "labels": ["Dining_Table", "desk"]},
+        {"model_id": "lamp_01", "name": "Lamp", "labels": ["lamp", "light"]},
+        {"model_id": "couch_02", "name": "Corner Couch", "labels": ["couch"]},
+    ],
+    "defaults": ["lamp_01", "missing_99"],
+}
+
+
+def test_labels_are_normalised_and_singularised():
+    assert normalize_label("  Dining_Table ") == "dining table"
+    assert [singularize(w) for w in ("boxes", "lamps", "bodies", "glass", "couch")] == \
+        ["box", "lamp", "body", "glass", "couch"]
+
+
+def test_detections_map_in_first_seen_order_without_duplicates():
+    print("\n--- Checking the label index ---")
+    index = FurnitureIndex(TABLE)
+    mapped = index.map_labels(["Couches", {"label": "dining-table"}, "sofa", "lamps"])
+    print(f"Mapped: {[a['model_id'] for a in mapped]}")
+    assert [a["model_id"] for a in mapped] == ["sofa_01", "couch_02", "desk_01", "lamp_01"]
+    # Unknown defaults are dropped; nothing matched gives the defaults
+    assert [a["model_id"] for a in index.map_labels(["unicorn"])] == ["lamp_01"]
+    assert index.map_many([["desk"], []]) == [[{"model_id": "desk_01", "name": "Desk"}],
+                                              [{"model_id": "lamp_01", "name": "Lamp"}]]
+
+
+def test_shipped_label_table_loads():
+    index = get_furniture_index()
+    assert index.defaults and all(m in index.assets for m in index.defaults)
+    assert index.lookup("sofas")
+
+
+if __name__ == "__main__":
+    test_labels_are_normalised_and_singularised()
+    test_detections_map_in_first_seen_order_without_duplicates()
+    test_shipped_label_table_loads()
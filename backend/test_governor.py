@@ -0,0 +1,151 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+os.environ.setdefault("CONTEXT_STORE_PATH", os.path.join(tempfile.mkdtemp(), "store.db"))
+
+from services.governor import Governor, GovernorRejected, PRIORITY_INTERACTIVE, PRIORITY_BULK
+
+
+def wait_for_waiting(governor, count, timeout=2):
+    deadline = time.monotonic() + timeout
+    while governor.stats()["waiting"] < count:
+        assert time.monotonic() < deadline, f"expected {count} waiting callers"
+        time.sleep(0.01)
+
+
+def test_in_flight_cap():
+    print("\n--- Checking that no more than max_in_flight calls run at once ---")
+    governor = Governor(rate=1000, burst=1000, max_in_flight=3, timeout=5)
+    active = [0]
+    peak = [0]
+    lock = threading.Lock()
+
+    def call():
+        with governor.slot():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=call) for _ in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = governor.stats()
+    print(f"Peak concurrency {peak[0]}, stats {stats}")
+    assert peak[0] == 3
+    assert stats["admitted"] == 12 and stats["in_flight"] == 0 and stats["waiting"] == 0
+
+
+def test_interactive_callers_go_first():
+    print("\n--- Checking that an interactive caller overtakes queued bulk work ---")
+    governor = Governor(rate=1000, burst=1000, max_in_flight=1, timeout=5)
+    order = []
+
+    def call(name, priority):
+        with governor.slot(priority):
+            order.append(name)
+
+    governor.acquire()  # Hold the only slot so both callers queue
+    bulk = threading.Thread(target=call, args=("bulk", PRIORITY_BULK))
+    bulk.start()
+    wait_for_waiting(governor, 1)
+    chat = threading.Thread(target=call, args=("chat", PRIORITY_INTERACTIVE))
+    chat.start()
+    wait_for_waiting(governor, 2)
+    governor.release()
+    bulk.join()
+    chat.join()
+    print(f"Order served: {order}")
+    assert order == ["chat", "bulk"]
+
+
+def test_timeout_rejects_with_retry_after():
+    print("\n--- Checking that a caller without capacity is refused in time ---")
+    governor = Governor(rate=1, burst=1, max_in_flight=1, timeout=0.2)
+    governor.acquire()
+    start = time.monotonic()
+    try:
+        governor.acquire()
+        assert False, "second caller should have been refused"
+    except GovernorRejected as e:
+        elapsed = time.monotonic() - start
+        print(f"Refused after {elapsed:.2f}s: {e} (retry after {e.retry_after}s)")
+        assert elapsed < 1
+        assert e.retry_after >= 1
+    stats = governor.stats()
+    assert stats["rejected"] == 1 and stats["waiting"] == 0
+    governor.release()
+
+
+def test_full_queue_rejects_immediately():
+    print("\n--- Checking that a full wait queue refuses new callers straight away ---")
+    governor = Governor(rate=1000, burst=1000, max_in_flight=1, max_queued=1, timeout=5)
+    governor.acquire()
+    waiter = threading.Thread(target=lambda: governor.slot().__enter__())
+    waiter.start()
+    wait_for_waiting(governor, 1)
+    start = time.monotonic()
+    try:
+        governor.acquire()
+        assert False, "queue was full"
+    except GovernorRejected:
+        pass
+    assert time.monotonic() - start < 0.1
+    governor.release()
+    waiter.join()
+
+
+def test_rate_limit_spaces_out_calls():
+    print("\n--- Checking that the token bucket holds calls to the sustained rate ---")
+    governor = Governor(rate=20, burst=2, max_in_flight=10, timeout=5)
+    start = time.monotonic()
+    for _ in range(6):
+        with governor.slot():
+            pass
+    elapsed = time.monotonic() - start
+    # Two calls ride the burst; the other four wait ~0.05s each for a token
+    print(f"6 calls at 20/s with burst 2 took {elapsed:.2f}s")
+    assert elapsed >= 0.15
+
+
+def test_zero_rate_means_no_rate_limit():
+    print("\n--- Checking that rate=0 turns the token bucket off ---")
+    governor = Governor(rate=0, burst=0, max_in_flight=2, timeout=1)
+    start = time.monotonic()
+    for _ in range(50):
+        with governor.slot():
+            pass
+    assert time.monotonic() - start < 0.5
+    assert governor.stats()["admitted"] == 50
+
+
+def test_slot_released_when_call_fails():
+    print("\n--- Checking that a failing call gives its slot back ---")
+    governor = Governor(rate=1000, burst=1000, max_in_flight=1, timeout=0.5)
+    try:
+        with governor.slot():
+            raise RuntimeError("model error")
+    except RuntimeError:
+        pass
+    assert governor.stats()["in_flight"] == 0
+    with governor.slot():
+        pass
+
+
+if __name__ == "__main__":
+    test_in_flight_cap()
+    test_interactive_callers_go_first()
+    test_timeout_rejects_with_retry_after()
+    test_full_queue_rejects_immediately()
+    test_rate_limit_spaces_out_calls()
+    test_zero_rate_means_no_rate_limit()
+    test_slot_released_when_call_fails()
@@ -0,0 +1,61 @@
+import io
+import os
+import sys
+import pytest
+from PIL import Image
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+
+from services.image_pipeline import pipeline_stats, prepare_image
+
+
+def phone_photo(size=(4000, 3000), orientation=6):
+    """Landscape sensor frame tagged 'rotate 90° to display', like a phone held upright."""
+    image = Image.new("RGB", size, (120, 90, 60))
+    image.paste((250, 250, 250), (0, 0, size[0] // 4, size[1] // 4))  # Marks the top-left corner
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    exif[0x010F] = "PhoneMaker"
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=95, exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+def test_large_upload_is_oriented_shrunk_and_stripped():
+    print("\n--- Checking orientation, downsizing and metadata removal ---")
+    upload = phone_photo()
+    prepared = prepare_image(upload, max_side=1536)
+    print(f"{prepared.original_size} -> {len(prepared.data)} bytes, {prepared.image.size}")
+    assert prepared.image.size == (1152, 1536)   # Portrait after applying the EXIF rotation
+    assert prepared.bytes_saved > 0
+
+    sent = Image.open(io.BytesIO(prepared.data))
+    assert sent.size == (1152, 1536) and sent.format == "JPEG"
+    assert not sent.getexif()                    # No orientation tag or camera metadata left
+    assert prepared.as_part() == {"mime_type": "image/jpeg", "data": prepared.data}
+
+
+def test_small_png_and_webp_output():
+    buffer = io.BytesIO()
+    Image.new("RGBA", (300, 200), (10, 20, 30, 128)).save(buffer, format="PNG")
+    prepared = prepare_image(buffer.getvalue(), fmt="WEBP")
+    assert prepared.image.size == (300, 200) and prepared.mime_type == "image/webp"
+    assert Image.open(io.BytesIO(prepared.data)).format == "WEBP"
+
+    with pytest.raises(ValueError):
+        prepare_image(buffer.getvalue(), fmt="GIF")
+
+
+def test_stats_account_for_bytes():
+    before = pipeline_stats()
+    upload = phone_photo(size=(2000, 1500))
+    prepared = prepare_image(upload)
+    after = pipeline_stats()
+    assert after["images"] == before["images"] + 1
+    assert after["bytes_in"] - before["bytes_in"] == len(upload)
+    assert after["bytes_saved"] - before["bytes_saved"] == prepared.bytes_saved
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
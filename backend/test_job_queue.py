@@ -0,0 +1,155 @@
+import io
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+os.environ.setdefault("CONTEXT_STORE_PATH", os.path.join(tempfile.mkdtemp(), "store.db"))
+
+from services.context_store import create_store
+from services.job_queue import JobQueue, JobQueueFull
+
+
+def make_queue(**kwargs):
+    queue = JobQueue(**kwargs)
+    queue.store = create_store("jobs", backend="memory")
+    return queue
+
+
+def wait_finished(queue, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_jobs_report_progress_and_result():
+    print("\n--- Checking job progress and results ---")
+    queue = make_queue(workers=1, max_pending=4)
+
+    def analyse(image, progress):
+        progress("analyzing")
+        return {"room_type": image}, 200
+
+    job = queue.submit("analyze_room", analyse, "bedroom", owner="7")
+    assert job["status"] == "queued" and job["owner"] == "7"
+    job = wait_finished(queue, job["id"])
+    print(f"Finished job: {job}")
+    assert job["status"] == "done" and job["result"] == {"room_type": "bedroom"}
+
+    failed = wait_finished(queue, queue.submit("analyze_room", lambda progress: (1 / 0, 200))["id"])
+    assert failed["status"] == "failed" and failed["http_status"] == 500
+    assert queue.stats()["pending"] == 0
+
+
+def test_queue_bound_and_failed_submit_release_slots():
+    print("\n--- Checking that refused or failed submissions do not leak slots ---")
+    queue = make_queue(workers=1, max_pending=2)
+    release = threading.Event()
+
+    def blocked(progress):
+        release.wait(5)
+        return {}, 200
+
+    first = queue.submit("slow", blocked)
+    queue.submit("slow", blocked)
+    try:
+        queue.submit("slow", blocked)
+        assert False, "third job should be refused"
+    except JobQueueFull:
+        pass
+    release.set()
+    wait_finished(queue, first["id"])
+    time.sleep(0.1)
+
+    def broken_set(key, value, ttl=None):
+        raise OSError("disk full")
+
+    queue.store.set = broken_set
+    for _ in range(3):
+        try:
+            queue.submit("slow", blocked)
+            assert False, "store failure should propagate"
+        except OSError:
+            pass
+    print(f"Stats after failed submissions: {queue.stats()['pending']} pending")
+    assert queue.stats()["pending"] == 0
+
+
+def test_job_of_a_dead_worker_times_out():
+    print("\n--- Checking that a job abandoned by its worker is reported failed ---")
+    queue = make_queue(timeout=1)
+    # What a worker killed mid-job leaves behind in the shared store
+    stale = time.time() - 5
+    queue.store.set("orphan", {"id": "orphan", "kind": "analyze_room", "owner": "7", "status": "running",
+                               "stage": "analyzing", "created_at": stale, "updated_at": stale,
+                               "http_status": None, "result": None, "error": None})
+    job = queue.get("orphan")
+    print(f"Orphaned job: {job['status']} ({job['error']})")
+    assert job["status"] == "failed" and job["http_status"] == 504
+    assert queue.store.get("orphan")["status"] == "failed"
+
+
+def app_token(app, identity):
+    from flask_jwt_extended import create_access_token
+    with app.app_context():
+        return create_access_token(identity=identity)
+
+
+def test_async_analysis_streams_progress_then_result():
+    print("\n--- Checking async analyze-room with SSE progress ---")
+    from flask import Flask
+    from extensions import jwt
+    import routes.ai as ai_routes
+    import services.job_queue as job_queue
+
+    app = Flask(__name__)
+    app.config["JWT_SECRET_KEY"] = "test-secret-key-of-at-least-32-bytes"
+    jwt.init_app(app)
+    app.register_blueprint(ai_routes.ai_bp)
+    headers = {"Authorization": f"Bearer {app_token(app, '1')}"}
+
+    def run_room_analysis(image_bytes, bypass_cache=False, progress=None, priority=None):
+        for stage in ("preprocessing", "analyzing"):
+            progress(stage)
+            time.sleep(0.15)
+        return {"room_type": "bedroom"}, 200
+
+    old = (ai_routes.run_room_analysis, ai_routes.JOB_EVENTS_POLL_SECONDS, job_queue._job_queue)
+    ai_routes.run_room_analysis = run_room_analysis
+    ai_routes.JOB_EVENTS_POLL_SECONDS = 0.05
+    job_queue._job_queue = make_queue()
+    try:
+        client = app.test_client()
+        response = client.post("/api/ai/analyze-room?async=1", headers=headers,
+                               data={"image": (io.BytesIO(b"jpeg"), "room.jpg")},
+                               content_type="multipart/form-data")
+        assert response.status_code == 202
+        events_url = response.get_json()["events_url"]
+
+        stream = client.get(events_url, headers=headers).get_data(as_text=True)
+        events = [(block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+                  for block in stream.split("\n\n") if block.startswith("event:")]
+        print(f"Events: {[(name, data['stage']) for name, data in events]}")
+        assert "analyzing" in [data["stage"] for name, data in events if name == "progress"]
+        assert events[-1][0] == "result" and events[-1][1]["result"] == {"room_type": "bedroom"}
+
+        # Another user cannot follow the job
+        other = {"Authorization": f"Bearer {app_token(app, '2')}"}
+        assert client.get(events_url, headers=other).status_code == 404
+    finally:
+        ai_routes.run_room_analysis, ai_routes.JOB_EVENTS_POLL_SECONDS, job_queue._job_queue = old
+
+
+if __name__ == "__main__":
+    test_jobs_report_progress_and_result()
+    test_queue_bound_and_failed_submit_release_slots()
+    test_job_of_a_dead_worker_times_out()
+    test_async_analysis_streams_progress_then_result()
@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import numpy as np
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+
+from services.layout_engine import analyze_objects
+
+
+def legacy_analyze(objects):
+    """The original nested loop from routes/ai.py, kept here as the baseline."""
+    overlaps = 0
+    min_distance = 100.0
+
+    for i in range(len(objects)):
+        pos_a = objects[i].get('position', {'x': 0, 'y': 0, 'z': 0})
+        for j in range(i + 1, len(objects)):
+            pos_b = objects[j].get('position', {'x': 0, 'y': 0, 'z': 0})
+            dist = np.sqrt(
+                (pos_a['x'] - pos_b['x'])**2 +
+                (pos_a['y'] - pos_b['y'])**2 +
+                (pos_a['z'] - pos_b['z'])**2
+            )
+            if dist < 0.3:
+                overlaps += 1
+            if dist < min_distance:
+                min_distance = dist
+
+    clutter_score = min(1.0, (overlaps / len(objects)) + (0.5 if len(objects) > 10 else 0))
+    return overlaps, min_distance, clutter_score
+
+
+def make_scene(n, seed=0):
+    rng = np.random.default_rng(seed)
+    side = max(3.0, np.sqrt(n) * 0.6)  # Roughly showroom density
+    return [
+        {
+            "model_id": f"obj_{i}",
+            "position": {"x": float(x), "y": 0.0, "z": float(z)},
+        }
+        for i, (x, z) in enumerate(rng.uniform(0, side, size=(n, 2)))
+    ]
+
+
+def time_call(fn, objects, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(objects)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def test_engine_matches_legacy():
+    print("\n--- Checking engine output against the legacy loop ---")
+    for n in [2, 10, 200, 1200]:
+        objects = make_scene(n, seed=n)
+        overlaps, min_distance, clutter = legacy_analyze(objects)
+        result = analyze_objects(objects)
+
+        ok = (
+            result["overlaps"] == overlaps
+            and abs(result["min_distance"] - min_distance) < 1e-9
+            and abs(result["clutter_score"] - clutter) < 1e-9
+        )
+        print(f"{'SUCCESS' if ok else 'FAILURE'}: n={n} overlaps={result['overlaps']} (legacy {overlaps})")
+        assert ok
+
+
+def test_footprint_collisions():
+    print("\n--- Checking footprint-based collisions ---")
+    objects = [
+        {"position": {"x": 0.0, "y": 0.0, "z": 0.0}, "size": {"x": 2.0, "z": 0.9}},
+        {"position": {"x": 1.2, "y": 0.0, "z": 0.0}, "size": {"x": 0.6, "z": 0.6}},
+        {"position": {"x": 5.0, "y": 0.0, "z": 5.0}, "size": {"x": 0.5, "z": 0.5}},
+    ]
+    result = analyze_objects(objects)
+    # Centres are 1.2m apart but the sofa's footprint reaches the chair
+    print(f"Overlaps: {result['overlaps']}")
+    assert result["overlaps"] == 1
+
+
+def run_benchmark():
+    print("\n--- Layout analysis benchmark (best of N, ms) ---")
+    print(f"{'objects':>8} {'legacy':>12} {'engine':>10} {'speedup':>9}")
+    for n in [10, 100, 500, 1000, 2000]:
+        objects = make_scene(n)
+        repeat = 3 if n >= 1000 else 10
+        legacy_ms = time_call(legacy_analyze, objects, repeat)
+        engine_ms = time_call(analyze_objects, objects, repeat)
+        print(f"{n:>8} {legacy_ms:>12.2f} {engine_ms:>10.2f} {legacy_ms / engine_ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    test_engine_matches_legacy()
+    test_footprint_collisions()
+    run_benchmark()
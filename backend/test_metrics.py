@@ -0,0 +1,61 @@
+import os
+import sys
+import tempfile
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+os.environ.setdefault("CONTEXT_STORE_PATH", os.path.join(tempfile.mkdtemp(), "store.db"))
+
+from services.metrics import MetricsRegistry
+
+
+def sample(text, line_prefix):
+    for line in text.splitlines():
+        if line.startswith(line_prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_counters_are_summed_across_processes():
+    print("\n--- Checking that /metrics sums every worker's counters ---")
+    path = os.path.join(tempfile.mkdtemp(), "metrics.db")
+    registry = MetricsRegistry(multiprocess=True, path=path, flush_seconds=60)
+    calls = registry.counter("test_calls_total", "Calls.", ("call_site",))
+    latency = registry.histogram("test_latency_seconds", "Latency.", ("call_site",), buckets=(0.1, 1))
+
+    calls.inc(call_site="chat")
+    latency.observe(0.05, call_site="chat")
+
+    pid = os.fork()
+    if pid == 0:
+        # Worker: starts from zero (not the parent's values) and reports its own
+        calls.inc(3, call_site="chat")
+        latency.observe(0.5, call_site="chat")
+        registry.flush()
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+    text = registry.render()
+    print(text)
+    assert sample(text, 'test_calls_total{call_site="chat"}') == 4
+    assert sample(text, 'test_latency_seconds_count{call_site="chat"}') == 2
+    assert sample(text, 'test_latency_seconds_bucket{call_site="chat",le="0.1"}') == 1
+    assert sample(text, 'test_latency_seconds_bucket{call_site="chat",le="1"}') == 2
+
+    # A second scrape (any worker) sees the same totals: no jumping between workers
+    other = MetricsRegistry(multiprocess=True, path=path, flush_seconds=60)
+    other.counter("test_calls_total", "Calls.", ("call_site",))
+    other.histogram("test_latency_seconds", "Latency.", ("call_site",), buckets=(0.1, 1))
+    assert sample(other.render(), 'test_calls_total{call_site="chat"}') == 4
+
+
+def test_single_process_mode():
+    registry = MetricsRegistry(multiprocess=False)
+    calls = registry.counter("test_calls_total", "Calls.")
+    calls.inc(2)
+    assert sample(registry.render(), "test_calls_total") == 2
+
+
+if __name__ == "__main__":
+    test_counters_are_summed_across_processes()
+    test_single_process_mode()
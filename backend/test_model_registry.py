@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+os.environ.setdefault("CONTEXT_STORE_PATH", os.path.join(tempfile.mkdtemp(), "store.db"))
+
+from services.ai_service import AIService, ModelRegistry
+
+
+def loader(name, calls, delay=0.0):
+    def load():
+        calls.append(name)
+        time.sleep(delay)
+        return {"name": name}
+    return load
+
+
+def test_models_load_once_on_first_use():
+    print("\n--- Checking lazy, single loading of local models ---")
+    calls = []
+    registry = ModelRegistry(budget_mb=1000, idle_timeout=900)
+    registry.register("detr", loader("detr", calls, delay=0.2), estimated_mb=100)
+    assert not registry.is_loaded("detr") and calls == []
+
+    threads = [threading.Thread(target=registry.get, args=("detr",)) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"Loads: {calls}")
+    assert calls == ["detr"] and registry.stats()["models"]["detr"]["loads"] == 1
+
+
+def test_budget_evicts_least_recently_used_but_not_pinned():
+    print("\n--- Checking the memory budget ---")
+    calls = []
+    registry = ModelRegistry(budget_mb=250, idle_timeout=900)
+    for name in ("detr", "blip", "clip"):
+        registry.register(name, loader(name, calls), estimated_mb=100)
+    registry.pin("detr")
+    registry.get("blip")
+    registry.get("clip")          # 300 MB > 250: blip (not pinned detr) goes
+    assert registry.is_loaded("detr") and registry.is_loaded("clip") and not registry.is_loaded("blip")
+    stats = registry.stats()
+    print(f"Resident {stats['resident_mb']} MB of {stats['budget_mb']} MB")
+    assert stats["models"]["blip"]["unloads"] == 1 and stats["resident_mb"] <= 250
+
+
+def test_idle_models_are_unloaded():
+    registry = ModelRegistry(budget_mb=1000, idle_timeout=0.05)
+    registry.register("blip", loader("blip", []), estimated_mb=10)
+    registry.get("blip")
+    time.sleep(0.1)
+    registry.unload_idle()
+    assert not registry.is_loaded("blip")
+
+
+def test_service_starts_without_local_models():
+    print("\n--- Checking that building the service loads no vision model ---")
+    service = AIService()
+    stats = service.models.stats()
+    assert not stats["models"]["detr"]["loaded"] and not stats["models"]["blip"]["loaded"]
+    assert stats["resident_mb"] == 0
+
+
+if __name__ == "__main__":
+    test_models_load_once_on_first_use()
+    test_budget_evicts_least_recently_used_but_not_pinned()
+    test_idle_models_are_unloaded()
+    test_service_starts_without_local_models()
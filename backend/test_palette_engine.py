@@ -0,0 +1,62 @@
+import io
+import os
+import sys
+import pytest
+import numpy as np
+from PIL import Image
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+
+from services.palette_engine import extract_palette, recommend_style
+
+
+def striped_jpeg(size=(1600, 1200)):
+    """Three vertical bands: 50% navy, 30% cream, 20% terracotta."""
+    pixels = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+    w = size[0]
+    pixels[:, :w // 2] = (20, 30, 90)
+    pixels[:, w // 2:w * 8 // 10] = (240, 230, 200)
+    pixels[:, w * 8 // 10:] = (190, 90, 50)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=92)
+    return buffer.getvalue()
+
+
+def close_to(rgb, target, tolerance=20):
+    return all(abs(a - b) <= tolerance for a, b in zip(rgb, target))
+
+
+def test_fast_mode_finds_dominant_colours_in_order():
+    print("\n--- Checking the fast palette on a large JPEG ---")
+    palette = extract_palette(striped_jpeg(), mode="fast", n_colors=3)
+    print(f"Palette: {palette}")
+    assert close_to(palette[0]["rgb"], (20, 30, 90))
+    assert close_to(palette[1]["rgb"], (240, 230, 200))
+    assert close_to(palette[2]["rgb"], (190, 90, 50))
+    assert abs(palette[0]["weight"] - 0.5) < 0.05
+    assert abs(sum(c["weight"] for c in palette) - 1.0) < 0.01
+
+
+def test_palette_is_deterministic():
+    image = striped_jpeg()
+    assert extract_palette(image) == extract_palette(image)
+
+
+def test_quality_mode_agrees_with_fast_mode():
+    pytest.importorskip("cv2")
+    image = striped_jpeg()
+    fast = extract_palette(image, mode="fast", n_colors=3)
+    quality = extract_palette(image, mode="quality", n_colors=3)
+    for f, q in zip(fast, quality):
+        assert close_to(f["rgb"], q["rgb"])
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        extract_palette(striped_jpeg(), mode="exact")
+    assert recommend_style([{"rgb": [250, 250, 245]}]) == "Minimalist"
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+import pytest
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+os.environ.setdefault("CONTEXT_STORE_PATH", os.path.join(tempfile.mkdtemp(), "store.db"))
+
+from flask import Flask
+from flask_jwt_extended import create_access_token
+from sqlalchemy import text
+from extensions import db, jwt
+import services.product_scraper as scraper
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI="sqlite:///" + os.path.join(tempfile.mkdtemp(), "products.db"),
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        JWT_SECRET_KEY="test-secret-key-of-at-least-32-bytes",
+    )
+    db.init_app(app)
+    jwt.init_app(app)
+    from routes.products import products_bp
+    app.register_blueprint(products_bp)
+    with app.app_context():
+        import models  # noqa: F401  (registers the tables)
+        db.create_all()
+    return app
+
+
+def fake_vendors(monkeypatch, delay=0.0):
+    calls = []
+
+    def search_all_vendors(query):
+        calls.append(query)
+        time.sleep(delay)
+        return [{"title": f"{query} {i}", "vendor": "ikea.com", "url": f"https://ikea.com/p/{query}-{i}",
+                 "price": "$10", "rating": None, "image_url": None} for i in range(3)]
+
+    monkeypatch.setattr(scraper, "search_all_vendors", search_all_vendors)
+    return calls
+
+
+def test_miss_then_fresh_hit(app, monkeypatch):
+    print("\n--- Checking that a stored search is served without Tavily ---")
+    calls = fake_vendors(monkeypatch)
+    with app.app_context():
+        results, status = scraper.search_products_cached("Oak Desk!")
+        assert status == "miss" and len(results) == 3
+        results, status = scraper.search_products_cached("oak   desk")
+        assert status == "fresh" and [r["title"] for r in results] == ["Oak Desk! 0", "Oak Desk! 1", "Oak Desk! 2"]
+    assert calls == ["Oak Desk!"]
+
+
+def test_concurrent_misses_share_one_vendor_search(app, monkeypatch):
+    print("\n--- Checking that concurrent misses make one Tavily call ---")
+    calls = fake_vendors(monkeypatch, delay=0.2)
+    statuses = []
+
+    def search():
+        with app.app_context():
+            statuses.append(scraper.search_products_cached("walnut shelf")[1])
+
+    threads = [threading.Thread(target=search) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"Statuses: {statuses}, vendor calls: {len(calls)}")
+    assert statuses == ["miss"] * 5 and len(calls) == 1
+
+
+def test_search_route_falls_back_when_the_database_fails(app, monkeypatch):
+    print("\n--- Checking the /search fallback when the product cache is broken ---")
+    calls = fake_vendors(monkeypatch)
+    with app.app_context():
+        db.session.execute(text("DROP TABLE product_search_results"))
+        db.session.execute(text("DROP TABLE product_searches"))
+        db.session.commit()
+        token = create_access_token(identity="1")
+
+    response = app.test_client().post("/api/products/search", json={"query": "rattan chair"},
+                                      headers={"Authorization": f"Bearer {token}"})
+    body = response.get_json()
+    print(f"Status {response.status_code}, X-Cache {response.headers.get('X-Cache')}, {len(body['results'])} results")
+    assert response.status_code == 200 and response.headers["X-Cache"] == "BYPASS"
+    assert len(body["results"]) == 3 and calls == ["rattan chair"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,114 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+os.environ.setdefault("CONTEXT_STORE_PATH", os.path.join(tempfile.mkdtemp(), "store.db"))
+
+from flask import Flask
+from extensions import db
+import services.product_index as product_index
+import services.product_scraper as scraper
+
+
+@pytest.fixture
+def app(monkeypatch):
+    # ensure_product_index flips a module flag; put it back for other test files
+    monkeypatch.setattr(product_index, "_available", False)
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI="sqlite:///" + os.path.join(tempfile.mkdtemp(), "products.db"),
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+    )
+    db.init_app(app)
+    with app.app_context():
+        import models  # noqa: F401  (registers the tables)
+        db.create_all()
+    return app
+
+
+def add_products(*rows):
+    from models import Product
+    products = [Product(title=title, vendor=vendor, url=f"https://{vendor}/p/{i}")
+                for i, (title, vendor) in enumerate(rows)]
+    db.session.add_all(products)
+    db.session.commit()
+    return products
+
+
+def titles(results):
+    return [r["title"] for r in results]
+
+
+def test_match_expression_quotes_terms():
+    assert product_index.match_expression("Oak sofa") == '"oak"* "sofa"*'
+    # FTS operators and quotes in user input stay plain terms
+    assert product_index.match_expression('sofa" OR title:*') == '"sofa"* "or"* "title"*'
+    assert product_index.match_expression("  --  ") == ""
+
+
+def test_index_unavailable_until_built(app):
+    with app.app_context():
+        assert product_index.search_product_index("sofa") is None
+
+
+def test_existing_rows_are_indexed_on_build(app):
+    print("\n--- Checking that a new index is filled from existing products ---")
+    with app.app_context():
+        add_products(("Grey fabric sofa", "ikea.com"), ("Walnut coffee table", "wayfair.com"))
+        assert product_index.ensure_product_index(db.engine)
+        assert product_index.ensure_product_index(db.engine)  # Idempotent
+        assert titles(product_index.search_product_index("sofa")) == ["Grey fabric sofa"]
+        # Prefix matching and stemming: "tabl" and "tables" both find "table"
+        assert titles(product_index.search_product_index("walnut tabl")) == ["Walnut coffee table"]
+        assert titles(product_index.search_product_index("tables")) == ["Walnut coffee table"]
+        assert product_index.search_product_index("!!!") == []
+
+
+def test_title_matches_outrank_vendor_matches(app):
+    print("\n--- Checking BM25 ordering with the title weighted over the vendor ---")
+    with app.app_context():
+        product_index.ensure_product_index(db.engine)
+        add_products(("Velvet armchair", "ikea.com"),
+                     ("Ikea style bookshelf", "amazon.com"),
+                     ("Oak dining chair", "wayfair.com"))
+        results = titles(product_index.search_product_index("ikea"))
+        print(f"'ikea' ranks: {results}")
+        assert results == ["Ikea style bookshelf", "Velvet armchair"]
+
+
+def test_triggers_follow_inserts_updates_and_deletes(app):
+    print("\n--- Checking that the triggers keep the index in step ---")
+    with app.app_context():
+        product_index.ensure_product_index(db.engine)
+        lamp, = add_products(("Brass floor lamp", "ikea.com"))
+        assert titles(product_index.search_product_index("lamp")) == ["Brass floor lamp"]
+
+        lamp.title = "Brass pendant light"
+        db.session.commit()
+        assert product_index.search_product_index("lamp") == []
+        assert titles(product_index.search_product_index("pendant")) == ["Brass pendant light"]
+
+        db.session.delete(lamp)
+        db.session.commit()
+        assert product_index.search_product_index("pendant") == []
+
+
+def test_enough_local_hits_skip_the_vendor_search(app, monkeypatch):
+    print("\n--- Checking that a well-covered query is answered from the index ---")
+    calls = []
+    monkeypatch.setattr(scraper, "search_all_vendors", lambda query: calls.append(query) or [])
+    with app.app_context():
+        product_index.ensure_product_index(db.engine)
+        add_products(("Linen sofa", "ikea.com"), ("Leather sofa", "wayfair.com"),
+                     ("Corner sofa bed", "amazon.com"))
+        results, status = scraper.search_products_cached("sofa")
+        print(f"Status {status}: {titles(results)}")
+        assert status == "index" and len(results) == 3
+    assert calls == []
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
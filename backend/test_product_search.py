@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+
+import services.product_search as product_search
+from services.product_search import VendorSearchError, merge_results, normalize_url, search_all_vendors
+
+
+def product(title, url, vendor="amazon.com"):
+    return {"title": title, "url": url, "vendor": vendor}
+
+
+class FakeTavily:
+    """Answers per vendor (from the site: prefix) after a delay; 'error' raises."""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.calls = []
+
+    def search(self, query, **kwargs):
+        vendor = query.split()[0].removeprefix("site:")
+        self.calls.append(vendor)
+        delay = self.delays[vendor]
+        if delay == "error":
+            raise RuntimeError("HTTP 432: usage limit")
+        time.sleep(delay)
+        return {"results": [{"title": f"{vendor} sofa", "url": f"https://{vendor}/sofa", "content": "$499.00"}]}
+
+
+def use_client(monkeypatch, client):
+    monkeypatch.setattr(product_search, "get_tavily_client", lambda: client)
+
+
+def test_duplicate_listings_merge_and_rank_first():
+    print("\n--- Checking reciprocal-rank merge and dedupe ---")
+    per_vendor = {
+        "amazon.com": [product("Velvet Sofa", "https://www.amazon.com/Velvet-Sofa/dp/B0ABCDEFGH?ref=x"),
+                       product("Oak Table", "https://amazon.com/oak-table")],
+        "wayfair.com": [product("Linen Chair", "https://wayfair.com/chair", "wayfair.com"),
+                        product("Velvet sofa", "https://wayfair.com/velvet-sofa", "wayfair.com")],
+    }
+    merged = merge_results(per_vendor, limit=10)
+    print(f"Merged: {[p['title'] for p in merged]}")
+    assert [p["title"] for p in merged] == ["Velvet Sofa", "Linen Chair", "Oak Table"]
+    assert normalize_url("https://www.amazon.com/gp/product/b0abcdefgh/") == "amazon.com/dp/B0ABCDEFGH"
+
+
+def test_slow_and_failing_vendors_are_skipped(monkeypatch):
+    print("\n--- Checking the fan-out deadline ---")
+    client = FakeTavily({"amazon.com": 0.05, "wayfair.com": "error", "ikea.com": 2.0})
+    use_client(monkeypatch, client)
+    start = time.perf_counter()
+    results = search_all_vendors("sofa", vendors=["amazon.com", "wayfair.com", "ikea.com"], deadline=0.5)
+    elapsed = time.perf_counter() - start
+    print(f"{len(results)} results in {elapsed:.2f}s")
+    assert [r["vendor"] for r in results] == ["amazon.com"] and results[0]["price"] == "$499.00"
+    assert elapsed < 1.0
+
+    use_client(monkeypatch, FakeTavily({"amazon.com": "error"}))
+    try:
+        search_all_vendors("sofa", vendors=["amazon.com"], deadline=0.5)
+        assert False, "all vendors failing should raise"
+    except VendorSearchError:
+        pass
+
+
+def test_fan_out_is_capped(monkeypatch):
+    print("\n--- Checking the Tavily calls per search cap ---")
+    client = FakeTavily({"amazon.com": 0, "wayfair.com": 0, "ikea.com": 0})
+    use_client(monkeypatch, client)
+    monkeypatch.setattr(product_search, "PRODUCT_SEARCH_MAX_VENDORS", 2)
+    search_all_vendors("sofa", vendors=["amazon.com", "wayfair.com", "ikea.com"])
+    print(f"Vendors searched: {client.calls}")
+    assert sorted(client.calls) == ["amazon.com", "wayfair.com"]
+
+
+def test_executor_is_created_after_fork():
+    print("\n--- Checking that a forked worker gets its own search pool ---")
+    parent_pool = product_search._get_executor()
+    pid = os.fork()
+    if pid == 0:
+        fresh = product_search._executor is None and product_search._get_executor() is not parent_pool
+        ok = fresh and product_search._get_executor().submit(lambda: 42).result(timeout=5) == 42
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+os.environ.setdefault("CONTEXT_STORE_PATH", os.path.join(tempfile.mkdtemp(), "store.db"))
+
+from services.ai_service import AIService
+from services.response_cache import ResponseCache, prompt_key
+
+
+class CountingModel:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        return type("Response", (), {"text": f"answer {self.calls}", "usage_metadata": None})()
+
+
+def test_keys_ignore_whitespace_only_differences():
+    assert prompt_key("  Which  sofa?\n") == prompt_key("Which sofa?")
+    assert prompt_key("Which sofa?") != prompt_key("Which rug?")
+
+
+def test_lru_bound_and_ttl():
+    print("\n--- Checking the LRU bound and TTL ---")
+    cache = ResponseCache(max_entries=2, ttl=60, persist=False)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("b") is None and cache.get("a") == "1" and cache.get("c") == "3"
+
+    short = ResponseCache(max_entries=2, ttl=0.05, persist=False)
+    short.set("a", "1")
+    time.sleep(0.1)
+    assert short.get("a") is None
+    print(f"Stats: {cache.stats()}")
+
+
+def test_concurrent_use_stays_consistent():
+    cache = ResponseCache(max_entries=50, ttl=60, persist=False)
+    errors = []
+
+    def work(n):
+        try:
+            for i in range(200):
+                cache.set(f"prompt {n}-{i % 80}", str(i))
+                cache.get(f"prompt {(n + 1) % 4}-{i % 80}")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors and cache.stats()["memory"]["size"] == 50
+
+
+def test_disk_tier_survives_a_new_instance():
+    first = ResponseCache(max_entries=10, ttl=60, persist=True)
+    first.set("persisted prompt", "kept")
+    assert ResponseCache(max_entries=10, ttl=60, persist=True).get("persisted prompt") == "kept"
+
+
+def test_repeated_prompt_skips_the_model():
+    print("\n--- Checking that AIService answers a repeat from the cache ---")
+    service = AIService()
+    service.gemini_model = CountingModel()
+    first = service.get_assistant_response("cache test: best rug for a bedroom?")
+    second = service.get_assistant_response("cache test:  best rug for a bedroom?")
+    print(f"Answers: {first!r}, {second!r}; model calls {service.gemini_model.calls}")
+    assert first == second == "answer 1" and service.gemini_model.calls == 1
+
+
+if __name__ == "__main__":
+    test_keys_ignore_whitespace_only_differences()
+    test_lru_bound_and_ttl()
+    test_concurrent_use_stays_consistent()
+    test_disk_tier_survives_a_new_instance()
+    test_repeated_prompt_skips_the_model()
@@ -0,0 +1,69 @@
+import os
+import sys
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+
+from services.semantic_cache import SemanticCache, context_key
+
+CONTEXT = context_key("living room", "modern", ["sofa", "coffee table"])
+QUESTION = "what colour sofa for modern living room"
+
+
+def test_request_paraphrase_is_served_from_cache():
+    print("\n--- Checking the reworded question from the request ---")
+    cache = SemanticCache(max_entries=16)
+    cache.add(QUESTION, CONTEXT, {"text": "Warm grey or deep green."})
+    answer, score = cache.lookup("which sofa colour suits a modern lounge", CONTEXT)
+    print(f"Paraphrase score {score:.3f}")
+    assert answer == {"text": "Warm grey or deep green."}
+    assert cache.lookup("what colours of sofas for modern living rooms", CONTEXT)[0] is not None
+
+
+def test_different_subject_is_a_miss():
+    print("\n--- Checking that a different object or style is not reused ---")
+    cache = SemanticCache(max_entries=16)
+    cache.add(QUESTION, CONTEXT, {"text": "Warm grey or deep green."})
+    for question in ("what colour rug for modern living room",
+                     "what colour curtains for modern living room",
+                     "what colour sofa for a rustic living room",
+                     "what size sofa for modern living room",
+                     "what colour sofa should I avoid for modern living room",
+                     "what colour sofa not to use in modern living room",
+                     "which colour sofa is not good for a modern living room"):
+        answer, score = cache.lookup(question, CONTEXT)
+        print(f"{score:.3f} {question}")
+        assert answer is None
+    assert cache.stats()["hits"] == 0
+
+    # Symmetric: the cached question may not carry words the new one lacks either
+    avoid = SemanticCache(max_entries=16)
+    avoid.add("what colour sofa should I avoid for modern living room", CONTEXT, {"text": "Neon orange."})
+    assert avoid.lookup(QUESTION, CONTEXT)[0] is None
+
+
+def test_context_includes_the_furniture():
+    print("\n--- Checking that the room's furniture is part of the context ---")
+    assert context_key("Living Room", "Modern", ["coffee table", "sofa"]) == CONTEXT
+    assert context_key("living room", "modern", ["sofa", "tv stand"]) != CONTEXT
+    assert context_key("living room", "modern") != CONTEXT
+
+    cache = SemanticCache(max_entries=16)
+    cache.add(QUESTION, CONTEXT, {"text": "Warm grey or deep green."})
+    assert cache.lookup(QUESTION, context_key("living room", "modern", ["sofa", "tv stand"]))[0] is None
+
+
+def test_memory_is_bounded():
+    cache = SemanticCache(max_entries=3)
+    for i in range(5):
+        cache.add(f"question number {i} about lamps", CONTEXT, {"text": str(i)})
+    stats = cache.stats()
+    print(f"\nStats: {stats}")
+    assert stats["size"] == 3 and stats["evictions"] == 2
+
+
+if __name__ == "__main__":
+    test_request_paraphrase_is_served_from_cache()
+    test_different_subject_is_a_miss()
+    test_context_includes_the_furniture()
+    test_memory_is_bounded()
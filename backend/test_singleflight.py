@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import threading
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+
+from services.singleflight import SingleFlight
+
+
+def run_together(n, target):
+    results = []
+    lock = threading.Lock()
+
+    def call():
+        try:
+            value = target()
+        except Exception as e:
+            value = e
+        with lock:
+            results.append(value)
+
+    threads = [threading.Thread(target=call) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_identical_calls_in_flight_share_one_execution():
+    print("\n--- Checking that concurrent identical calls run once ---")
+    flight = SingleFlight()
+    executions = []
+
+    def vision_call():
+        executions.append(1)
+        time.sleep(0.2)
+        return {"room_type": "bedroom"}
+
+    results = run_together(6, lambda: flight.do("vision:abc", vision_call))
+    print(f"Executions: {len(executions)}, stats {flight.stats()}")
+    assert len(executions) == 1 and all(r == {"room_type": "bedroom"} for r in results)
+    assert flight.stats() == {"executions": 1, "coalesced": 5, "in_flight": 0}
+
+    # Nothing is remembered afterwards, and other keys run on their own
+    flight.do("vision:abc", vision_call)
+    flight.do("vision:def", vision_call)
+    assert len(executions) == 3
+
+
+def test_errors_reach_every_waiting_caller():
+    flight = SingleFlight()
+
+    def failing():
+        time.sleep(0.1)
+        raise TimeoutError("Gemini timed out")
+
+    results = run_together(4, lambda: flight.do("chat:x", failing))
+    assert len(results) == 4 and all(isinstance(r, TimeoutError) for r in results)
+    assert flight.stats()["executions"] == 1 and flight.stats()["in_flight"] == 0
+
+
+if __name__ == "__main__":
+    test_identical_calls_in_flight_share_one_execution()
+    test_errors_reach_every_waiting_caller()
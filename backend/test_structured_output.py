@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+
+from services.structured_output import SCHEMAS, IncrementalJSONExtractor, extract_json, validate
+
+
+def feed_in_chunks(text, size):
+    extractor = IncrementalJSONExtractor()
+    objects = []
+    for i in range(0, len(text), size):
+        objects.extend(extractor.feed(text[i:i + size]))
+    return objects + extractor.close()
+
+
+def test_prose_and_fences_are_skipped():
+    print("\n--- Checking JSON wrapped in prose and fences ---")
+    text = 'Here\'s the result:\n```json\n{"room_type": "bedroom", "style": "boho", ' \
+           '"detected_objects": ["bed {queen}", "lamp"]}\n```\nHope that "helps".'
+    data = extract_json(text, SCHEMAS["room_analysis"])
+    print(f"Extracted: {data}")
+    assert data["detected_objects"] == ["bed {queen}", "lamp"]
+
+
+def test_unbalanced_prose_bracket_resynchronises():
+    print("\n--- Checking recovery from a stray bracket before the JSON ---")
+    schema = SCHEMAS["assistant_chat"]
+    assert extract_json('Result (see [1 for details): {"text":"hi"}', schema) == {"text": "hi"}
+    # Mismatched closer and an unparseable span before the real object
+    assert extract_json('see [1} and {"text": "a]b"} then', schema) == {"text": "a]b"}
+    assert extract_json('{"a": [1, 2}, {"text": "x"}', schema) == {"text": "x"}
+
+
+def test_chunking_does_not_change_the_result():
+    print("\n--- Checking that streamed chunks parse like the whole text ---")
+    text = 'Note [1 and (see {bad: 1}) ok: {"text": "hi \\"[there\\"", "n": [1, {"a": 2}]} done'
+    expected = [{"text": 'hi "[there"', "n": [1, {"a": 2}]}]
+    for size in (1, 2, 3, 7, len(text)):
+        objects = feed_in_chunks(text, size)
+        assert objects == expected, (size, objects)
+
+
+def test_unclosed_brackets_stay_linear():
+    print("\n--- Checking that failed candidates are not rescanned from scratch ---")
+    for junk in ("x" + "{ " * 20000, "[1, " * 20000, '{"' * 20000, 'x"{ ' * 20000):
+        start = time.perf_counter()
+        data = extract_json(junk + '{"text": "found"}', SCHEMAS["assistant_chat"])
+        elapsed = time.perf_counter() - start
+        print(f"{junk[:6]!r}... ({len(junk)} chars): {elapsed:.2f}s")
+        assert data == {"text": "found"}
+        assert elapsed < 2  # Quadratic rescanning took minutes at this size
+
+
+def test_deep_nesting_is_dropped_not_raised():
+    print("\n--- Checking nesting beyond max_depth ---")
+    assert extract_json("[" * 2000) is None
+    extractor = IncrementalJSONExtractor(max_depth=8)
+    objects = extractor.feed("[" * 20 + "1" + "]" * 20 + ' {"text": "ok"}') + extractor.close()
+    print(f"Objects: {objects}")
+    assert objects == [[[[[1]]]], {"text": "ok"}]
+
+
+def test_validate_reports_violations():
+    errors = validate({"room_type": "den", "detected_objects": ["sofa", 3]}, SCHEMAS["room_analysis"])
+    print(f"\nViolations: {errors}")
+    assert "$.style: required" in errors
+    assert "$.detected_objects[1]: expected string, got int" in errors
+
+
+if __name__ == "__main__":
+    test_prose_and_fences_are_skipped()
+    test_unbalanced_prose_bracket_resynchronises()
+    test_chunking_does_not_change_the_result()
+    test_unclosed_brackets_stay_linear()
+    test_deep_nesting_is_dropped_not_raised()
+    test_validate_reports_violations()
@@ -0,0 +1,42 @@
+import os
+import sys
+import time
+import tempfile
+
+# Add backend to path so we can import services
+sys.path.append(os.getcwd())
+os.environ.setdefault("CONTEXT_STORE_PATH", os.path.join(tempfile.mkdtemp(), "store.db"))
+
+from services import ai_service
+
+
+def slow_model():
+    time.sleep(0.5)
+    return object()
+
+
+def test_worker_forked_mid_warmup_warms_itself():
+    print("\n--- Checking a worker forked while the master is still warming up ---")
+    models = ai_service.get_ai_service().models
+    models.register("slow", slow_model, estimated_mb=1)
+    ai_service.warm_up_in_background(["slow"])
+    time.sleep(0.1)  # The master's warm-up thread now holds the model's load lock
+
+    pid = os.fork()
+    if pid == 0:
+        # Worker: the parent's thread is gone, so it must not claim to be ready...
+        ok = not ai_service.is_ready() and ai_service.readiness()["pinned_models"] == []
+        # ...and its own warm-up must not deadlock on the lock that thread held
+        ai_service.warm_up_in_background(["slow"])
+        ok = ok and ai_service.wait_for_warm_up(5) and models.is_loaded("slow")
+        os._exit(0 if ok else 1)
+
+    assert ai_service.wait_for_warm_up(5)
+    _, status = os.waitpid(pid, 0)
+    print(f"Master ready: {ai_service.readiness()}, worker exit status {os.WEXITSTATUS(status)}")
+    assert os.WEXITSTATUS(status) == 0
+    assert ai_service.readiness()["pinned_models"] == ["slow"]
+
+
+if __name__ == "__main__":
+    test_worker_forked_mid_warmup_warms_itself()